@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Estado de alertas
+Cada stream pasa por NORMAL -> DEGRADADO -> CAIDO -> RECUPERADO según
+la cantidad de chequeos fallidos u OK consecutivos. Sólo se avisa al
+entrar en CAIDO y al recuperarse, y los avisos que ocurren juntos se
+agrupan en un único mensaje. El estado se guarda en el historial, así
+también la ejecución por cron recuerda qué ya fue alertado.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+NORMAL = "normal"
+DEGRADADO = "degradado"
+CAIDO = "caido"
+RECUPERADO = "recuperado"
+
+
+@dataclass
+class EstadoStream:
+    estado: str = NORMAL
+    fallas: int = 0          # chequeos fallidos consecutivos
+    exitos: int = 0          # chequeos OK consecutivos
+    desde: float = None      # comienzo de la racha de fallas actual
+    error: str = None        # última línea de alerta
+
+
+def transicion(actual, ok, error=None, ts=None, umbral_caido=2, umbral_recuperacion=2):
+    """
+    Aplica el resultado de un chequeo al estado de un stream y retorna el nuevo estado.
+    Un stream caído necesita `umbral_recuperacion` chequeos OK seguidos para recuperarse.
+    """
+    ts = ts if ts is not None else time.time()
+    if ok:
+        nuevo = EstadoStream(actual.estado, 0, actual.exitos + 1, actual.desde, actual.error)
+        if actual.estado == CAIDO:
+            if nuevo.exitos >= umbral_recuperacion:
+                nuevo.estado = RECUPERADO
+        else:
+            nuevo = EstadoStream(NORMAL, 0, nuevo.exitos)
+        return nuevo
+
+    nuevo = EstadoStream(actual.estado, actual.fallas + 1, 0, actual.desde, error)
+    if actual.estado in (NORMAL, RECUPERADO):
+        nuevo.estado = DEGRADADO
+        nuevo.desde = ts
+    if nuevo.estado == DEGRADADO and nuevo.fallas >= umbral_caido:
+        nuevo.estado = CAIDO
+    return nuevo
+
+
+class MaquinaAlertas:
+    """
+    Lleva el estado de cada stream, persistido en el historial (tabla estados)
+    """
+
+    def __init__(self, historial, umbral_caido=2, umbral_recuperacion=2):
+        self.historial = historial
+        self.umbral_caido = umbral_caido
+        self.umbral_recuperacion = umbral_recuperacion
+        self.lock = threading.Lock()
+
+    def procesar(self, stream_id, ok, error=None, ts=None):
+        """
+        Registra un chequeo y retorna (anterior, nuevo) como EstadoStream
+        """
+        with self.lock:
+            guardado = self.historial.estado(stream_id)
+            anterior = EstadoStream(**guardado) if guardado else EstadoStream()
+            nuevo = transicion(anterior, ok, error, ts, self.umbral_caido, self.umbral_recuperacion)
+            self.historial.guardar_estado(stream_id, **vars(nuevo))
+            return anterior, nuevo
+
+
+def armar_digest(problemas, recuperaciones):
+    """
+    Arma (asunto, cuerpo) de un único mensaje con todos los avisos pendientes
+    """
+    if problemas:
+        asunto = "🚨 ALERTA: Problemas detectados en streams"
+        cuerpo = "Se detectaron los siguientes problemas:\n\n" + "\n".join(problemas)
+        if recuperaciones:
+            cuerpo += "\n\nStreams restablecidos:\n\n" + "\n".join(recuperaciones)
+    else:
+        asunto = "✅ Streams restablecidos"
+        cuerpo = "Los siguientes streams volvieron a funcionar:\n\n" + "\n".join(recuperaciones)
+    return asunto, cuerpo
+
+
+def linea_recuperacion(nombre, desde, ts=None):
+    """
+    Texto del aviso de recuperación con la duración del problema
+    """
+    if desde is None:
+        return f"✅ {nombre} restablecido"
+    ts = ts if ts is not None else time.time()
+    minutos = max(0, round((ts - desde) / 60))
+    return (f"✅ {nombre} restablecido (con problemas desde las "
+            f"{datetime.fromtimestamp(desde).strftime('%H:%M')}, {minutos} min)")
+
+
+class Agrupador:
+    """
+    Junta los avisos que llegan dentro de `ventana` segundos y los envía
+    en un solo mensaje con enviar(asunto, cuerpo, adjuntos), donde adjuntos
+    son las rutas de archivo de los avisos. Con ventana=0 los avisos quedan
+    pendientes hasta llamar a vaciar() (un ciclo del modo cron).
+    """
+
+    def __init__(self, enviar, ventana=30):
+        self.enviar = enviar
+        self.ventana = ventana
+        self.problemas = []
+        self.recuperaciones = []
+        self.adjuntos = []
+        self.temporizador = None
+        self.lock = threading.Lock()
+
+    def agregar_problema(self, linea, adjunto=None):
+        self._agregar(self.problemas, linea, adjunto)
+
+    def agregar_recuperacion(self, linea):
+        self._agregar(self.recuperaciones, linea)
+
+    def _agregar(self, lista, linea, adjunto=None):
+        with self.lock:
+            lista.append(linea)
+            if adjunto:
+                self.adjuntos.append(adjunto)
+            if self.ventana > 0 and self.temporizador is None:
+                self.temporizador = threading.Timer(self.ventana, self.vaciar)
+                self.temporizador.daemon = True
+                self.temporizador.start()
+
+    def vaciar(self):
+        """
+        Envía los avisos pendientes, si los hay
+        """
+        with self.lock:
+            problemas, self.problemas = self.problemas, []
+            recuperaciones, self.recuperaciones = self.recuperaciones, []
+            adjuntos, self.adjuntos = self.adjuntos, []
+            if self.temporizador is not None:
+                self.temporizador.cancel()
+                self.temporizador = None
+        if problemas or recuperaciones:
+            self.enviar(*armar_digest(problemas, recuperaciones), adjuntos)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Análisis de silencio vectorizado
+Equivalente a pydub.silence.detect_nonsilent pero calculado con NumPy en una
+sola pasada: la energía se acumula por milisegundo y cada ventana de
+`min_silence_len` ms se resuelve con una resta de sumas acumuladas.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Bloque de procesamiento en ms, para no elevar al cuadrado todo el buffer de una vez
+BLOQUE_MS = 60000
+
+TIPOS_PCM = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+@dataclass
+class ResultadoAnalisis:
+    duracion_ms: int
+    rangos: list = field(default_factory=list)
+    porcentaje_audible: float = 0.0
+    hay_audio: bool = False
+    dbfs: float = float("-inf")
+    dbfs_max: float = float("-inf")
+    dbfs_min: float = float("-inf")
+    calidad: object = None          # calidad.ResultadoCalidad, si se pidió medir_calidad
+    huella: object = None           # huella de audio (ver huellas.py), si se pidió calcular_huella
+
+    def __bool__(self):
+        return self.hay_audio
+
+
+def muestras_pcm(pcm, sample_width=2):
+    """
+    Convierte bytes PCM signed little-endian en un array de NumPy (sin copiar)
+    """
+    if isinstance(pcm, np.ndarray):
+        return pcm
+    if sample_width not in TIPOS_PCM:
+        raise ValueError(f"Ancho de muestra no soportado: {sample_width}")
+    dtype = np.dtype(TIPOS_PCM[sample_width]).newbyteorder("<")
+    return np.frombuffer(pcm, dtype=dtype)
+
+
+def limites_ms(n_ms, sample_rate):
+    """
+    Frame de inicio de cada milisegundo, con el mismo redondeo que pydub
+    (AudioSegment._parse_position)
+    """
+    return (np.arange(n_ms + 1) * (sample_rate / 1000.0)).astype(np.int64)
+
+
+def energia_acumulada(muestras, sample_rate, canales, n_ms):
+    """
+    Suma acumulada de muestras al cuadrado en cada límite de milisegundo.
+    `muestras` puede ser 1-D (un buffer) o 2-D (un buffer por fila).
+    Retorna un array de n_ms + 1 columnas (int64, exacto).
+    """
+    lote = muestras.reshape(-1, muestras.shape[-1])
+    frames = lote.shape[1] // canales
+    limites = np.minimum(limites_ms(n_ms, sample_rate), frames)
+    energia = np.zeros((lote.shape[0], n_ms), dtype=np.int64)
+    por_ms = sample_rate // 1000 if sample_rate % 1000 == 0 else None
+
+    for inicio in range(0, n_ms, BLOQUE_MS):
+        fin = min(inicio + BLOQUE_MS, n_ms)
+        desde, hasta = limites[inicio] * canales, limites[fin] * canales
+        bloque = lote[:, desde:hasta].astype(np.int64)
+        bloque *= bloque
+        if por_ms and hasta - desde == (fin - inicio) * por_ms * canales:
+            # Milisegundos de largo fijo: vista (filas, ms, muestras) sobre el mismo buffer
+            energia[:, inicio:fin] = bloque.reshape(lote.shape[0], fin - inicio, -1).sum(axis=2)
+        else:
+            cortes = (limites[inicio:fin] - limites[inicio]) * canales
+            validos = cortes < bloque.shape[1]
+            if validos.any():
+                sumas = np.add.reduceat(bloque, cortes[validos], axis=1)
+                # reduceat devuelve la muestra sola cuando dos cortes coinciden
+                vacios = np.diff(np.append(cortes[validos], bloque.shape[1])) == 0
+                sumas[:, vacios] = 0
+                energia[:, inicio:fin][:, validos] = sumas
+
+    acumulada = np.zeros((lote.shape[0], n_ms + 1), dtype=np.int64)
+    np.cumsum(energia, axis=1, out=acumulada[:, 1:])
+    return acumulada.reshape(muestras.shape[:-1] + (n_ms + 1,))
+
+
+def duracion_ms(n_muestras, sample_rate, canales):
+    """
+    Duración en ms con el mismo redondeo que len(AudioSegment)
+    """
+    return round(1000 * ((n_muestras // canales) / sample_rate))
+
+
+def inicios_de_ventana(n_ms, min_silence_len, seek_step=1):
+    """
+    Inicios de las ventanas evaluadas por pydub.silence.detect_silence
+    """
+    ultimo = n_ms - min_silence_len
+    inicios = np.arange(0, ultimo + 1, seek_step)
+    if ultimo % seek_step:
+        inicios = np.append(inicios, ultimo)
+    return inicios
+
+
+def rms_por_ventana(acumulada, sample_rate, canales, inicios, min_silence_len):
+    """
+    RMS entero (como audioop.rms) de cada ventana [inicio, inicio + min_silence_len)
+    """
+    n_ms = acumulada.shape[-1] - 1
+    limites = limites_ms(n_ms, sample_rate)
+    fines = inicios + min_silence_len
+    sumas = acumulada[..., fines] - acumulada[..., inicios]
+    n = (limites[fines] - limites[inicios]) * canales
+    return np.floor(np.sqrt(sumas / np.maximum(n, 1)))
+
+
+def rangos_silencio(silencioso, inicios, min_silence_len, seek_step=1):
+    """
+    Agrupa las ventanas silenciosas en rangos [inicio, fin] como detect_silence
+    """
+    arranques = inicios[silencioso]
+    if not len(arranques):
+        return []
+    saltos = np.diff(arranques)
+    cortes = np.flatnonzero((saltos != seek_step) & (saltos > min_silence_len))
+    primeros = np.concatenate(([arranques[0]], arranques[cortes + 1]))
+    ultimos = np.concatenate((arranques[cortes], [arranques[-1]]))
+    return [[int(a), int(b) + min_silence_len] for a, b in zip(primeros, ultimos)]
+
+
+def invertir_rangos(silencios, n_ms):
+    """
+    Rangos no silenciosos a partir de los silenciosos, como detect_nonsilent
+    """
+    if not silencios:
+        return [[0, n_ms]]
+    if silencios[0][0] == 0 and silencios[0][1] == n_ms:
+        return []
+
+    rangos = []
+    fin_anterior = 0
+    for inicio, fin in silencios:
+        rangos.append([fin_anterior, inicio])
+        fin_anterior = fin
+    if fin != n_ms:
+        rangos.append([fin_anterior, n_ms])
+    if rangos[0] == [0, 0]:
+        rangos.pop(0)
+    return rangos
+
+
+def a_dbfs(valor, amplitud_maxima):
+    with np.errstate(divide="ignore"):
+        return float(20 * np.log10(valor / amplitud_maxima)) if valor > 0 else float("-inf")
+
+
+def _resultado(acumulada, n_muestras, sample_rate, canales, sample_width,
+               min_silence_len, silence_thresh, seek_step, porcentaje_minimo):
+    amplitud_maxima = 2 ** (sample_width * 8) / 2
+    n_ms = duracion_ms(n_muestras, sample_rate, canales)
+    resultado = ResultadoAnalisis(duracion_ms=n_ms)
+    if n_ms == 0:
+        return resultado
+
+    resultado.dbfs = a_dbfs(np.sqrt(acumulada[-1] / max(n_muestras, 1)), amplitud_maxima)
+
+    if n_ms < min_silence_len:
+        silencios = []
+    else:
+        inicios = inicios_de_ventana(n_ms, min_silence_len, seek_step)
+        rms = rms_por_ventana(acumulada, sample_rate, canales, inicios, min_silence_len)
+        umbral = 10 ** (silence_thresh / 20) * amplitud_maxima
+        silencios = rangos_silencio(rms <= umbral, inicios, min_silence_len, seek_step)
+        resultado.dbfs_max = a_dbfs(rms.max(), amplitud_maxima)
+        resultado.dbfs_min = a_dbfs(rms.min(), amplitud_maxima)
+
+    resultado.rangos = invertir_rangos(silencios, n_ms)
+    sonando = sum(fin - inicio for inicio, fin in resultado.rangos)
+    resultado.porcentaje_audible = sonando / n_ms * 100
+    resultado.hay_audio = bool(resultado.rangos) and resultado.porcentaje_audible >= porcentaje_minimo
+    return resultado
+
+
+def analizar(pcm, sample_rate, canales=1, sample_width=2, min_silence_len=1000,
+             silence_thresh=-16, seek_step=1, porcentaje_minimo=10, medir_calidad=False,
+             calcular_huella=False):
+    """
+    Analiza un buffer PCM y retorna un ResultadoAnalisis con los mismos rangos
+    no silenciosos que detect_nonsilent y el porcentaje de tiempo audible.
+    Con medir_calidad también calcula las métricas de calidad.py y con
+    calcular_huella la huella de huellas.py.
+    """
+    muestras = muestras_pcm(pcm, sample_width)
+    n_ms = duracion_ms(len(muestras), sample_rate, canales)
+    acumulada = energia_acumulada(muestras, sample_rate, canales, n_ms)
+    resultado = _resultado(acumulada, len(muestras), sample_rate, canales, sample_width,
+                           min_silence_len, silence_thresh, seek_step, porcentaje_minimo)
+    if medir_calidad:
+        import calidad  # calidad importa este módulo
+        resultado.calidad = calidad.medir(muestras, sample_rate, canales, sample_width)
+    if calcular_huella:
+        import huellas
+        resultado.huella = huellas.calcular(muestras, sample_rate, canales, sample_width)
+    return resultado
+
+
+def analizar_lote(buffers, sample_rate, canales=1, sample_width=2, min_silence_len=1000,
+                  silence_thresh=-16, seek_step=1, porcentaje_minimo=10):
+    """
+    Analiza varios buffers de igual largo en una sola llamada.
+    `buffers` es un array 2-D (un stream por fila) o una lista de bytes PCM.
+    Retorna un ResultadoAnalisis por fila.
+    """
+    if not isinstance(buffers, np.ndarray):
+        buffers = [muestras_pcm(b, sample_width) for b in buffers]
+        if len({len(b) for b in buffers}) > 1:
+            return [analizar(b, sample_rate, canales, sample_width, min_silence_len,
+                             silence_thresh, seek_step, porcentaje_minimo) for b in buffers]
+        buffers = np.stack(buffers) if buffers else np.zeros((0, 0), dtype=np.int16)
+
+    n_muestras = buffers.shape[1]
+    n_ms = duracion_ms(n_muestras, sample_rate, canales)
+    acumuladas = energia_acumulada(buffers, sample_rate, canales, n_ms)
+    return [_resultado(acumulada, n_muestras, sample_rate, canales, sample_width,
+                       min_silence_len, silence_thresh, seek_step, porcentaje_minimo)
+            for acumulada in acumuladas]
+
+
+def porcentajes_audibles(buffers, sample_rate, canales=1, sample_width=2, min_silence_lens=(1000,),
+                         silence_threshs=(-16,), seek_step=1):
+    """
+    Porcentaje audible de cada fila de `buffers` (array 2-D de igual largo)
+    para cada combinación de largo mínimo de silencio y umbral, acumulando
+    la energía una sola vez. Retorna {(min_silence_len, silence_thresh): array}.
+    El resultado equivale a analizar_lote: hay audio si el porcentaje es
+    mayor que 0 y alcanza porcentaje_minimo.
+    """
+    amplitud_maxima = 2 ** (sample_width * 8) / 2
+    n_ms = duracion_ms(buffers.shape[1], sample_rate, canales)
+    acumuladas = energia_acumulada(buffers, sample_rate, canales, n_ms)
+    porcentajes = {}
+    for min_silence_len in min_silence_lens:
+        if n_ms == 0 or n_ms < min_silence_len:
+            for silence_thresh in silence_threshs:
+                porcentajes[min_silence_len, silence_thresh] = np.full(len(buffers), 100.0 if n_ms else 0.0)
+            continue
+        inicios = inicios_de_ventana(n_ms, min_silence_len, seek_step)
+        rms = rms_por_ventana(acumuladas, sample_rate, canales, inicios, min_silence_len)
+        for silence_thresh in silence_threshs:
+            silenciosas = rms <= 10 ** (silence_thresh / 20) * amplitud_maxima
+            valores = np.empty(len(buffers))
+            for i, fila in enumerate(silenciosas):
+                rangos = invertir_rangos(rangos_silencio(fila, inicios, min_silence_len, seek_step), n_ms)
+                valores[i] = sum(fin - inicio for inicio, fin in rangos) / n_ms * 100
+            porcentajes[min_silence_len, silence_thresh] = valores
+    return porcentajes
+
+
+class AnalizadorIncremental:
+    """
+    Analiza un fragmento a medida que llega y decide apenas el resultado es seguro.
+    Una posición ya es definitiva cuando todas las ventanas que la cubren están
+    completas; con eso se acota el porcentaje audible final por abajo y por arriba.
+    """
+
+    def __init__(self, duracion_seg, sample_rate, canales=1, sample_width=2,
+                 min_silence_len=1000, silence_thresh=-16, porcentaje_minimo=10, muestras=None,
+                 medir_calidad=False, calcular_huella=False):
+        self.sample_rate = sample_rate
+        self.canales = canales
+        self.sample_width = sample_width
+        self.min_silence_len = min_silence_len
+        self.silence_thresh = silence_thresh
+        self.porcentaje_minimo = porcentaje_minimo
+        self.medir_calidad = medir_calidad
+        self.calcular_huella = calcular_huella
+        self.duracion_ms = round(duracion_seg * 1000)
+        # `muestras` permite usar un buffer propio (por ejemplo en memoria compartida)
+        if muestras is None:
+            muestras = np.zeros(int(duracion_seg * sample_rate) * canales, dtype=TIPOS_PCM[sample_width])
+        self.muestras = muestras
+        self.recibidas = 0
+
+    def agregar(self, pcm):
+        nuevas = muestras_pcm(pcm, self.sample_width)[:len(self.muestras) - self.recibidas]
+        self.muestras[self.recibidas:self.recibidas + len(nuevas)] = nuevas
+        self.recibidas += len(nuevas)
+
+    def cerrar(self):
+        """
+        Libera los recursos del analizador (ver procesos.AnalizadorCompartido)
+        """
+
+    def resultado(self, completo=True):
+        """
+        Análisis completo de lo recibido hasta el momento (sin calidad ni
+        huella si no es `completo`)
+        """
+        return analizar(self.muestras[:self.recibidas], self.sample_rate, self.canales,
+                        self.sample_width, self.min_silence_len, self.silence_thresh,
+                        porcentaje_minimo=self.porcentaje_minimo,
+                        medir_calidad=completo and self.medir_calidad,
+                        calcular_huella=completo and self.calcular_huella)
+
+    def veredicto(self):
+        """
+        True si ya es seguro que hay audio suficiente, False si ya es seguro que
+        no lo habrá, None si todavía no se puede saber
+        """
+        total_ms, ventana = self.duracion_ms, self.min_silence_len
+        if self.recibidas >= len(self.muestras):
+            return self.resultado(completo=False).hay_audio
+        if total_ms < ventana:
+            return None
+
+        # Milisegundos completos recibidos
+        frames = self.recibidas // self.canales
+        limites = limites_ms(total_ms, self.sample_rate)
+        conocidos = int(np.searchsorted(limites, frames, side="right")) - 1
+        if conocidos <= 0:
+            return None
+        acumulada = energia_acumulada(self.muestras[:limites[conocidos] * self.canales],
+                                      self.sample_rate, self.canales, conocidos)
+
+        # Ventanas con datos: la energía parcial ya alcanza para descartar silencio,
+        # pero solo una ventana completa puede confirmarlo
+        inicios = np.arange(0, min(conocidos - 1, total_ms - ventana) + 1)
+        fines = inicios + ventana
+        parcial = acumulada[np.minimum(fines, conocidos)] - acumulada[inicios]
+        n = (limites[fines] - limites[inicios]) * self.canales
+        rms_minimo = np.floor(np.sqrt(parcial / n))
+        umbral = 10 ** (self.silence_thresh / 20) * 2 ** (self.sample_width * 8) / 2
+        sonora = rms_minimo > umbral
+        silenciosa = (fines <= conocidos) & ~sonora
+
+        # Una posición es audible segura si todas las ventanas que la cubren son sonoras
+        no_sonoras = np.ones(total_ms - ventana + 1, dtype=np.int32)
+        no_sonoras[inicios] = ~sonora
+        previas = np.concatenate(([0], np.cumsum(no_sonoras)))
+        posiciones = np.arange(total_ms)
+        desde = np.maximum(posiciones - ventana + 1, 0)
+        hasta = np.minimum(posiciones, total_ms - ventana)
+        audible_seguro = int(np.count_nonzero(previas[hasta + 1] - previas[desde] == 0))
+
+        # Posiciones cubiertas por alguna ventana silenciosa completa
+        cobertura = np.zeros(total_ms + 1, dtype=np.int32)
+        np.add.at(cobertura, inicios[silenciosa], 1)
+        np.add.at(cobertura, fines[silenciosa], -1)
+        silencio_seguro = int(np.count_nonzero(np.cumsum(cobertura[:-1])))
+
+        necesario = self.porcentaje_minimo / 100 * total_ms
+        if audible_seguro > 0 and audible_seguro >= necesario:
+            return True
+        if total_ms - silencio_seguro < necesario:
+            return False
+        return None
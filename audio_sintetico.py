@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Audio sintético
+Genera señales PCM deterministas (misma semilla, mismos bytes) para las
+pruebas del analizador y el benchmark, sin depender de streams reales.
+La señal se arma de a bloques de un minuto, así una hora de audio no
+necesita más memoria que el resultado final en 16 bits.
+"""
+
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+TIPOS = ("tono", "silencio", "rafagas", "umbral", "mixto", "ruido_rosa", "voz", "zumbido")
+
+# Códecs para las fixtures comprimidas: extensión -> argumentos de FFmpeg.
+# MP3 sin cabeceras ID3/Xing para poder repetirlo en loop como un stream
+CODECS = {
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "128k", "-write_xing", "0", "-id3v2_version", "0"],
+    "aac": ["-c:a", "aac", "-b:a", "96k", "-f", "adts"],
+    "ogg": ["-c:a", "libvorbis", "-q:a", "4"],
+    "opus": ["-c:a", "libopus", "-b:a", "64k"],
+}
+
+BLOQUE_SEG = 60
+
+
+def _a_rms(x, dbfs):
+    """
+    Escala la señal para que su RMS sea `dbfs` (relativo a fondo de escala)
+    """
+    rms = np.sqrt(np.mean(x ** 2))
+    return x if rms == 0 else x * (10 ** (dbfs / 20) / rms)
+
+
+def _ruido_rosa(n, rng):
+    espectro = np.fft.rfft(rng.normal(0, 1, n))
+    f = np.arange(len(espectro))
+    f[0] = 1
+    return np.fft.irfft(espectro / np.sqrt(f), n)
+
+
+def _voz(t, sample_rate, rng):
+    """
+    Sílabas de ~150-300 ms con pausas entre frases: armónicos de una
+    fundamental que varía entre 100 y 220 Hz, con envolvente de sílaba
+    """
+    n = len(t)
+    envolvente = np.zeros(n)
+    i = 0
+    while i < n:
+        silabas = rng.integers(3, 12)
+        for _ in range(silabas):
+            largo = int(rng.uniform(0.15, 0.3) * sample_rate)
+            fin = min(n, i + largo)
+            envolvente[i:fin] = np.hanning(largo)[:fin - i] * rng.uniform(0.5, 1)
+            i = fin + int(rng.uniform(0.02, 0.08) * sample_rate)
+            if i >= n:
+                break
+        i += int(rng.uniform(0.3, 1.2) * sample_rate)
+
+    f0 = 160 + 60 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+    fase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    x = sum(np.sin(k * fase) / k for k in range(1, 8) if k * 220 < sample_rate / 2)
+    return x * envolvente
+
+
+def _bloque(tipo, t, sample_rate, rng, segundos):
+    n = len(t)
+    if tipo == "tono":
+        return 0.3 * np.sin(2 * np.pi * 440 * t)
+    if tipo == "silencio":
+        return np.zeros(n)
+    if tipo == "rafagas":
+        return 0.3 * np.sin(2 * np.pi * 300 * t) * ((t % 2.7) < 0.4)
+    if tipo == "umbral":
+        return rng.normal(0, 10 ** (-35 / 20), n)
+    if tipo == "mixto":  # ruido con cortes aleatorios
+        inicio = int(t[0] * 3) if n else 0
+        cortes = rng.random(int(segundos * 3) + 1) > 0.6
+        return rng.normal(0, 0.2, n) * cortes[(t * 3).astype(int) - inicio]
+    if tipo == "ruido_rosa":
+        return _a_rms(_ruido_rosa(n, rng), -20)
+    if tipo == "voz":
+        return _a_rms(_voz(t, sample_rate, rng), -18)
+    if tipo == "zumbido":  # 50 Hz de red con armónicos, muy por debajo del umbral
+        x = sum(np.sin(2 * np.pi * 50 * k * t) / k for k in (1, 2, 3, 5))
+        return _a_rms(x + rng.normal(0, 0.05, n), -55)
+    raise ValueError(f"Tipo de señal desconocido: {tipo}")
+
+
+def generar(tipo, segundos, sample_rate=8000, canales=1, semilla=0):
+    """
+    PCM s16le de `segundos` segundos de la señal `tipo` (ver TIPOS).
+    Con más de un canal, cada canal es la misma señal con menor ganancia.
+    """
+    n = int(sample_rate * segundos)
+    salida = np.empty((n, canales), dtype="<i2")
+    ganancias = np.linspace(1, 0.5, canales)
+    paso = BLOQUE_SEG * sample_rate
+    for bloque, inicio in enumerate(range(0, n, paso)):
+        rng = np.random.default_rng([semilla, bloque] if bloque else semilla)
+        t = np.arange(inicio, min(n, inicio + paso)) / sample_rate
+        x = _bloque(tipo, t, sample_rate, rng, min(segundos - inicio / sample_rate, BLOQUE_SEG))
+        salida[inicio:inicio + len(t)] = (x[:, None] * ganancias * 32767).clip(-32768, 32767)
+    return salida.ravel().tobytes()
+
+
+def escribir_wav(path, pcm, sample_rate, canales=1):
+    with wave.open(path, "wb") as archivo:
+        archivo.setnchannels(canales)
+        archivo.setsampwidth(2)
+        archivo.setframerate(sample_rate)
+        archivo.writeframes(pcm)
+    return path
+
+
+def ffmpeg_disponible():
+    return shutil.which("ffmpeg") is not None
+
+
+def codificar(wav, codec, destino=None):
+    """
+    Comprime un WAV con FFmpeg (ver CODECS). Retorna la ruta del archivo
+    o None si FFmpeg o el códec no están disponibles.
+    """
+    destino = destino or os.path.splitext(wav)[0] + "." + codec
+    try:
+        proceso = subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+                                  "-i", wav, *CODECS[codec], destino],
+                                 stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    return destino if proceso.returncode == 0 and os.path.exists(destino) else None
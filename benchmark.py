@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Benchmark
+Mide tiempo y memoria del análisis de audio, la decodificación con FFmpeg
+y el armado del resumen sobre audio sintético generado localmente, y el
+tiempo de importar monitoreo (lo que paga cada ejecución por cron).
+No usa la red ni envía notificaciones.
+
+Uso:
+    python benchmark.py                          # matriz completa, guarda benchmark.json
+    python benchmark.py --rapido                 # sólo clips cortos
+    python benchmark.py --comparar anterior.json # marca regresiones respecto de otra corrida
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import audio_sintetico
+import historial
+import monitoreo
+from captura import capturar_pcm
+from streams import Stream
+
+# (tipo de señal, segundos, sample rate) para el análisis de PCM en memoria
+MATRIZ_ANALISIS = (
+    [(tipo, 10, 8000) for tipo in audio_sintetico.TIPOS]
+    + [(tipo, segundos, 8000) for tipo in ("voz", "ruido_rosa", "silencio") for segundos in (60, 600, 3600)]
+    + [("voz", segundos, sample_rate) for sample_rate in (22050, 44100) for segundos in (10, 60, 600)]
+    + [("voz", 3600, 22050)]
+)
+
+# Duraciones de los archivos para analizar_audio() y la decodificación
+DURACIONES_ARCHIVO = (10, 60, 600, 3600)
+
+# (cantidad de streams, días de historial) para el resumen
+MATRIZ_RESUMEN = ((2, 7), (20, 7), (100, 2))
+
+LIMITE_RAPIDO_SEG = 60
+
+# Módulos que el arranque por cron no debería cargar (se importan al usarse)
+MODULOS_PESADOS = ("numpy", "requests", "pydub", "dotenv", "email.mime.multipart", "http.server", "multiprocessing")
+
+
+def medir(funcion, repeticiones=3):
+    """
+    Ejecuta `funcion` `repeticiones` veces y mide el tiempo; luego una vez
+    más con tracemalloc para el pico de memoria (sólo memoria de Python/NumPy)
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "segundos": min(tiempos),
+        "mediana": statistics.median(tiempos),
+        "repeticiones": repeticiones,
+        "pico_mb": pico / 1024 ** 2,
+    }
+
+
+def repeticiones_para(segundos):
+    return 5 if segundos <= 60 else 2 if segundos <= 600 else 1
+
+
+def bench_analisis(casos, rapido, filtro):
+    for tipo, segundos, sample_rate in MATRIZ_ANALISIS:
+        nombre = f"analisis/{tipo}/{segundos}s/{sample_rate}Hz"
+        if (rapido and segundos > LIMITE_RAPIDO_SEG) or filtro not in nombre:
+            continue
+        pcm = audio_sintetico.generar(tipo, segundos, sample_rate)
+        casos[nombre] = dict(medir(lambda: monitoreo.analizar_pcm(pcm, sample_rate, 1),
+                                   repeticiones_para(segundos)),
+                             audio_seg=segundos)
+        informar(nombre, casos[nombre])
+
+
+def fixture(directorio, segundos, sample_rate, formato):
+    """
+    Ruta del archivo de voz sintética de `segundos` en `formato` (wav o un códec),
+    generándolo si no existe. Retorna None si el códec no está disponible.
+    """
+    wav = os.path.join(directorio, f"voz_{segundos}s_{sample_rate}.wav")
+    if not os.path.exists(wav):
+        audio_sintetico.escribir_wav(wav, audio_sintetico.generar("voz", segundos, sample_rate), sample_rate)
+    if formato == "wav":
+        return wav
+    comprimido = os.path.splitext(wav)[0] + "." + formato
+    if os.path.exists(comprimido):
+        return comprimido
+    return audio_sintetico.codificar(wav, formato, comprimido)
+
+
+def bench_archivos(casos, directorio, rapido, filtro):
+    formatos = ["wav"] + (list(audio_sintetico.CODECS) if audio_sintetico.ffmpeg_disponible() else [])
+    sample_rate = 44100
+    for formato in formatos:
+        for segundos in DURACIONES_ARCHIVO:
+            if rapido and segundos > LIMITE_RAPIDO_SEG:
+                continue
+            nombres = (f"analizar_audio/{formato}/{segundos}s", f"decodificacion/{formato}/{segundos}s")
+            if not any(filtro in nombre for nombre in nombres):
+                continue
+            path = fixture(directorio, segundos, sample_rate, formato)
+            if path is None:
+                print(f"⏭ {formato}: códec no disponible en FFmpeg, se omite")
+                break
+
+            # pydub decodifica todo el archivo a memoria (WAV sin FFmpeg)
+            if filtro in nombres[0]:
+                casos[nombres[0]] = dict(medir(lambda: monitoreo.analizar_audio(path),
+                                               repeticiones_para(segundos)), audio_seg=segundos)
+                informar(nombres[0], casos[nombres[0]])
+
+            # Camino del monitoreo: FFmpeg -> PCM por stdout
+            if filtro in nombres[1] and audio_sintetico.ffmpeg_disponible():
+                casos[nombres[1]] = dict(medir(lambda: capturar_pcm(path, segundos, monitoreo.PCM_SAMPLE_RATE,
+                                                                    monitoreo.PCM_CANALES),
+                                               repeticiones_para(segundos)), audio_seg=segundos)
+                informar(nombres[1], casos[nombres[1]])
+
+
+def historial_sintetico(path, cantidad_streams, dias, ahora, semilla=0):
+    """
+    Historial con un chequeo por minuto por stream durante `dias` días,
+    con ~2% de caídas y ~3% de silencios
+    """
+    rng = np.random.default_rng(semilla)
+    hist = historial.Historial(path)
+    streams = [Stream(f"stream{i}", f"Stream {i}", f"http://localhost/{i}", 60) for i in range(cantidad_streams)]
+    instantes = np.arange(ahora - dias * 86400, ahora, 60.0)
+    for stream in streams:
+        sorteo = rng.random(len(instantes))
+        resultados = np.where(sorteo < 0.02, historial.CAIDO,
+                              np.where(sorteo < 0.05, historial.SILENCIO, historial.OK))
+        audible = rng.uniform(10, 100, len(instantes))
+        with hist.conexion:
+            hist.conexion.executemany(
+                "INSERT INTO chequeos (stream_id, ts, resultado, porcentaje_audible) VALUES (?, ?, ?, ?)",
+                zip([stream.id] * len(instantes), instantes.tolist(), resultados.tolist(), audible.tolist()))
+    hist.reconstruir_agregados()
+    return hist, streams
+
+
+def bench_resumen(casos, directorio, rapido, filtro):
+    ahora = datetime.now().replace(hour=18, minute=5, second=0, microsecond=0)
+    for cantidad, dias in MATRIZ_RESUMEN:
+        nombre = f"resumen/{cantidad}streams/{dias}d"
+        if (rapido and cantidad > 20) or filtro not in nombre:
+            continue
+        path = os.path.join(directorio, f"historial_{cantidad}_{dias}.db")
+        hist, streams = historial_sintetico(path, cantidad, dias, ahora.timestamp())
+        try:
+            casos[nombre] = medir(lambda: monitoreo.armar_resumen(hist, streams, ahora), 5)
+            informar(nombre, casos[nombre])
+        finally:
+            hist.cerrar()
+
+
+def bench_importacion(casos, filtro, repeticiones=7):
+    """
+    `import monitoreo` en un intérprete nuevo con python -X importtime: el
+    tiempo acumulado del módulo y qué módulos pesados quedaron cargados
+    """
+    nombre = "importacion/monitoreo"
+    if filtro not in nombre:
+        return
+    codigo = f"import sys, monitoreo; print(','.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))"
+    tiempos = []
+    for _ in range(repeticiones):
+        proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], capture_output=True,
+                                 text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proceso.returncode != 0:
+            print(f"⚠️ No se pudo importar monitoreo: {proceso.stderr.strip().splitlines()[-1:]}")
+            return
+        # Líneas "import time: propio | acumulado | módulo", en microsegundos
+        for linea in proceso.stderr.splitlines():
+            partes = linea.split("|")
+            if len(partes) == 3 and partes[2].strip() == "monitoreo":
+                tiempos.append(int(partes[1]) / 1e6)
+    cargados = [modulo for modulo in proceso.stdout.strip().split(",") if modulo]
+    casos[nombre] = {"segundos": min(tiempos), "mediana": statistics.median(tiempos),
+                     "repeticiones": repeticiones, "pico_mb": 0.0, "modulos_pesados": cargados}
+    informar(nombre, casos[nombre])
+    if cargados:
+        print(f"   módulos pesados cargados al importar: {', '.join(cargados)}")
+
+
+def informar(nombre, caso):
+    print(f"⏱ {nombre:<40} {caso['segundos'] * 1000:10.1f} ms {caso['pico_mb']:9.1f} MB")
+
+
+def comparar(actual, anterior, tolerancia):
+    """
+    Imprime la relación actual/anterior de cada caso y retorna las regresiones
+    """
+    regresiones = []
+    print(f"\n{'Caso':<40}{'tiempo':>12}{'memoria':>12}")
+    for nombre, caso in actual["casos"].items():
+        previo = anterior["casos"].get(nombre)
+        if not previo:
+            continue
+        tiempo = caso["segundos"] / previo["segundos"] if previo["segundos"] else float("inf")
+        memoria = caso["pico_mb"] / previo["pico_mb"] if previo["pico_mb"] else 1.0
+        marca = ""
+        if tiempo > 1 + tolerancia or memoria > 1 + tolerancia:
+            marca = "  ❌ regresión"
+            regresiones.append(nombre)
+        print(f"{nombre:<40}{tiempo:>11.2f}x{memoria:>11.2f}x{marca}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radio Watchdog - Benchmark del análisis de audio")
+    parser.add_argument("--rapido", action="store_true", help=f"sólo clips de hasta {LIMITE_RAPIDO_SEG}s")
+    parser.add_argument("--filtro", default="", help="sólo los casos cuyo nombre contiene este texto")
+    parser.add_argument("--salida", default="benchmark.json", help="archivo JSON de resultados")
+    parser.add_argument("--fixtures", help="carpeta donde generar y reutilizar los archivos de audio")
+    parser.add_argument("--comparar", help="resultados JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo de tiempo o memoria considerado regresión (por defecto 0.2)")
+    args = parser.parse_args(argv)
+
+    directorio = args.fixtures or tempfile.mkdtemp(prefix="radiowatchdog_bench_")
+    os.makedirs(directorio, exist_ok=True)
+    if not audio_sintetico.ffmpeg_disponible():
+        print("⚠️ FFmpeg no encontrado: se omiten los códecs comprimidos y la decodificación")
+
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "ffmpeg": audio_sintetico.ffmpeg_disponible(),
+        "rapido": args.rapido,
+        "casos": {},
+    }
+    try:
+        bench_importacion(resultados["casos"], args.filtro)
+        bench_analisis(resultados["casos"], args.rapido, args.filtro)
+        bench_archivos(resultados["casos"], directorio, args.rapido, args.filtro)
+        bench_resumen(resultados["casos"], directorio, args.rapido, args.filtro)
+    finally:
+        if not args.fixtures:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        regresiones = comparar(resultados, anterior, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%})")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Integridad del bitstream
+Recorre las cabeceras de frame de MP3 (MPEG-1/2/2.5, capas I-III) y de
+AAC en ADTS directamente sobre los bytes comprimidos, sin decodificar.
+Detecta lo que el análisis de volumen no ve: caída del bitrate, pérdida
+de sincronía entre frames, microcortes y cambios de formato (frecuencia
+de muestreo, canales o códec) tras un reinicio del encoder.
+
+Uso:
+    python bitstream.py fragmento.mp3
+"""
+
+import json
+import sys
+from collections import namedtuple
+from dataclasses import asdict, dataclass, field
+
+# Bitrates MP3 en kbps por (versión MPEG-1 o no, capa)
+_BITRATES_MP3 = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Frecuencias por bits de versión: 0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1
+_FRECUENCIAS_MP3 = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+_VERSIONES_MP3 = {0: "2.5", 2: "2", 3: "1"}
+_FRECUENCIAS_AAC = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+# Máximo de cambios de formato que se detallan
+MAX_CAMBIOS = 10
+
+Frame = namedtuple("Frame", "formato version largo muestras sample_rate canales kbps")
+
+
+@dataclass
+class ResultadoBitstream:
+    formato: str = None           # "mp3" o "aac" (del primer frame)
+    version: str = None           # p. ej. "MPEG-1 capa III" o "AAC LC"
+    sample_rate: int = None
+    canales: int = None
+    frames: int = 0
+    bytes: int = 0
+    bytes_audio: int = 0          # bytes dentro de frames completos
+    bytes_iniciales: int = 0      # antes del primer frame (etiquetas o frame cortado)
+    bytes_perdidos: int = 0       # entre frames, al perder la sincronía
+    errores_sync: int = 0
+    segundos: float = 0.0         # duración del audio de los frames completos
+    bitrate_kbps: float = None    # efectivo: bytes de audio / duración
+    kbps_min: int = None          # nominal por frame
+    kbps_max: int = None
+    cambios: list = field(default_factory=list)
+
+    @property
+    def continuidad(self):
+        """
+        Fracción de los bytes, desde el primer frame, que forman parte de frames válidos
+        """
+        total = self.bytes_audio + self.bytes_perdidos
+        return self.bytes_audio / total if total else 0.0
+
+    def descripcion(self):
+        if not self.formato:
+            return None
+        return f"{self.formato} {self.sample_rate}Hz {self.canales}ch"
+
+    def como_dict(self):
+        datos = asdict(self)
+        datos["continuidad"] = round(self.continuidad, 4)
+        datos["segundos"] = round(self.segundos, 3)
+        if self.bitrate_kbps is not None:
+            datos["bitrate_kbps"] = round(self.bitrate_kbps, 1)
+        return datos
+
+
+def _frame_mp3(datos, i):
+    b1, b2, b3 = datos[i + 1], datos[i + 2], datos[i + 3]
+    version = (b1 >> 3) & 3
+    capa = 4 - ((b1 >> 1) & 3)
+    indice_bitrate = b2 >> 4
+    indice_frecuencia = (b2 >> 2) & 3
+    if version == 1 or capa == 4 or indice_bitrate in (0, 15) or indice_frecuencia == 3:
+        return None  # reservado, o bitrate libre (no se puede calcular el largo)
+    mpeg1 = version == 3
+    kbps = _BITRATES_MP3[(mpeg1, capa)][indice_bitrate]
+    sample_rate = _FRECUENCIAS_MP3[version][indice_frecuencia]
+    relleno = (b2 >> 1) & 1
+    if capa == 1:
+        largo, muestras = (12 * kbps * 1000 // sample_rate + relleno) * 4, 384
+    elif capa == 2 or mpeg1:
+        largo, muestras = 144 * kbps * 1000 // sample_rate + relleno, 1152
+    else:
+        largo, muestras = 72 * kbps * 1000 // sample_rate + relleno, 576
+    canales = 1 if b3 >> 6 == 3 else 2
+    return Frame("mp3", f"MPEG-{_VERSIONES_MP3[version]} capa {'I' * capa}", largo, muestras,
+                 sample_rate, canales, kbps)
+
+
+def _frame_adts(datos, i):
+    if i + 7 > len(datos):
+        return None
+    b2, b3, b4, b5, b6 = datos[i + 2], datos[i + 3], datos[i + 4], datos[i + 5], datos[i + 6]
+    indice_frecuencia = (b2 >> 2) & 15
+    if indice_frecuencia >= len(_FRECUENCIAS_AAC):
+        return None
+    largo = ((b3 & 3) << 11) | (b4 << 3) | (b5 >> 5)
+    cabecera = 7 if datos[i + 1] & 1 else 9
+    if largo <= cabecera:
+        return None
+    sample_rate = _FRECUENCIAS_AAC[indice_frecuencia]
+    muestras = 1024 * ((b6 & 3) + 1)
+    canales = ((b2 & 1) << 2) | (b3 >> 6)
+    perfil = ("AAC Main", "AAC LC", "AAC SSR", "AAC LTP")[b2 >> 6]
+    kbps = round(largo * 8 * sample_rate / muestras / 1000)
+    return Frame("aac", perfil, largo, muestras, sample_rate, canales, kbps)
+
+
+def leer_frame(datos, i):
+    """
+    Cabecera de frame MP3 o ADTS en la posición i, como Frame, o None
+    """
+    if i + 4 > len(datos) or datos[i] != 0xFF:
+        return None
+    b1 = datos[i + 1]
+    if b1 & 0xF6 == 0xF0:  # sync de 12 bits y capa 00: ADTS
+        return _frame_adts(datos, i)
+    if b1 & 0xE0 == 0xE0:
+        return _frame_mp3(datos, i)
+    return None
+
+
+def _compatibles(a, b):
+    return a.formato == b.formato and a.version == b.version and a.sample_rate == b.sample_rate
+
+
+def _sincronizar(datos, i):
+    """
+    Primera posición desde i con un frame válido seguido de otro compatible
+    (o del final de los datos). Retorna (posición, Frame) o (len(datos), None).
+    """
+    n = len(datos)
+    while True:
+        i = datos.find(b"\xff", i)
+        if i < 0:
+            return n, None
+        frame = leer_frame(datos, i)
+        if frame is not None:
+            siguiente = i + frame.largo
+            if siguiente + 4 > n:
+                return i, frame
+            proximo = leer_frame(datos, siguiente)
+            if proximo is not None and _compatibles(frame, proximo):
+                return i, frame
+        i += 1
+
+
+def _saltar_id3(datos):
+    if len(datos) >= 10 and datos[:3] == b"ID3":
+        tamano = (datos[6] & 0x7F) << 21 | (datos[7] & 0x7F) << 14 | (datos[8] & 0x7F) << 7 | (datos[9] & 0x7F)
+        return 10 + tamano + (10 if datos[5] & 0x10 else 0)
+    return 0
+
+
+def analizar(datos):
+    """
+    Recorre los frames de un fragmento MP3 o ADTS/AAC (que puede empezar
+    y terminar a mitad de un frame) y retorna un ResultadoBitstream
+    """
+    datos = bytes(datos)
+    n = len(datos)
+    resultado = ResultadoBitstream(bytes=n)
+    i, frame = _sincronizar(datos, _saltar_id3(datos))
+    resultado.bytes_iniciales = i
+    anterior = None
+    while frame is not None:
+        if i + frame.largo > n:
+            break  # el último frame quedó cortado
+        if anterior is None:
+            resultado.formato, resultado.version = frame.formato, frame.version
+            resultado.sample_rate, resultado.canales = frame.sample_rate, frame.canales
+        elif (frame.formato, frame.version, frame.sample_rate, frame.canales) != \
+                (anterior.formato, anterior.version, anterior.sample_rate, anterior.canales):
+            if len(resultado.cambios) < MAX_CAMBIOS:
+                resultado.cambios.append({
+                    "byte": i,
+                    "de": f"{anterior.formato} {anterior.version} {anterior.sample_rate}Hz {anterior.canales}ch",
+                    "a": f"{frame.formato} {frame.version} {frame.sample_rate}Hz {frame.canales}ch",
+                })
+        resultado.frames += 1
+        resultado.bytes_audio += frame.largo
+        resultado.segundos += frame.muestras / frame.sample_rate
+        resultado.kbps_min = min(frame.kbps, resultado.kbps_min or frame.kbps)
+        resultado.kbps_max = max(frame.kbps, resultado.kbps_max or 0)
+        anterior = frame
+
+        i += frame.largo
+        frame = leer_frame(datos, i)
+        if frame is None and i + 4 <= n and not (datos[i:i + 3] == b"TAG" and n - i == 128):
+            # Se perdió la sincronía: buscar el próximo frame confiable
+            resultado.errores_sync += 1
+            desde = i
+            i, frame = _sincronizar(datos, i + 1)
+            resultado.bytes_perdidos += min(i, n) - desde
+
+    if resultado.segundos:
+        resultado.bitrate_kbps = resultado.bytes_audio * 8 / resultado.segundos / 1000
+    return resultado
+
+
+def anomalias(resultado, formato_esperado=None, kbps_esperado=None):
+    """
+    Problemas del bitstream como lista de textos (vacía si está sano).
+    Con kbps_esperado (por ejemplo la cabecera icy-br), un bitrate efectivo
+    de menos de la mitad se considera una caída de bitrate.
+    """
+    problemas = []
+    if not resultado.frames:
+        return [f"sin frames {formato_esperado or 'MP3/AAC'} válidos en {resultado.bytes} bytes"]
+    if formato_esperado and resultado.formato != formato_esperado:
+        problemas.append(f"se esperaba {formato_esperado} y llega {resultado.formato}")
+    if resultado.errores_sync:
+        problemas.append(f"{resultado.errores_sync} pérdidas de sincronía ({resultado.bytes_perdidos} bytes)")
+    if resultado.cambios:
+        problemas.append(f"cambio de formato: {resultado.cambios[0]['de']} -> {resultado.cambios[0]['a']}")
+    if kbps_esperado and resultado.bitrate_kbps is not None and resultado.bitrate_kbps < kbps_esperado / 2:
+        problemas.append(f"bitrate {resultado.bitrate_kbps:.0f} kbps (se anuncian {kbps_esperado})")
+    return problemas
+
+
+def analizar_archivo(path):
+    with open(path, "rb") as archivo:
+        return analizar(archivo.read())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    resultado = analizar_archivo(sys.argv[1])
+    print(json.dumps(resultado.como_dict(), indent=2, ensure_ascii=False))
+    for problema in anomalias(resultado):
+        print(f"⚠️ {problema}")
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Calidad de audio
+Calcula en una sola pasada sobre el PCM, de a tramas de 100 ms con una
+FFT por trama:
+- sonoridad integrada (EBU R128 / ITU-R BS.1770, en LUFS)
+- pico y proporción de muestras recortadas
+- offset de continua (DC)
+- planitud espectral (cerca de 1 = ruido, cerca de 0 = tono) y
+  concentración de la energía en un solo bin (zumbido o portadora)
+- desbalance entre canales y correlación L/R (cerca de -1 = fase invertida,
+  el mono se cancela)
+La ponderación K de BS.1770 se aplica en frecuencia sobre la misma FFT, sin
+filtros IIR. Con frecuencias de muestreo bajas (8 kHz) la sonoridad es una
+aproximación: falta la parte alta del espectro.
+"""
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from analisis import muestras_pcm
+
+# Métricas que admiten reglas de alerta (ver evaluar)
+METRICAS = ("lufs", "pico_dbfs", "recorte", "dc_offset", "planitud", "concentracion",
+            "desbalance_db", "correlacion")
+
+TRAMA_MS = 100
+# Tramas más silenciosas que esto no cuentan para la planitud espectral
+UMBRAL_ESPECTRO_DBFS = -60
+
+# Filtros de ponderación K de BS.1770 a 48 kHz: pre-filtro y RLB
+_K_48000 = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+
+@dataclass
+class ResultadoCalidad:
+    segundos: float = 0.0
+    lufs: float = None
+    pico_dbfs: float = None
+    recorte: float = 0.0          # fracción de muestras en fondo de escala
+    dc_offset: float = 0.0        # fracción de fondo de escala, el peor canal
+    planitud: float = None
+    concentracion: float = None
+    desbalance_db: float = None   # sólo estéreo
+    correlacion: float = None     # sólo estéreo
+
+    def como_dict(self):
+        return {clave: round(valor, 6) if isinstance(valor, float) else valor
+                for clave, valor in asdict(self).items()}
+
+
+def _ponderacion_k(frecuencias):
+    """
+    |H(f)|² de la ponderación K, evaluada con los coeficientes de 48 kHz
+    """
+    z = np.exp(-1j * 2 * np.pi * np.minimum(frecuencias, 24000) / 48000)
+    respuesta = np.ones(len(frecuencias), dtype=complex)
+    for b, a in _K_48000:
+        respuesta *= (b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)
+    return np.abs(respuesta) ** 2
+
+
+def _db(valor, minimo=-120.0):
+    with np.errstate(divide="ignore"):
+        return max(minimo, float(10 * np.log10(valor))) if valor > 0 else None
+
+
+class AnalizadorCalidad:
+    """
+    Acumula las métricas bloque a bloque: agregar() con cada bloque PCM y
+    resultado() al final. Sólo guarda sumas y una energía por trama.
+    """
+
+    def __init__(self, sample_rate, canales=1, sample_width=2):
+        self.sample_rate = sample_rate
+        self.canales = canales
+        self.sample_width = sample_width
+        self.escala = 2 ** (sample_width * 8) / 2
+        self.trama = max(1, sample_rate * TRAMA_MS // 1000)
+        frecuencias = np.fft.rfftfreq(self.trama, 1 / sample_rate)
+        # Parseval sobre rfft: los bins intermedios representan a dos del espectro completo
+        pares = np.full(len(frecuencias), 2.0)
+        pares[0] = 1
+        if self.trama % 2 == 0:
+            pares[-1] = 1
+        self.peso_k = pares * _ponderacion_k(frecuencias) / self.trama ** 2
+        self.hann = np.hanning(self.trama)
+        self.pendiente = np.zeros((0, canales))
+
+        self.n = 0
+        self.suma = np.zeros(canales)
+        self.suma2 = np.zeros(canales)
+        self.suma_lr = 0.0
+        self.pico = 0.0
+        self.recortadas = 0
+        self.energias_k = []
+        self.planitudes = []
+        self.concentraciones = []
+
+    def agregar(self, pcm):
+        crudas = muestras_pcm(pcm, self.sample_width)
+        crudas = crudas[:len(crudas) - len(crudas) % self.canales].reshape(-1, self.canales)
+        if not len(crudas):
+            return
+        self.recortadas += int(np.count_nonzero(np.abs(crudas.astype(np.int64)) >= self.escala - 1))
+        x = crudas / self.escala
+        self.n += len(x)
+        self.suma += x.sum(axis=0)
+        self.suma2 += np.einsum("ij,ij->j", x, x)
+        if self.canales == 2:
+            self.suma_lr += float(x[:, 0] @ x[:, 1])
+        self.pico = max(self.pico, float(np.abs(x).max()))
+
+        datos = np.concatenate((self.pendiente, x)) if len(self.pendiente) else x
+        completas = len(datos) // self.trama
+        self.pendiente = datos[completas * self.trama:]
+        if completas:
+            self._tramas(datos[:completas * self.trama].reshape(completas, self.trama, self.canales))
+
+    def _tramas(self, tramas):
+        # Sonoridad: energía ponderada K de cada trama, sumada entre canales
+        espectro = np.abs(np.fft.rfft(tramas, axis=1)) ** 2
+        self.energias_k.append(np.einsum("kfc,f->k", espectro, self.peso_k))
+
+        # Planitud y concentración sobre la mezcla mono, sólo en tramas con señal
+        mono = tramas.mean(axis=2)
+        sonoras = np.sqrt((mono ** 2).mean(axis=1)) > 10 ** (UMBRAL_ESPECTRO_DBFS / 20)
+        if not sonoras.any():
+            return
+        potencia = np.abs(np.fft.rfft(mono[sonoras] * self.hann, axis=1))[:, 1:] ** 2 + 1e-20
+        self.planitudes.append(np.exp(np.log(potencia).mean(axis=1)) / potencia.mean(axis=1))
+        self.concentraciones.append(potencia.max(axis=1) / potencia.sum(axis=1))
+
+    def _lufs(self):
+        if not self.energias_k:
+            return None
+        energias = np.concatenate(self.energias_k)
+        por_trama = 400 // TRAMA_MS
+        if len(energias) < por_trama:
+            return None
+        # Bloques de 400 ms con 75% de solapamiento, con compuerta absoluta y relativa
+        bloques = np.convolve(energias, np.ones(por_trama) / por_trama, mode="valid")
+        with np.errstate(divide="ignore"):
+            sonoridad = -0.691 + 10 * np.log10(bloques)
+        bloques = bloques[sonoridad > -70]
+        if not len(bloques):
+            return None
+        relativo = -0.691 + 10 * np.log10(bloques.mean()) - 10
+        bloques = bloques[-0.691 + 10 * np.log10(bloques) > relativo]
+        return float(-0.691 + 10 * np.log10(bloques.mean()))
+
+    def resultado(self):
+        resultado = ResultadoCalidad(segundos=self.n / self.sample_rate)
+        if not self.n:
+            return resultado
+        resultado.lufs = self._lufs()
+        resultado.pico_dbfs = _db(self.pico ** 2)
+        resultado.recorte = self.recortadas / (self.n * self.canales)
+        resultado.dc_offset = float(np.abs(self.suma / self.n).max())
+        if self.planitudes:
+            resultado.planitud = float(np.concatenate(self.planitudes).mean())
+            resultado.concentracion = float(np.concatenate(self.concentraciones).mean())
+        if self.canales == 2 and self.suma2.all():
+            izquierdo, derecho = self.suma2
+            resultado.desbalance_db = abs(float(10 * np.log10(izquierdo / derecho)))
+            resultado.correlacion = float(self.suma_lr / np.sqrt(izquierdo * derecho))
+        return resultado
+
+
+def medir(pcm, sample_rate, canales=1, sample_width=2):
+    """
+    Métricas de calidad de un buffer PCM completo
+    """
+    analizador = AnalizadorCalidad(sample_rate, canales, sample_width)
+    analizador.agregar(pcm)
+    return analizador.resultado()
+
+
+def validar_reglas(reglas, origen="reglas"):
+    """
+    Las reglas son {métrica: {"min": valor, "max": valor}} (o None para
+    desactivar una regla global). Lanza ValueError si no son válidas.
+    """
+    if not isinstance(reglas, dict):
+        raise ValueError(f"{origen}: se esperaba un objeto {{métrica: {{min, max}}}}")
+    for metrica, limites in reglas.items():
+        if metrica not in METRICAS:
+            raise ValueError(f"{origen}: métrica desconocida '{metrica}' (válidas: {', '.join(METRICAS)})")
+        if limites is None:
+            continue
+        if (not isinstance(limites, dict) or not limites or set(limites) - {"min", "max"}
+                or any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in limites.values())):
+            raise ValueError(f"{origen}: los límites de '{metrica}' deben ser {{\"min\": x, \"max\": y}} numéricos")
+        if "min" in limites and "max" in limites and limites["min"] > limites["max"]:
+            raise ValueError(f"{origen}: el mínimo de '{metrica}' es mayor que el máximo")
+    return reglas
+
+
+def combinar_reglas(globales, propias):
+    """
+    Reglas de un stream: las globales con las del stream por encima
+    """
+    reglas = dict(globales or {})
+    reglas.update(propias or {})
+    return {metrica: limites for metrica, limites in reglas.items() if limites}
+
+
+def evaluar(resultado, reglas):
+    """
+    Lista de reglas que no se cumplen, como textos (vacía si todo está bien)
+    """
+    problemas = []
+    for metrica, limites in reglas.items():
+        valor = getattr(resultado, metrica)
+        if valor is None:
+            continue
+        if "min" in limites and valor < limites["min"]:
+            problemas.append(f"{metrica} {valor:.3g} < {limites['min']}")
+        if "max" in limites and valor > limites["max"]:
+            problemas.append(f"{metrica} {valor:.3g} > {limites['max']}")
+    return problemas
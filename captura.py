@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Captura de audio
+Lanza un único proceso FFmpeg que decodifica el stream a PCM y lo entrega
+por stdout, sin archivos temporales ni un segundo decodificado.
+Cada captura puede correr con plazos (conexión, inactividad y total): si
+se vencen, FFmpeg se mata junto con su grupo de procesos y la captura
+termina como colgada.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+# PCM signed 16 bits little-endian
+SAMPLE_WIDTH = 2
+
+
+class Colgado(Exception):
+    """
+    La captura superó alguno de sus plazos. `motivo` indica cuál.
+    """
+
+    def __init__(self, motivo):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+
+@dataclass
+class Plazos:
+    conexion: float = 10     # segundos hasta el primer audio decodificado
+    inactividad: float = 5   # segundos sin recibir datos una vez conectado
+    total: float = 30        # segundos de toda la captura
+    limite: float = None     # instante (time.monotonic) en que vence el ciclo, si lo hay
+
+
+def comando_pcm(stream_url, duracion=10, sample_rate=8000, canales=1, timeout_red=None):
+    """
+    Arma el comando FFmpeg que decodifica `duracion` segundos del stream a PCM por stdout.
+    Con duracion=None decodifica sin límite (monitoreo continuo).
+    Con timeout_red, FFmpeg abandona si una conexión o lectura de red tarda más (segundos).
+    """
+    limite = ["-t", str(duracion)] if duracion is not None else []
+    red = ["-rw_timeout", str(int(timeout_red * 1_000_000))] if timeout_red else []
+    return [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        *red,
+        "-i", stream_url,
+        *limite,
+        "-vn", "-ac", str(canales), "-ar", str(sample_rate),
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "pipe:1",
+    ]
+
+
+def lanzar(comando, **kwargs):
+    """
+    Popen en un grupo de procesos propio, para poder matar a FFmpeg y a sus hijos juntos
+    """
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    return subprocess.Popen(comando, stdin=subprocess.DEVNULL, **kwargs)
+
+
+def terminar(proceso):
+    """
+    Mata el proceso y su grupo si sigue vivo
+    """
+    if proceso.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            proceso.kill()
+        else:
+            os.killpg(proceso.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class _Vigilante:
+    """
+    Hilo que mata la captura si vence alguno de los plazos
+    """
+
+    def __init__(self, proceso, plazos):
+        self.proceso = proceso
+        self.plazos = plazos
+        self.inicio = time.monotonic()
+        self.ultimo_dato = None
+        self.procesando = False  # esperando a procesar(): no cuenta como inactividad de la red
+        self.motivo = None
+        self.terminado = threading.Event()
+        self.hilo = threading.Thread(target=self._vigilar, name="vigilante-captura", daemon=True)
+        self.hilo.start()
+
+    def dato(self):
+        self.ultimo_dato = time.monotonic()
+
+    def detener(self):
+        self.terminado.set()
+
+    def _vencido(self):
+        ahora = time.monotonic()
+        if self.plazos.limite is not None and ahora > self.plazos.limite:
+            return "plazo del ciclo vencido"
+        if ahora - self.inicio > self.plazos.total:
+            return f"más de {self.plazos.total:g}s en total"
+        if self.ultimo_dato is None and ahora - self.inicio > self.plazos.conexion:
+            return f"sin audio a los {self.plazos.conexion:g}s de conectar"
+        if self.ultimo_dato is not None and not self.procesando and \
+                ahora - self.ultimo_dato > self.plazos.inactividad:
+            return f"sin datos durante {self.plazos.inactividad:g}s"
+        return None
+
+    def _vigilar(self):
+        while not self.terminado.wait(0.1):
+            motivo = self._vencido()
+            if motivo:
+                self.motivo = motivo
+                terminar(self.proceso)
+                return
+
+
+def capturar_pcm(stream_url, duracion=10, sample_rate=8000, canales=1, fases=None, plazos=None):
+    """
+    Descarga y decodifica un fragmento del stream directamente a memoria.
+    Retorna los bytes PCM o None si no se pudo acceder al stream.
+    Si se pasa el dict `fases`, guarda en "captura" los segundos que tardó.
+    Con `plazos`, lanza Colgado si alguno se vence.
+    """
+    inicio = time.perf_counter()
+    bloques = []
+    recibidos = sondear_pcm(stream_url, lambda bloque: bloques.append(bloque),
+                            duracion, sample_rate, canales, plazos=plazos)
+    if fases is not None:
+        fases["captura"] = time.perf_counter() - inicio
+    return b"".join(bloques) if recibidos is not None else None
+
+
+def sondear_pcm(stream_url, procesar, duracion=10, sample_rate=8000, canales=1, paso_seg=0.25, fases=None,
+                plazos=None):
+    """
+    Decodifica el stream de a bloques de `paso_seg` segundos y llama a
+    procesar(bloque) con cada uno. Si procesar retorna True, corta la
+    descarga sin esperar al final del fragmento.
+    Retorna los bytes recibidos, o None si no se pudo acceder al stream.
+    Si se pasa el dict `fases`, guarda los segundos hasta el primer bloque
+    ("primer_byte": conexión, respuesta del servidor y arranque del
+    decodificador), esperando el resto del audio ("captura") y dentro de
+    procesar ("procesamiento").
+    Con `plazos`, FFmpeg se mata al vencer alguno y se lanza Colgado.
+    """
+    inicio = time.perf_counter()
+    primer_bloque = None
+    procesando = 0.0
+    timeout_red = min(plazos.conexion, plazos.inactividad) if plazos else None
+    try:
+        proceso = lanzar(comando_pcm(stream_url, duracion, sample_rate, canales, timeout_red),
+                         stdout=subprocess.PIPE)
+    except OSError:
+        return None
+    vigilante = _Vigilante(proceso, plazos) if plazos else None
+
+    frame_width = SAMPLE_WIDTH * canales
+    tamano = max(1, int(paso_seg * sample_rate)) * frame_width
+    pendiente = bytearray()
+    recibidos = 0
+    cortado = False
+    try:
+        while not cortado:
+            # read1 retorna apenas hay datos: el vigilante ve llegar incluso un goteo lento
+            datos = proceso.stdout.read1(tamano)
+            if datos:
+                if vigilante:
+                    vigilante.dato()
+                pendiente += datos
+                if len(pendiente) < tamano:
+                    continue
+            # Bloques completos, o lo que quede (en frames enteros) al terminar
+            fin = len(pendiente) - len(pendiente) % (tamano if datos else frame_width)
+            if not fin:
+                break
+            if vigilante:
+                vigilante.procesando = True
+            for desde in range(0, fin, tamano):
+                bloque = bytes(pendiente[desde:min(fin, desde + tamano)])
+                if primer_bloque is None:
+                    primer_bloque = time.perf_counter() - inicio
+                recibidos += len(bloque)
+                antes = time.perf_counter()
+                listo = procesar(bloque)
+                procesando += time.perf_counter() - antes
+                if listo:
+                    cortado = True
+                    break
+            if vigilante:
+                vigilante.dato()
+                vigilante.procesando = False
+            del pendiente[:fin]
+            if not datos:
+                break
+    finally:
+        if vigilante:
+            vigilante.detener()
+        terminar(proceso)
+        proceso.stdout.close()
+        proceso.wait()
+
+    if fases is not None:
+        total = time.perf_counter() - inicio
+        fases["primer_byte"] = primer_bloque if primer_bloque is not None else total
+        fases["captura"] = max(0.0, total - fases["primer_byte"] - procesando)
+        fases["procesamiento"] = procesando
+
+    if vigilante and vigilante.motivo and not cortado:
+        raise Colgado(vigilante.motivo)
+    if not recibidos or (not cortado and proceso.returncode != 0):
+        return None
+    return recibidos
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Clips de audio para las alertas
+Cada stream conserva sus últimos segundos de audio recibido en un buffer
+circular preasignado, comprimido con ley μ a 8 bits por muestra (la mitad
+que el PCM de 16 bits). La memoria por stream es fija y se conoce de
+antemano: segundos × sample rate × canales bytes. Escribir no reserva
+memoria: cada bloque se codifica directamente sobre el buffer.
+Al alertar, el contenido se guarda como WAV para escuchar qué pasó.
+"""
+
+import os
+import re
+import threading
+import time
+import wave
+from datetime import datetime
+
+import numpy as np
+
+from captura import SAMPLE_WIDTH
+
+MU = 255
+
+# posición de escritura y muestras escritas, al comienzo del archivo mapeado
+CABECERA = 16
+
+# Muestras que se codifican por vez, con un buffer de índices por hilo
+PASO = 4096
+_hilo = threading.local()
+
+
+def _tablas():
+    """
+    Tablas de ley μ: código de 8 bits por cada muestra int16 (indexada por
+    sus bits como uint16) y muestra int16 por cada código
+    """
+    lineal = np.arange(-32768, 32768)
+    x = lineal / 32768
+    y = np.sign(x) * np.log1p(MU * np.abs(x)) / np.log1p(MU)
+    codificar = np.empty(65536, dtype=np.uint8)
+    codificar[lineal.astype(np.int16).view(np.uint16)] = np.round((y + 1) / 2 * 255).astype(np.uint8)
+    y = np.arange(256) / 255 * 2 - 1
+    decodificar = np.round(np.sign(y) * np.expm1(np.abs(y) * np.log1p(MU)) / MU * 32767).astype(np.int16)
+    return codificar, decodificar
+
+
+CODIFICAR, DECODIFICAR = _tablas()
+
+
+def _codificar(muestras, salida):
+    """
+    Codifica `muestras` (uint16) sobre `salida` sin reservar memoria:
+    np.take necesita índices intp, que se copian de a PASO muestras
+    """
+    indices = getattr(_hilo, "indices", None)
+    if indices is None:
+        indices = _hilo.indices = np.empty(PASO, dtype=np.intp)
+    for desde in range(0, len(muestras), PASO):
+        tramo = muestras[desde:desde + PASO]
+        n = len(tramo)
+        np.copyto(indices[:n], tramo)
+        np.take(CODIFICAR, indices[:n], out=salida[desde:desde + n], mode="clip")
+
+
+class BufferClip:
+    """
+    Últimas `capacidad` muestras de un stream, codificadas con ley μ.
+    Con `archivo`, el buffer es un archivo mapeado en memoria en lugar de
+    memoria del proceso, y se retoma si ya existe (entre ejecuciones por cron).
+    """
+
+    def __init__(self, capacidad, archivo=None):
+        if archivo is None:
+            mapa = np.zeros(CABECERA + capacidad, dtype=np.uint8)
+        else:
+            existe = os.path.exists(archivo) and os.path.getsize(archivo) == CABECERA + capacidad
+            mapa = np.memmap(archivo, dtype=np.uint8, mode="r+" if existe else "w+",
+                             shape=(CABECERA + capacidad,))
+        self.mapa = mapa
+        self.estado = mapa[:CABECERA].view(np.uint64)
+        self.datos = mapa[CABECERA:]
+        self.lock = threading.Lock()
+
+    def escribir(self, pcm):
+        """
+        Agrega PCM s16le (bytes, bytearray o memoryview)
+        """
+        muestras = np.frombuffer(pcm, dtype="<u2")
+        capacidad = len(self.datos)
+        if len(muestras) > capacidad:
+            muestras = muestras[-capacidad:]
+        n = len(muestras)
+        with self.lock:
+            posicion = int(self.estado[0])
+            primera = min(n, capacidad - posicion)
+            _codificar(muestras[:primera], self.datos[posicion:posicion + primera])
+            _codificar(muestras[primera:], self.datos[:n - primera])
+            self.estado[0] = (posicion + n) % capacidad
+            self.estado[1] += n
+
+    def muestras(self):
+        """
+        Lo escrito, en orden cronológico y decodificado a int16
+        """
+        with self.lock:
+            posicion, escritas = int(self.estado[0]), int(self.estado[1])
+            if escritas < len(self.datos):
+                codigos = self.datos[:posicion].copy()
+            else:
+                codigos = np.concatenate((self.datos[posicion:], self.datos[:posicion]))
+        return DECODIFICAR[codigos]
+
+    def cerrar(self):
+        if isinstance(self.mapa, np.memmap):
+            self.mapa.flush()
+
+
+class Clips:
+    """
+    Un BufferClip de `segundos` por stream, creado con el primer audio que
+    llega del stream. Con `mapear`, los buffers son archivos en
+    `carpeta`/buffers; los clips se guardan en `carpeta`.
+    """
+
+    def __init__(self, segundos, sample_rate, canales, carpeta, mapear=False):
+        self.sample_rate = sample_rate
+        self.canales = canales
+        self.capacidad = int(segundos * sample_rate) * canales
+        self.carpeta = carpeta
+        self.mapear = mapear
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def buffer(self, stream_id):
+        with self.lock:
+            if stream_id not in self.buffers:
+                archivo = None
+                if self.mapear:
+                    archivo = self._archivo(stream_id)
+                    os.makedirs(os.path.dirname(archivo), exist_ok=True)
+                self.buffers[stream_id] = BufferClip(self.capacidad, archivo)
+            return self.buffers[stream_id]
+
+    def _archivo(self, stream_id):
+        return os.path.join(self.carpeta, "buffers", f"{_nombre_archivo(stream_id)}.mulaw")
+
+    def guardar(self, stream_id, ts=None):
+        """
+        Guarda como WAV el audio conservado del stream. Retorna la ruta, o
+        None si todavía no llegó audio del stream.
+        """
+        with self.lock:
+            buffer = self.buffers.get(stream_id)
+        # Audio de ejecuciones anteriores (cron) aunque en esta no haya llegado nada
+        if buffer is None and self.mapear and os.path.exists(self._archivo(stream_id)):
+            buffer = self.buffer(stream_id)
+        muestras = buffer.muestras() if buffer is not None else ()
+        if not len(muestras):
+            return None
+        ts = ts if ts is not None else time.time()
+        os.makedirs(self.carpeta, exist_ok=True)
+        ruta = os.path.join(self.carpeta,
+                            f"{_nombre_archivo(stream_id)}_{datetime.fromtimestamp(ts):%Y%m%d-%H%M%S}.wav")
+        with wave.open(ruta, "wb") as archivo:
+            archivo.setnchannels(self.canales)
+            archivo.setsampwidth(SAMPLE_WIDTH)
+            archivo.setframerate(self.sample_rate)
+            archivo.writeframes(muestras.astype("<i2").tobytes())
+        return ruta
+
+    def cerrar(self):
+        with self.lock:
+            for buffer in self.buffers.values():
+                buffer.cerrar()
+
+
+def _nombre_archivo(stream_id):
+    return re.sub(r"[^\w.-]+", "_", stream_id)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Cola de chequeos
+Con muchos streams en el mismo servidor Icecast, arrancar todos los
+chequeos en el mismo segundo es una avalancha de conexiones que puede
+superar el límite de oyentes del servidor: el propio monitor provoca caídas.
+- Cada stream tiene una fase fija dentro de su intervalo, derivada de su id
+  (jitter determinista): los chequeos se reparten a lo largo del intervalo
+  y mantienen el mismo ritmo entre reinicios.
+- Por host se limitan las conexiones simultáneas y se espacian los arranques.
+- Entre los chequeos listos para arrancar va primero el de mayor prioridad
+  y, a igual prioridad, el de vencimiento más próximo (el más atrasado).
+"""
+
+import itertools
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+# Clases de prioridad: nombre -> (orden en la cola, factor del intervalo por defecto)
+PRIORIDADES = {"alta": (0, 0.5), "normal": (1, 1.0), "baja": (2, 2.0)}
+
+
+def host(url):
+    """
+    Servidor de una URL ("host:puerto"), o None si no es una URL con host
+    """
+    partes = urlsplit(url)
+    if not partes.hostname:
+        return None
+    return f"{partes.hostname}:{partes.port}" if partes.port else partes.hostname
+
+
+def fase(clave, intervalo):
+    """
+    Desfase fijo de `clave` dentro de `intervalo`, en segundos [0, intervalo)
+    """
+    return zlib.crc32(clave.encode("utf-8")) / 2 ** 32 * intervalo
+
+
+def proximo_inicio(clave, intervalo, ahora=None):
+    """
+    Primer instante (epoch) desde `ahora` en la fase de `clave`: alineado al
+    reloj, así el ritmo de cada stream no depende de cuándo arrancó el proceso
+    """
+    ahora = time.time() if ahora is None else ahora
+    return ahora + (fase(clave, intervalo) - ahora) % intervalo
+
+
+@dataclass(order=True)
+class _Tarea:
+    orden: tuple
+    clave: str = field(compare=False)
+    hosts: frozenset = field(compare=False)
+    futuro: Future = field(compare=False)
+    funcion: object = field(compare=False)
+    args: tuple = field(compare=False)
+    encolada: float = field(compare=False)
+
+
+class ColaChequeos:
+    """
+    Ejecuta tareas en hasta `concurrencia` hilos, con hasta `por_host` a la
+    vez contra un mismo host (0 = sin límite) y al menos `espaciado` segundos
+    entre dos arranques contra el mismo host. Una tarea ocupa un lugar en
+    cada host distinto de sus URLs.
+    `al_iniciar(clave, espera)` se llama al arrancar cada tarea con los
+    segundos que esperó en la cola.
+    """
+
+    def __init__(self, concurrencia, por_host=0, espaciado=0.0, al_iniciar=None):
+        self.concurrencia = max(1, concurrencia)
+        self.por_host = por_host
+        self.espaciado = espaciado
+        self.al_iniciar = al_iniciar
+        self.pendientes = []
+        self.claves = set()           # pendientes o en curso
+        self.activos = {}             # host -> tareas en curso
+        self.ultimo_inicio = {}       # host -> time.monotonic() del último arranque
+        self.secuencia = itertools.count()
+        self.condicion = threading.Condition()
+        self.hilos = []
+        self.cerrada = False
+
+    def agregar(self, clave, urls, prioridad, vencimiento, funcion, *args):
+        """
+        Encola funcion(*args). `vencimiento` (epoch) ordena las tareas de
+        igual prioridad. Retorna un Future, o None si `clave` ya está en la
+        cola o en curso.
+        """
+        orden = (PRIORIDADES[prioridad][0], vencimiento, next(self.secuencia))
+        hosts = frozenset(filter(None, map(host, urls)))
+        with self.condicion:
+            if self.cerrada:
+                raise RuntimeError("la cola de chequeos está cerrada")
+            if clave in self.claves:
+                return None
+            self.claves.add(clave)
+            tarea = _Tarea(orden, clave, hosts, Future(), funcion, args, time.monotonic())
+            self.pendientes.append(tarea)
+            if len(self.hilos) < self.concurrencia:
+                hilo = threading.Thread(target=self._trabajar, name=f"chequeos-{len(self.hilos)}")
+                self.hilos.append(hilo)
+                hilo.start()
+            self.condicion.notify()
+        return tarea.futuro
+
+    def en_cola(self):
+        with self.condicion:
+            return len(self.pendientes)
+
+    def cerrar(self, cancelar=False):
+        """
+        No admite más tareas; con `cancelar` descarta las que no arrancaron.
+        Los hilos terminan al vaciarse la cola.
+        """
+        with self.condicion:
+            self.cerrada = True
+            if cancelar:
+                for tarea in self.pendientes:
+                    tarea.futuro.cancel()
+                    self.claves.discard(tarea.clave)
+                self.pendientes.clear()
+            self.condicion.notify_all()
+
+    def _tomar(self):
+        """
+        Saca de la cola la primera tarea que puede arrancar. Retorna
+        (tarea, None) o (None, segundos hasta que el espaciado libere alguna).
+        """
+        ahora = time.monotonic()
+        espera = None
+        for tarea in sorted(self.pendientes):
+            if self.por_host and any(self.activos.get(h, 0) >= self.por_host for h in tarea.hosts):
+                continue
+            faltan = max((self.ultimo_inicio.get(h, -float("inf")) + self.espaciado - ahora
+                          for h in tarea.hosts), default=0)
+            if faltan > 0:
+                espera = faltan if espera is None else min(espera, faltan)
+                continue
+            self.pendientes.remove(tarea)
+            for h in tarea.hosts:
+                self.activos[h] = self.activos.get(h, 0) + 1
+                self.ultimo_inicio[h] = ahora
+            return tarea, None
+        return None, espera
+
+    def _trabajar(self):
+        while True:
+            with self.condicion:
+                tarea, espera = self._tomar()
+                while tarea is None:
+                    if self.cerrada and not self.pendientes:
+                        return
+                    self.condicion.wait(espera)
+                    tarea, espera = self._tomar()
+            try:
+                self._ejecutar(tarea)
+            finally:
+                with self.condicion:
+                    for h in tarea.hosts:
+                        self.activos[h] -= 1
+                    self.claves.discard(tarea.clave)
+                    self.condicion.notify_all()
+
+    def _ejecutar(self, tarea):
+        if not tarea.futuro.set_running_or_notify_cancel():
+            return
+        try:
+            if self.al_iniciar:
+                self.al_iniciar(tarea.clave, time.monotonic() - tarea.encolada)
+            resultado = tarea.funcion(*tarea.args)
+        except BaseException as e:
+            tarea.futuro.set_exception(e)
+        else:
+            tarea.futuro.set_result(resultado)
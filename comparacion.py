@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Comparación de streams
+Dos streams con el mismo programa (por ejemplo el principal y el de
+respaldo en otro encoder o CDN) se capturan a la vez y se comparan sus
+envolventes de energía, submuestreadas a 100 Hz: la correlación cruzada,
+calculada con FFT para todos los desfases a la vez, da el retardo de uno
+respecto del otro y su similitud (correlación de Pearson en ese desfase).
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from analisis import muestras_pcm
+
+TASA_ENVOLVENTE = 100        # muestras por segundo de la envolvente
+# Ventana (segundos) de la media móvil que se resta, para quedarse con la dinámica del programa
+VENTANA_TENDENCIA_SEG = 2
+PISO_DBFS = -70
+# Superposición mínima entre las dos capturas, como fracción de la más corta
+MIN_SUPERPOSICION = 0.5
+# Desvío mínimo de la envolvente (dB) para que haya algo que comparar
+MIN_VARIACION_DB = 0.5
+
+
+@dataclass
+class ResultadoComparacion:
+    desfase_seg: float = None     # positivo: el segundo stream va atrasado respecto del primero
+    similitud: float = None       # correlación de Pearson de las envolventes en ese desfase (-1 a 1)
+    segundos: float = 0.0         # audio superpuesto que se comparó
+
+    @property
+    def comparable(self):
+        return self.similitud is not None
+
+    def como_dict(self):
+        return {"desfase_seg": None if self.desfase_seg is None else round(self.desfase_seg, 3),
+                "similitud": None if self.similitud is None else round(self.similitud, 4),
+                "segundos": round(self.segundos, 2)}
+
+
+def envolvente(pcm, sample_rate, canales=1, sample_width=2):
+    """
+    Energía en dB por cada 1/TASA_ENVOLVENTE segundos, sin la tendencia lenta
+    """
+    muestras = muestras_pcm(pcm, sample_width)
+    por_bloque = max(1, sample_rate // TASA_ENVOLVENTE) * canales
+    bloques = len(muestras) // por_bloque
+    if not bloques:
+        return np.zeros(0)
+    x = muestras[:bloques * por_bloque].reshape(bloques, por_bloque) / (2 ** (sample_width * 8) / 2)
+    energia = 10 * np.log10(np.einsum("ij,ij->i", x, x) / por_bloque + 10 ** (PISO_DBFS / 10))
+    ventana = min(bloques, VENTANA_TENDENCIA_SEG * TASA_ENVOLVENTE)
+    # Media móvil que en los bordes promedia sólo las muestras disponibles
+    unos = np.ones(ventana)
+    tendencia = np.convolve(energia, unos, mode="same") / np.convolve(np.ones(bloques), unos, mode="same")
+    return energia - tendencia
+
+
+def _sumas(x):
+    """
+    Sumas acumuladas de x y x² con un cero adelante, para sumar cualquier tramo en O(1)
+    """
+    ceros = np.zeros(1)
+    return np.concatenate((ceros, np.cumsum(x))), np.concatenate((ceros, np.cumsum(x * x)))
+
+
+def correlacion(a, b, max_desfase):
+    """
+    Correlación de Pearson entre a[t] y b[t + k] para cada desfase k en
+    [-max_desfase, max_desfase], sobre el tramo en que se superponen.
+    Retorna (desfases, correlaciones).
+    """
+    n, m = len(a), len(b)
+    largo = 1 << int(np.ceil(np.log2(n + m)))
+    cruzada = np.fft.irfft(np.conj(np.fft.rfft(a, largo)) * np.fft.rfft(b, largo), largo)
+    desfases = np.arange(-min(max_desfase, n - 1), min(max_desfase, m - 1) + 1)
+    sab = cruzada[desfases % largo]
+
+    # Tramo superpuesto: a[desde_a:desde_a + s] con b[desde_b:desde_b + s]
+    desde_a = np.maximum(0, -desfases)
+    desde_b = np.maximum(0, desfases)
+    s = np.minimum(n - desde_a, m - desde_b)
+    suma_a, cuadrados_a = _sumas(a)
+    suma_b, cuadrados_b = _sumas(b)
+    sa = suma_a[desde_a + s] - suma_a[desde_a]
+    sb = suma_b[desde_b + s] - suma_b[desde_b]
+    saa = cuadrados_a[desde_a + s] - cuadrados_a[desde_a]
+    sbb = cuadrados_b[desde_b + s] - cuadrados_b[desde_b]
+    covarianza = sab - sa * sb / s
+    varianza = np.maximum(saa - sa * sa / s, 0) * np.maximum(sbb - sb * sb / s, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.where(varianza > 0, covarianza / np.sqrt(varianza), 0.0)
+    return desfases, r
+
+
+def comparar(pcm_a, pcm_b, sample_rate, canales=1, sample_width=2, max_desfase_seg=None, correccion_seg=0.0):
+    """
+    Compara dos capturas simultáneas y retorna un ResultadoComparacion.
+    `correccion_seg` es cuánto después terminó de llegar la captura b que
+    la a (se suma al desfase medido entre los buffers).
+    Sin variación de energía (silencio o un tono fijo) no es comparable.
+    """
+    a = envolvente(pcm_a, sample_rate, canales, sample_width)
+    b = envolvente(pcm_b, sample_rate, canales, sample_width)
+    resultado = ResultadoComparacion()
+    corta = min(len(a), len(b))
+    if corta < TASA_ENVOLVENTE or min(a.std(), b.std()) < MIN_VARIACION_DB:
+        return resultado
+    maximo = int((1 - MIN_SUPERPOSICION) * corta)
+    if max_desfase_seg is not None:
+        maximo = min(maximo, int(max_desfase_seg * TASA_ENVOLVENTE))
+    desfases, r = correlacion(a, b, maximo)
+    mejor = int(np.argmax(r))
+
+    # Interpolación parabólica alrededor del máximo, para bajar de los 10 ms
+    ajuste = 0.0
+    if 0 < mejor < len(r) - 1:
+        curvatura = r[mejor - 1] - 2 * r[mejor] + r[mejor + 1]
+        if curvatura < 0:
+            ajuste = 0.5 * (r[mejor - 1] - r[mejor + 1]) / curvatura
+    desfase = desfases[mejor]
+    resultado.desfase_seg = float((desfase + ajuste) / TASA_ENVOLVENTE + correccion_seg)
+    resultado.similitud = float(r[mejor])
+    resultado.segundos = float((corta - abs(desfase)) / TASA_ENVOLVENTE)
+    return resultado
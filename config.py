@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Configuración
+Lee las variables de entorno (y el .env) la primera vez que se usa algún
+valor, no al importar: así importar monitoreo no tiene efectos ni depende
+de python-dotenv, y un valor mal escrito se informa con el nombre de la
+variable en lugar de cortar la importación con un ValueError de int().
+"""
+
+import json
+import os
+import threading
+
+import historial
+
+
+class ErrorConfiguracion(ValueError):
+    """
+    Una o más variables de entorno con valores inválidos
+    """
+
+
+class _Lector:
+    """
+    Convierte variables de entorno juntando los errores, para informarlos todos a la vez
+    """
+
+    def __init__(self, entorno):
+        self.entorno = entorno
+        self.errores = []
+
+    def texto(self, nombre, defecto=None):
+        return self.entorno.get(nombre) or defecto
+
+    def activado(self, nombre, defecto):
+        texto = self.texto(nombre, defecto).strip()
+        if texto not in ("0", "1"):
+            self.errores.append(f"{nombre}={texto!r}: se esperaba 0 o 1")
+        return texto == "1"
+
+    def numero(self, nombre, defecto, tipo=int, minimo=None, maximo=None):
+        """
+        Valor numérico; vacío o sin definir es `defecto`
+        """
+        texto = (self.entorno.get(nombre) or "").strip()
+        if not texto:
+            return defecto
+        try:
+            valor = tipo(texto)
+        except ValueError:
+            clase = "entero" if tipo is int else "decimal"
+            self.errores.append(f"{nombre}={texto!r}: se esperaba un número {clase}")
+            return defecto
+        if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+            rango = (f"entre {minimo} y {maximo}" if maximo is not None and minimo is not None
+                     else f"al menos {minimo}" if minimo is not None else f"como mucho {maximo}")
+            self.errores.append(f"{nombre}={texto}: debe ser {rango}")
+            return defecto
+        return valor
+
+    def entero(self, nombre, defecto, minimo=None, maximo=None):
+        return self.numero(nombre, defecto, int, minimo, maximo)
+
+    def decimal(self, nombre, defecto, minimo=None, maximo=None):
+        return self.numero(nombre, defecto, float, minimo, maximo)
+
+    def reglas(self, nombre):
+        """
+        Reglas de calidad en JSON (ver calidad.validar_reglas)
+        """
+        texto = self.texto(nombre)
+        if not texto:
+            return {}
+        import calidad  # usa NumPy: sólo si hay reglas configuradas
+        try:
+            return calidad.validar_reglas(json.loads(texto), nombre)
+        except ValueError as e:  # incluye json.JSONDecodeError
+            self.errores.append(str(e) if str(e).startswith(nombre) else f"{nombre}: {e}")
+            return {}
+
+
+def leer(entorno=None):
+    """
+    Lee y valida la configuración. Sin `entorno` usa os.environ, con el .env
+    cargado antes (sin pisar variables ya definidas).
+    Retorna un dict {NOMBRE: valor}; lanza ErrorConfiguracion con todos los errores.
+    """
+    if entorno is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        entorno = os.environ
+    v = _Lector(entorno)
+    c = {}
+
+    c["SMTP_SERVER"] = v.texto("SMTP_SERVER")
+    c["SMTP_PORT"] = v.entero("SMTP_PORT", 465, 1, 65535)
+    c["SMTP_USER"] = v.texto("SMTP_USER")
+    c["SMTP_PASS"] = v.texto("SMTP_PASS")
+    c["EMAIL_FROM"] = v.texto("EMAIL_FROM")
+    c["EMAIL_TO"] = v.texto("EMAIL_TO")
+    c["STREAM_URL"] = v.texto("STREAM_URL")
+    c["STREAM2_URL"] = v.texto("STREAM2_URL")
+    c["THRESHOLD_DBFS"] = v.entero("THRESHOLD_DBFS", -35, maximo=0)
+    c["TELEGRAM_BOT_TOKEN"] = v.texto("TELEGRAM_BOT_TOKEN")
+    c["TELEGRAM_CHAT_ID"] = v.texto("TELEGRAM_CHAT_ID")
+
+    # Estado de alertas: chequeos fallidos seguidos para alertar (sin definir, según
+    # el modo: ver monitoreo.umbral_caido), OK seguidos para avisar la recuperación,
+    # y segundos en que se agrupan avisos simultáneos
+    c["UMBRAL_CAIDO"] = v.entero("UMBRAL_CAIDO", None, 1)
+    c["UMBRAL_RECUPERACION"] = v.entero("UMBRAL_RECUPERACION", 2, 1)
+    c["VENTANA_AGRUPACION"] = v.decimal("VENTANA_AGRUPACION", 30.0, 0)
+
+    # Envío de notificaciones en segundo plano; NOTIF_ESPERA_CIERRE es lo que el modo
+    # cron espera a que salgan antes de terminar y NOTIF_METRICAS_INTERVALO cada cuánto
+    # el daemon registra las métricas de notificaciones
+    c["SMTP_TIMEOUT"] = v.decimal("SMTP_TIMEOUT", 20.0, 0.1)
+    c["TELEGRAM_TIMEOUT"] = v.decimal("TELEGRAM_TIMEOUT", 10.0, 0.1)
+    c["NOTIF_COLA"] = v.entero("NOTIF_COLA", 100, 1)
+    c["NOTIF_REINTENTOS"] = v.entero("NOTIF_REINTENTOS", 4, 1)
+    c["NOTIF_ESPERA_CIERRE"] = v.decimal("NOTIF_ESPERA_CIERRE", 60.0, 0)
+    c["NOTIF_METRICAS_INTERVALO"] = v.entero("NOTIF_METRICAS_INTERVALO", 3600, 1)
+
+    # Modo daemon: intervalo entre chequeos (segundos), general y por stream
+    c["INTERVALO_CHEQUEO"] = v.entero("INTERVALO_CHEQUEO", 60, 1)
+    c["STREAM_INTERVALO"] = v.entero("STREAM_INTERVALO", c["INTERVALO_CHEQUEO"], 1)
+    c["STREAM2_INTERVALO"] = v.entero("STREAM2_INTERVALO", c["INTERVALO_CHEQUEO"], 1)
+
+    # Análisis: PCM decodificado por FFmpeg directamente a memoria, cortando la
+    # descarga apenas se conoce el resultado (SALIDA_TEMPRANA=1)
+    c["DURACION_FRAGMENTO"] = v.entero("DURACION_FRAGMENTO", 10, 1)
+    c["PCM_SAMPLE_RATE"] = v.entero("PCM_SAMPLE_RATE", 8000, 1000)
+    c["PCM_CANALES"] = v.entero("PCM_CANALES", 1, 1, 2)
+    c["SALIDA_TEMPRANA"] = v.activado("SALIDA_TEMPRANA", "1")
+
+    # Criterio de silencio: un fragmento tiene audio si al menos PORCENTAJE_AUDIBLE_MIN %
+    # no es silencio, y es silencio todo tramo de SILENCIO_MIN_MS ms o más por debajo de
+    # THRESHOLD_DBFS. Entre NOCHE_DESDE y NOCHE_HASTA (horas) no se detecta silencio;
+    # con las dos iguales no hay horario nocturno. replay.py ayuda a elegir los valores.
+    c["SILENCIO_MIN_MS"] = v.entero("SILENCIO_MIN_MS", 1000, 1)
+    c["PORCENTAJE_AUDIBLE_MIN"] = v.decimal("PORCENTAJE_AUDIBLE_MIN", 10.0, 0, 100)
+    c["NOCHE_DESDE"] = v.entero("NOCHE_DESDE", 0, 0, 23)
+    c["NOCHE_HASTA"] = v.entero("NOCHE_HASTA", 5, 0, 24)
+
+    # Sondeo escalonado: cada cuántos segundos se hace el análisis completo del
+    # audio de cada stream (0 = en todos los chequeos). Entre medio sólo se
+    # verifica por HTTP que responda con audio y lleguen SONDEO_BYTES bytes.
+    c["INTERVALO_ANALISIS_COMPLETO"] = v.entero("INTERVALO_ANALISIS_COMPLETO", 0, 0)
+    c["SONDEO_BYTES"] = v.entero("SONDEO_BYTES", 16384, 1)
+    c["SONDEO_PLAZO_SEG"] = v.decimal("SONDEO_PLAZO_SEG", 2.0, 0.1)
+
+    # Reglas de calidad de audio para todos los streams, en JSON (ver calidad.py):
+    # {"lufs": {"min": -35}, "recorte": {"max": 0.001}}. Cada stream puede
+    # agregar o pisar reglas con "reglas" en STREAMS_FILE.
+    c["REGLAS_CALIDAD"] = v.reglas("REGLAS_CALIDAD")
+
+    # Detección de audio repetido (playout colgado o en loop): cantidad de
+    # fragmentos anteriores por stream contra los que se compara cada análisis
+    # (0 = deshabilitada) y fracción repetida a partir de la cual el chequeo falla
+    c["REPETICION_FRAGMENTOS"] = v.entero("REPETICION_FRAGMENTOS", 0, 0)
+    c["REPETICION_UMBRAL"] = v.decimal("REPETICION_UMBRAL", 0.8, 0, 1)
+
+    # Comparación de streams con el mismo programa: pares de ids "principal,respaldo"
+    # separados por ";" que se capturan a la vez durante COMPARACION_SEG
+    c["COMPARAR_STREAMS"] = v.texto("COMPARAR_STREAMS", "")
+    c["COMPARACION_SEG"] = v.decimal("COMPARACION_SEG", 30.0, 2)
+    c["COMPARACION_MAX_DESFASE_SEG"] = v.decimal("COMPARACION_MAX_DESFASE_SEG", 5.0, 0)
+    c["COMPARACION_MIN_SIMILITUD"] = v.decimal("COMPARACION_MIN_SIMILITUD", 0.5, -1, 1)
+
+    # Análisis de silencio en procesos aparte (0 = en los hilos de descarga),
+    # con hasta COLA_ANALISIS pedidos esperando antes de frenar las descargas
+    c["PROCESOS_ANALISIS"] = v.entero("PROCESOS_ANALISIS", 0, 0)
+    c["COLA_ANALISIS"] = v.entero("COLA_ANALISIS", c["PROCESOS_ANALISIS"] * 2, 0)
+
+    # Plazos de cada chequeo (segundos): hasta recibir audio, sin recibir datos
+    # y en total; y de un ciclo completo en modo cron
+    c["TIMEOUT_CONEXION_SEG"] = v.decimal("TIMEOUT_CONEXION_SEG", 10.0, 0.1)
+    c["TIMEOUT_INACTIVIDAD_SEG"] = v.decimal("TIMEOUT_INACTIVIDAD_SEG", 5.0, 0.1)
+    c["PLAZO_CHEQUEO_SEG"] = v.decimal("PLAZO_CHEQUEO_SEG", c["DURACION_FRAGMENTO"] + 20.0, 0.1)
+    c["PLAZO_CICLO_SEG"] = v.decimal("PLAZO_CICLO_SEG", 240.0, 0.1)
+
+    # Modo continuo: ventana deslizante y tiempo máximo sin recibir datos
+    c["VENTANA_CONTINUA_SEG"] = v.decimal("VENTANA_CONTINUA_SEG", 10.0, 0.1)
+    c["TIMEOUT_LECTURA_SEG"] = v.decimal("TIMEOUT_LECTURA_SEG", 15.0, 0.1)
+
+    # Registro de streams (JSON opcional) y cantidad de sondeos simultáneos
+    c["STREAMS_FILE"] = v.texto("STREAMS_FILE")
+    c["MAX_CONCURRENCIA"] = v.entero("MAX_CONCURRENCIA", 8, 1)
+    # Conexiones simultáneas contra un mismo servidor (0 = sin límite) y
+    # segundos mínimos entre dos conexiones nuevas al mismo servidor (ver cola.py)
+    c["MAX_CONEXIONES_POR_HOST"] = v.entero("MAX_CONEXIONES_POR_HOST", 4, 0)
+    c["ESPACIADO_HOST_SEG"] = v.decimal("ESPACIADO_HOST_SEG", 0.2, 0)
+
+    # Clips de audio para las alertas (ver clips.py): segundos del último audio
+    # recibido que se conservan por stream (0 = deshabilitado), carpeta donde se
+    # guardan y si los buffers van en archivos mapeados en memoria
+    c["CLIPS_SEG"] = v.entero("CLIPS_SEG", 0, 0)
+    c["CLIPS_DIR"] = v.texto("CLIPS_DIR", "clips")
+    c["CLIPS_MMAP"] = v.activado("CLIPS_MMAP", "0")
+
+    # Métricas OpenMetrics: endpoint local /metrics en los modos daemon y continuo
+    # (0 = deshabilitado) y archivo para el textfile collector de node_exporter
+    c["METRICAS_PUERTO"] = v.entero("METRICAS_PUERTO", 0, 0, 65535)
+    c["METRICAS_HOST"] = v.texto("METRICAS_HOST", "127.0.0.1")
+    c["METRICAS_ARCHIVO"] = v.texto("METRICAS_ARCHIVO")
+
+    # Historial de chequeos (SQLite) y días a conservar de cada nivel
+    c["HISTORIAL_DB"] = v.texto("HISTORIAL_DB", "historial.db")
+    c["RETENCION_HISTORIAL"] = {
+        "crudos": v.entero("RETENCION_CRUDOS_DIAS", historial.RETENCION["crudos"], 1),
+        "minuto": v.entero("RETENCION_MINUTOS_DIAS", historial.RETENCION["minuto"], 1),
+        "hora": v.entero("RETENCION_HORAS_DIAS", historial.RETENCION["hora"], 1),
+        "dia": v.entero("RETENCION_DIAS_DIAS", historial.RETENCION["dia"], 1),
+    }
+
+    # Varios nodos en modo daemon del mismo equipo con el mismo HISTORIAL_DB (ver coordinacion.py):
+    # nombre de este nodo (vacío = un solo nodo), cada cuánto anuncia que sigue
+    # activo y tras cuántos segundos sin latido se reparten sus streams
+    c["NODO_ID"] = v.texto("NODO_ID")
+    c["LATIDO_SEG"] = v.decimal("LATIDO_SEG", 5.0, 0.1)
+    c["NODO_EXPIRACION_SEG"] = v.decimal("NODO_EXPIRACION_SEG", c["LATIDO_SEG"] * 3, c["LATIDO_SEG"] * 2)
+
+    if v.errores:
+        raise ErrorConfiguracion("; ".join(v.errores))
+    return c
+
+
+class Configuracion:
+    """
+    Configuración que se lee (ver leer) con el primer acceso a un valor:
+    CONFIG.INTERVALO_CHEQUEO. Asignar un valor lo reemplaza para el resto
+    de la ejecución (pruebas de carga, benchmarks).
+    """
+
+    def __init__(self, entorno=None):
+        object.__setattr__(self, "_entorno", entorno)
+        object.__setattr__(self, "_valores", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def cargar(self):
+        """
+        Lee la configuración si todavía no se leyó y retorna el dict de valores
+        """
+        if self._valores is None:
+            with self._lock:
+                if self._valores is None:
+                    object.__setattr__(self, "_valores", leer(self._entorno))
+        return self._valores
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        try:
+            return self.cargar()[nombre]
+        except KeyError:
+            raise AttributeError(f"configuración desconocida: {nombre}") from None
+
+    def __setattr__(self, nombre, valor):
+        valores = self.cargar()
+        if nombre not in valores:
+            raise AttributeError(f"configuración desconocida: {nombre}")
+        valores[nombre] = valor
+
+    def __contains__(self, nombre):
+        return nombre in self.cargar()
+
+
+CONFIG = Configuracion()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Monitoreo continuo
+Mantiene una conexión permanente por stream, decodifica el audio de a poco
+en un buffer circular de tamaño fijo y evalúa el criterio de silencio sobre
+una ventana deslizante. Avisa en segundos cuando empieza un silencio o se
+corta la conexión, con memoria acotada por stream.
+"""
+
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from captura import comando_pcm, lanzar, terminar, SAMPLE_WIDTH
+
+# Estados posibles de un stream en modo continuo
+CONECTANDO = "conectando"
+OK = "ok"
+SILENCIO = "silencio"
+CAIDO = "caido"
+
+# Para estado_periodo: el estado más grave visto en el período
+GRAVEDAD = {CONECTANDO: 0, OK: 1, SILENCIO: 2, CAIDO: 3}
+
+
+class BufferAnillo:
+    """
+    Buffer circular de muestras int16 preasignado: escribir no reserva memoria
+    """
+
+    def __init__(self, capacidad):
+        self.datos = np.zeros(capacidad, dtype=np.int16)
+        self.posicion = 0
+        self.escritas = 0
+
+    @property
+    def lleno(self):
+        return self.escritas >= len(self.datos)
+
+    def vaciar(self):
+        self.posicion = 0
+        self.escritas = 0
+
+    def escribir(self, muestras):
+        capacidad = len(self.datos)
+        if len(muestras) >= capacidad:
+            muestras = muestras[-capacidad:]
+        n = len(muestras)
+        primera = min(n, capacidad - self.posicion)
+        self.datos[self.posicion:self.posicion + primera] = muestras[:primera]
+        self.datos[:n - primera] = muestras[primera:]
+        self.posicion = (self.posicion + n) % capacidad
+        self.escritas += n
+
+    def ventana(self, salida):
+        """
+        Copia el contenido en orden cronológico sobre `salida` (mismo tamaño)
+        """
+        resto = len(self.datos) - self.posicion
+        salida[:resto] = self.datos[self.posicion:]
+        salida[resto:] = self.datos[:self.posicion]
+        return salida
+
+
+class MonitorContinuo:
+    """
+    Monitorea un stream con un proceso FFmpeg de larga duración.
+    `analizar(muestras)` recibe la ventana (int16) y retorna verdadero si hay audio.
+    `on_evento(monitor, anterior, nuevo, detalle)` se llama en cada cambio de estado.
+    Las alertas no salen de los cambios de estado sino de estado_periodo(),
+    que se evalúa a intervalos con la máquina de alertas.py.
+    `al_recibir(pcm)` (opcional) recibe cada lectura, como memoryview del buffer de lectura.
+    """
+
+    def __init__(self, stream, analizar, on_evento, ventana_seg=10, paso_seg=0.5,
+                 sample_rate=8000, canales=1, reconexion_seg=5, reconexion_max_seg=60, al_recibir=None):
+        self.stream = stream
+        self.analizar = analizar
+        self.on_evento = on_evento
+        self.al_recibir = al_recibir
+        self.sample_rate = sample_rate
+        self.canales = canales
+        self.reconexion_seg = reconexion_seg
+        self.reconexion_max_seg = reconexion_max_seg
+
+        muestras_paso = int(paso_seg * sample_rate) * canales
+        self.buffer = BufferAnillo(int(ventana_seg * sample_rate) * canales)
+        self.ventana = np.zeros(len(self.buffer.datos), dtype=np.int16)
+        self.lectura = bytearray(muestras_paso * SAMPLE_WIDTH)
+        self.muestras_lectura = np.frombuffer(self.lectura, dtype="<i2")
+        self.vista_lectura = memoryview(self.lectura)
+
+        self.estado = CONECTANDO
+        self.peor = CONECTANDO
+        self.lock = threading.Lock()
+        self.ultimo_dato = time.monotonic()
+        self.proceso = None
+        self.detenido = threading.Event()
+        self.hilo = threading.Thread(target=self._ejecutar, name=f"continuo-{stream.id}", daemon=True)
+
+    def iniciar(self):
+        self.hilo.start()
+
+    def detener(self):
+        self.detenido.set()
+        self._terminar_proceso()
+
+    def verificar_inactividad(self, timeout_seg):
+        """
+        Corta la conexión si no llegan datos hace más de `timeout_seg` segundos.
+        La lectura bloqueada termina y el stream se reporta como caído.
+        """
+        if self.proceso is not None and time.monotonic() - self.ultimo_dato > timeout_seg:
+            self._terminar_proceso()
+            return True
+        return False
+
+    def estado_periodo(self):
+        """
+        Estado más grave desde la llamada anterior: un silencio o un corte
+        breve entre dos evaluaciones también cuenta
+        """
+        with self.lock:
+            peor, self.peor = self.peor, self.estado
+        return peor
+
+    def _cambiar_estado(self, nuevo, detalle=None):
+        with self.lock:
+            anterior, self.estado = self.estado, nuevo
+            if GRAVEDAD[nuevo] > GRAVEDAD[self.peor]:
+                self.peor = nuevo
+        if anterior != nuevo:
+            self.on_evento(self, anterior, nuevo, detalle)
+
+    def _terminar_proceso(self):
+        proceso = self.proceso
+        if proceso is not None:
+            terminar(proceso)
+
+    def _ejecutar(self):
+        espera = self.reconexion_seg
+        while not self.detenido.is_set():
+            recibio_datos = self._conectar_y_leer()
+            if self.detenido.is_set():
+                break
+            self._cambiar_estado(CAIDO, "conexión perdida" if recibio_datos else "no se pudo conectar")
+            # Reintentos con espera creciente mientras el stream siga caído
+            if recibio_datos:
+                espera = self.reconexion_seg
+            self.detenido.wait(espera)
+            espera = min(espera * 2, self.reconexion_max_seg)
+
+    def _conectar_y_leer(self):
+        self.buffer.vaciar()
+        self.ultimo_dato = time.monotonic()
+        comando = comando_pcm(self.stream.url, None, self.sample_rate, self.canales)
+        try:
+            self.proceso = lanzar(comando, stdout=subprocess.PIPE)
+        except OSError:
+            return False
+
+        recibio_datos = False
+        try:
+            while not self.detenido.is_set():
+                leidos = self.proceso.stdout.readinto(self.lectura)
+                if not leidos:
+                    break
+                recibio_datos = True
+                self.ultimo_dato = time.monotonic()
+                self.buffer.escribir(self.muestras_lectura[:leidos // SAMPLE_WIDTH])
+                if self.al_recibir:
+                    self.al_recibir(self.vista_lectura[:leidos - leidos % SAMPLE_WIDTH])
+                if self.buffer.lleno:
+                    hay_audio = self.analizar(self.buffer.ventana(self.ventana))
+                    self._cambiar_estado(OK if hay_audio else SILENCIO)
+        finally:
+            self._terminar_proceso()
+            self.proceso.stdout.close()
+            self.proceso.wait()
+            self.proceso = None
+        return recibio_datos
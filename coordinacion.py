@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Coordinación entre nodos
+Varios procesos en modo daemon de la misma máquina comparten el historial y
+se reparten los streams, así la caída de uno no deja sin monitoreo a todo el
+catálogo. El historial es SQLite en modo WAL, que necesita memoria
+compartida entre los procesos: no sirve en un disco de red (NFS, SMB), así
+que los nodos no pueden estar en equipos distintos.
+- Cada nodo anota un latido periódico en el historial (tabla nodos); el que
+  deja de latir más de `expiracion` segundos se da por caído.
+- Los streams se reparten por hashing consistente entre los nodos activos:
+  todos calculan el mismo reparto sin hablar entre sí, y cuando un nodo entra
+  o sale sólo cambian de dueño los streams que le tocaban.
+- Antes de chequear, el dueño reserva el stream en el historial (tabla
+  reservas). Mientras dos nodos ven distintos los activos (hasta un latido
+  de diferencia) la reserva impide que los dos lo chequeen y alerten.
+Cada nodo agrupa y envía sus propias alertas: las caídas simultáneas de
+streams de nodos distintos llegan en mensajes separados.
+"""
+
+import bisect
+import hashlib
+import threading
+import time
+
+# Posiciones de cada nodo en el anillo: más posiciones, reparto más parejo
+VIRTUALES = 64
+
+
+def _posicion(texto):
+    return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Anillo:
+    """
+    Hashing consistente: cada nodo ocupa `virtuales` posiciones del anillo y
+    una clave pertenece al primer nodo que aparece a partir de la suya
+    """
+
+    def __init__(self, nodos, virtuales=VIRTUALES):
+        self.nodos = tuple(sorted(set(nodos)))
+        puntos = sorted((_posicion(f"{nodo}#{i}"), nodo) for nodo in self.nodos for i in range(virtuales))
+        self.posiciones = [posicion for posicion, _ in puntos]
+        self.duenos = [nodo for _, nodo in puntos]
+
+    def dueno(self, clave):
+        """
+        Nodo al que pertenece `clave`, o None si no hay nodos
+        """
+        if not self.posiciones:
+            return None
+        i = bisect.bisect(self.posiciones, _posicion(clave)) % len(self.posiciones)
+        return self.duenos[i]
+
+
+class Coordinador:
+    """
+    Pertenencia de este nodo al grupo y reparto de los streams, sobre el
+    historial compartido. `al_cambiar(anterior, nuevo)` se llama con los
+    dos Anillo cuando cambian los nodos activos.
+    """
+
+    def __init__(self, historial, nodo, expiracion, al_cambiar=None):
+        self.historial = historial
+        self.nodo = nodo
+        self.expiracion = expiracion
+        self.al_cambiar = al_cambiar
+        self.anillo = Anillo([nodo])
+        self.lock = threading.Lock()
+
+    def latido(self, ahora=None):
+        """
+        Anuncia que el nodo sigue activo y actualiza el reparto con los
+        nodos que latieron dentro de la expiración. Retorna los nodos activos.
+        """
+        ahora = time.time() if ahora is None else ahora
+        self.historial.latido(self.nodo, ahora)
+        activos = set(self.historial.nodos_activos(ahora - self.expiracion)) | {self.nodo}
+        with self.lock:
+            anterior = self.anillo
+            if activos != set(anterior.nodos):
+                self.anillo = Anillo(activos)
+            nuevo = self.anillo
+        if nuevo is not anterior and self.al_cambiar:
+            self.al_cambiar(anterior, nuevo)
+        return nuevo.nodos
+
+    def nodos(self):
+        with self.lock:
+            return self.anillo.nodos
+
+    def es_mio(self, clave):
+        """
+        Si `clave` le toca a este nodo según el último latido
+        """
+        with self.lock:
+            return self.anillo.dueno(clave) == self.nodo
+
+    def reservar(self, clave, duracion, ahora=None):
+        """
+        Reserva `clave` para este nodo durante `duracion` segundos, o renueva
+        la reserva si ya era suya. Retorna False si la tiene otro nodo.
+        """
+        ahora = time.time() if ahora is None else ahora
+        return self.historial.reservar(clave, self.nodo, ahora + duracion, ahora)
+
+    def liberar(self, clave):
+        self.historial.liberar(clave, self.nodo)
+
+    def salir(self):
+        """
+        Da de baja al nodo: los demás toman sus streams en su próximo latido,
+        sin esperar la expiración
+        """
+        self.historial.baja_nodo(self.nodo)
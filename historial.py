@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Historial de chequeos
+Guarda cada resultado en SQLite (modo WAL) indexado por (stream, fecha),
+de modo que los resúmenes son consultas por rango en lugar de releer los logs.
+Además mantiene agregados por minuto, hora y día para calcular disponibilidad
+sobre cualquier ventana combinando unos pocos tramos.
+"""
+
+import glob
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Resultados posibles de un chequeo
+OK = "ok"
+OK_NOCTURNO = "ok_nocturno"
+CAIDO = "caido"
+SILENCIO = "silencio"
+# La captura superó sus plazos y se cortó (cuenta como error, no como silencio)
+COLGADO = "colgado"
+# Hay audio pero no cumple las reglas de calidad (ver calidad.py)
+CALIDAD = "calidad"
+# Repite audio ya transmitido: playout colgado o en loop (ver huellas.py)
+REPETICION = "repeticion"
+# Dos streams con el mismo programa difieren o están desfasados (ver comparacion.py)
+DIVERGENCIA = "divergencia"
+
+RESULTADOS_OK = (OK, OK_NOCTURNO)
+
+# Niveles de agregación: nombre -> segundos por tramo
+NIVELES = (("dia", 86400), ("hora", 3600), ("minuto", 60))
+
+# Retención por defecto, en días
+RETENCION = {"crudos": 7, "minuto": 2, "hora": 90, "dia": 730}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS chequeos (
+    stream_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    resultado TEXT NOT NULL,
+    porcentaje_audible REAL,
+    dbfs REAL,
+    dbfs_max REAL,
+    dbfs_min REAL,
+    latencia REAL,
+    detalle TEXT,
+    PRIMARY KEY (stream_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS agregados (
+    stream_id TEXT NOT NULL,
+    nivel TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    ok INTEGER NOT NULL DEFAULT 0,
+    caidas INTEGER NOT NULL DEFAULT 0,
+    silencios INTEGER NOT NULL DEFAULT 0,
+    primer_error REAL,
+    ultimo_error REAL,
+    suma_audible REAL NOT NULL DEFAULT 0,
+    n_audible INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stream_id, nivel, inicio)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS estados (
+    stream_id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    fallas INTEGER NOT NULL,
+    exitos INTEGER NOT NULL,
+    desde REAL,
+    error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS huellas (
+    stream_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    datos BLOB NOT NULL,
+    PRIMARY KEY (stream_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS nodos (
+    nodo TEXT PRIMARY KEY,
+    latido REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reservas (
+    clave TEXT PRIMARY KEY,
+    nodo TEXT NOT NULL,
+    hasta REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+# Toma la reserva si está libre, vencida o ya es del mismo nodo (una sola
+# sentencia: atómica también entre procesos)
+RESERVAR = """
+INSERT INTO reservas VALUES (?, ?, ?)
+ON CONFLICT (clave) DO UPDATE SET nodo = excluded.nodo, hasta = excluded.hasta
+WHERE reservas.nodo = excluded.nodo OR reservas.hasta < ?
+"""
+
+SUMAR_AGREGADO = """
+INSERT INTO agregados VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (stream_id, nivel, inicio) DO UPDATE SET
+    ok = ok + excluded.ok,
+    caidas = caidas + excluded.caidas,
+    silencios = silencios + excluded.silencios,
+    primer_error = CASE WHEN primer_error IS NULL THEN excluded.primer_error
+                        WHEN excluded.primer_error IS NULL THEN primer_error
+                        ELSE MIN(primer_error, excluded.primer_error) END,
+    ultimo_error = CASE WHEN ultimo_error IS NULL THEN excluded.ultimo_error
+                        WHEN excluded.ultimo_error IS NULL THEN ultimo_error
+                        ELSE MAX(ultimo_error, excluded.ultimo_error) END,
+    suma_audible = suma_audible + excluded.suma_audible,
+    n_audible = n_audible + excluded.n_audible
+"""
+
+RECONSTRUIR_AGREGADOS = """
+INSERT INTO agregados
+SELECT stream_id, ?, CAST(ts / ? AS INTEGER) * ?,
+       SUM(resultado IN ('{ok}', '{ok_nocturno}')),
+       SUM(resultado NOT IN ('{ok}', '{ok_nocturno}', '{silencio}')),
+       SUM(resultado = '{silencio}'),
+       MIN(CASE WHEN resultado NOT IN ('{ok}', '{ok_nocturno}') THEN ts END),
+       MAX(CASE WHEN resultado NOT IN ('{ok}', '{ok_nocturno}') THEN ts END),
+       COALESCE(SUM(porcentaje_audible), 0),
+       COUNT(porcentaje_audible)
+FROM chequeos GROUP BY stream_id, CAST(ts / ? AS INTEGER)
+""".format(ok=OK, ok_nocturno=OK_NOCTURNO, silencio=SILENCIO)
+
+
+def _finito(valor):
+    """
+    SQLite no guarda -inf de forma útil: el silencio absoluto queda como NULL
+    """
+    if valor is None or valor in (float("inf"), float("-inf")):
+        return None
+    return valor
+
+
+class Historial:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conexion = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.conexion:
+            self.conexion.executescript(ESQUEMA)
+        # Historiales creados antes de existir los agregados
+        if not self.meta("agregados"):
+            self.reconstruir_agregados()
+
+    def cerrar(self):
+        with self.lock:
+            self.conexion.close()
+
+    def registrar(self, stream_id, resultado, ts=None, porcentaje_audible=None, dbfs=None,
+                  dbfs_max=None, dbfs_min=None, latencia=None, detalle=None):
+        """
+        Guarda el resultado de un chequeo
+        """
+        ts = ts if ts is not None else time.time()
+        porcentaje_audible = _finito(porcentaje_audible)
+        fila = (stream_id, ts, resultado,
+                porcentaje_audible, _finito(dbfs), _finito(dbfs_max), _finito(dbfs_min),
+                latencia, json.dumps(detalle, ensure_ascii=False) if detalle else None)
+
+        es_ok = resultado in RESULTADOS_OK
+        error_ts = None if es_ok else ts
+        contadores = (int(es_ok), int(not es_ok and resultado != SILENCIO), int(resultado == SILENCIO),
+                      error_ts, error_ts, porcentaje_audible or 0, int(porcentaje_audible is not None))
+        agregados = [(stream_id, nivel, int(ts // segundos) * segundos) + contadores
+                     for nivel, segundos in NIVELES]
+
+        with self.lock, self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO chequeos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", fila)
+            self.conexion.executemany(SUMAR_AGREGADO, agregados)
+
+    def reconstruir_agregados(self):
+        """
+        Recalcula todos los agregados a partir de los chequeos guardados
+        """
+        with self.lock, self.conexion:
+            self.conexion.execute("DELETE FROM agregados")
+            for nivel, segundos in NIVELES:
+                self.conexion.execute(RECONSTRUIR_AGREGADOS, (nivel, segundos, segundos, segundos))
+            self.conexion.execute("INSERT OR REPLACE INTO meta VALUES ('agregados', '1')")
+
+    def chequeos(self, stream_id, desde, hasta=None):
+        """
+        Chequeos de un stream en el rango [desde, hasta), como filas sqlite3.Row
+        """
+        hasta = hasta if hasta is not None else time.time() + 1
+        with self.lock:
+            cursor = self.conexion.cursor()
+            cursor.row_factory = sqlite3.Row
+            return cursor.execute(
+                "SELECT * FROM chequeos WHERE stream_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (stream_id, desde, hasta)).fetchall()
+
+    def estadisticas(self, stream_id, desde, hasta=None):
+        """
+        Combina los agregados que cubren [desde, hasta) con precisión de minuto:
+        días completos, luego horas completas y minutos en los bordes.
+        """
+        hasta = hasta if hasta is not None else time.time()
+        consulta = """
+            SELECT SUM(ok), SUM(caidas), SUM(silencios), MIN(primer_error),
+                   MAX(ultimo_error), SUM(suma_audible), SUM(n_audible)
+            FROM agregados WHERE stream_id = ? AND nivel = ? AND inicio >= ? AND inicio < ?
+        """
+        total = [0, 0, 0, None, None, 0.0, 0]
+        with self.lock:
+            for nivel, inicio, fin in tramos(desde, hasta):
+                fila = self.conexion.execute(consulta, (stream_id, nivel, inicio, fin)).fetchone()
+                for i in (0, 1, 2, 5, 6):
+                    total[i] += fila[i] or 0
+                if fila[3] is not None:
+                    total[3] = fila[3] if total[3] is None else min(total[3], fila[3])
+                if fila[4] is not None:
+                    total[4] = fila[4] if total[4] is None else max(total[4], fila[4])
+
+        ok, caidas, silencios, primer_error, ultimo_error, suma_audible, n_audible = total
+        chequeos = ok + caidas + silencios
+        return {
+            "chequeos": chequeos,
+            "ok": ok,
+            "caidas": caidas,
+            "silencios": silencios,
+            "primer_error": primer_error,
+            "ultimo_error": ultimo_error,
+            "disponibilidad": ok / chequeos * 100 if chequeos else None,
+            "porcentaje_silencio": silencios / chequeos * 100 if chequeos else None,
+            "audible_medio": suma_audible / n_audible if n_audible else None,
+        }
+
+    def resumen(self, stream_ids, desde, hasta=None):
+        """
+        Cantidad de chequeos OK, errores y fecha del primer error por stream
+        en el rango [desde, hasta). Retorna {stream_id: (ok, errores, primer_error)}.
+        """
+        resumen = {}
+        for stream_id in stream_ids:
+            datos = self.estadisticas(stream_id, desde, hasta)
+            resumen[stream_id] = (datos["ok"], datos["caidas"] + datos["silencios"], datos["primer_error"])
+        return resumen
+
+    def aplicar_retencion(self, retencion=None, ahora=None):
+        """
+        Elimina los chequeos crudos y los agregados más finos a medida que envejecen.
+        `retencion` indica los días a conservar de cada nivel (ver RETENCION).
+        Retorna la cantidad de filas eliminadas.
+        """
+        retencion = dict(RETENCION, **(retencion or {}))
+        ahora = ahora if ahora is not None else time.time()
+        eliminadas = 0
+        with self.lock, self.conexion:
+            eliminadas += self.conexion.execute(
+                "DELETE FROM chequeos WHERE ts < ?", (ahora - retencion["crudos"] * 86400,)).rowcount
+            eliminadas += self.conexion.execute(
+                "DELETE FROM huellas WHERE ts < ?", (ahora - retencion["crudos"] * 86400,)).rowcount
+            for nivel, _ in NIVELES:
+                eliminadas += self.conexion.execute(
+                    "DELETE FROM agregados WHERE nivel = ? AND inicio < ?",
+                    (nivel, ahora - retencion[nivel] * 86400)).rowcount
+            # Reservas vencidas y nodos que dejaron de latir sin darse de baja
+            self.conexion.execute("DELETE FROM reservas WHERE hasta < ?", (ahora,))
+            self.conexion.execute("DELETE FROM nodos WHERE latido < ?", (ahora - 86400,))
+        return eliminadas
+
+    def ultimo_chequeo(self, stream_id):
+        """
+        Fecha del último chequeo registrado del stream, o None
+        """
+        with self.lock:
+            return self.conexion.execute("SELECT MAX(ts) FROM chequeos WHERE stream_id = ?",
+                                         (stream_id,)).fetchone()[0]
+
+    def ultimo_analisis(self, stream_id):
+        """
+        Fecha del último chequeo con análisis de audio (porcentaje audible), o None
+        """
+        with self.lock:
+            fila = self.conexion.execute(
+                "SELECT MAX(ts) FROM chequeos WHERE stream_id = ? AND porcentaje_audible IS NOT NULL",
+                (stream_id,)).fetchone()
+            return fila[0]
+
+    def estado(self, stream_id):
+        """
+        Estado de alertas guardado de un stream (ver alertas.py), como dict o None
+        """
+        with self.lock:
+            cursor = self.conexion.cursor()
+            cursor.row_factory = sqlite3.Row
+            fila = cursor.execute(
+                "SELECT estado, fallas, exitos, desde, error FROM estados WHERE stream_id = ?",
+                (stream_id,)).fetchone()
+            return dict(fila) if fila else None
+
+    def guardar_estado(self, stream_id, estado, fallas, exitos, desde=None, error=None):
+        with self.lock, self.conexion:
+            self.conexion.execute("INSERT OR REPLACE INTO estados VALUES (?, ?, ?, ?, ?, ?)",
+                                  (stream_id, estado, fallas, exitos, desde, error))
+
+    def huellas(self, stream_id, limite):
+        """
+        Las últimas `limite` huellas de audio del stream, como [(ts, bytes)] de la más vieja a la más nueva
+        """
+        with self.lock:
+            filas = self.conexion.execute(
+                "SELECT ts, datos FROM huellas WHERE stream_id = ? ORDER BY ts DESC LIMIT ?",
+                (stream_id, limite)).fetchall()
+        return filas[::-1]
+
+    def guardar_huella(self, stream_id, ts, datos, conservar):
+        """
+        Guarda una huella de audio y conserva sólo las últimas `conservar` del stream
+        """
+        with self.lock, self.conexion:
+            self.conexion.execute("INSERT OR REPLACE INTO huellas VALUES (?, ?, ?)", (stream_id, ts, datos))
+            self.conexion.execute(
+                "DELETE FROM huellas WHERE stream_id = ? AND ts NOT IN "
+                "(SELECT ts FROM huellas WHERE stream_id = ? ORDER BY ts DESC LIMIT ?)",
+                (stream_id, stream_id, conservar))
+
+    def latido(self, nodo, ts):
+        """
+        Anota que el nodo sigue activo (ver coordinacion.py)
+        """
+        with self.lock, self.conexion:
+            self.conexion.execute("INSERT OR REPLACE INTO nodos VALUES (?, ?)", (nodo, ts))
+
+    def nodos_activos(self, desde):
+        """
+        Nodos con un latido desde `desde`, ordenados por nombre
+        """
+        with self.lock:
+            return [fila[0] for fila in self.conexion.execute(
+                "SELECT nodo FROM nodos WHERE latido >= ? ORDER BY nodo", (desde,))]
+
+    def baja_nodo(self, nodo):
+        with self.lock, self.conexion:
+            self.conexion.execute("DELETE FROM nodos WHERE nodo = ?", (nodo,))
+
+    def reservar(self, clave, nodo, hasta, ahora):
+        """
+        Reserva `clave` para `nodo` hasta `hasta` si está libre, vencida o ya
+        es suya. Retorna True si quedó reservada para `nodo`.
+        """
+        with self.lock, self.conexion:
+            return self.conexion.execute(RESERVAR, (clave, nodo, hasta, ahora)).rowcount > 0
+
+    def liberar(self, clave, nodo):
+        with self.lock, self.conexion:
+            self.conexion.execute("DELETE FROM reservas WHERE clave = ? AND nodo = ?", (clave, nodo))
+
+    def meta(self, clave, valor=None):
+        """
+        Lee (o escribe, si se indica valor) un dato de control
+        """
+        with self.lock, self.conexion:
+            if valor is not None:
+                self.conexion.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (clave, valor))
+                return valor
+            fila = self.conexion.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+            return fila[0] if fila else None
+
+    def importar_logs(self, log_dir, streams):
+        """
+        Importa una única vez los logs de texto existentes (logs/log_*.log),
+        para que los resúmenes incluyan lo registrado antes del historial.
+        Retorna la cantidad de chequeos importados.
+        """
+        if self.meta("logs_importados"):
+            return 0
+
+        filas = []
+        principal = streams[0].id if streams else None
+        for archivo in sorted(glob.glob(os.path.join(log_dir, "log_*.log"))):
+            with open(archivo, "r", encoding="utf-8", errors="replace") as f:
+                for linea in f:
+                    fila = _interpretar_linea(linea, streams, principal)
+                    if fila:
+                        filas.append(fila)
+
+        with self.lock, self.conexion:
+            importadas = self.conexion.executemany(
+                "INSERT OR IGNORE INTO chequeos (stream_id, ts, resultado) VALUES (?, ?, ?)", filas).rowcount
+            self.conexion.execute("INSERT OR REPLACE INTO meta VALUES ('logs_importados', ?)",
+                                  (datetime.now().isoformat(timespec="seconds"),))
+        if importadas:
+            self.reconstruir_agregados()
+        return importadas
+
+
+def tramos(desde, hasta):
+    """
+    Descompone [desde, hasta) en tramos (nivel, inicio, fin) de agregados:
+    días completos, horas completas y minutos en los bordes.
+    Los bordes se redondean al minuto, incluyendo los minutos parciales.
+    Si los minutos de un borde ya fueron descartados por la retención,
+    ese borde (menos de una hora) no suma chequeos.
+    """
+    inicio = math.floor(desde / 60) * 60
+    fin = math.ceil(hasta / 60) * 60
+    if fin <= inicio:
+        return []
+
+    def dividir(a, b, niveles):
+        if a >= b:
+            return []
+        (nivel, segundos), resto = niveles[0], niveles[1:]
+        if not resto:
+            return [(nivel, a, b)]
+        x0 = math.ceil(a / segundos) * segundos
+        x1 = math.floor(b / segundos) * segundos
+        if x0 >= x1:
+            return dividir(a, b, resto)
+        return dividir(a, x0, resto) + [(nivel, x0, x1)] + dividir(x1, b, resto)
+
+    return dividir(inicio, fin, NIVELES)
+
+
+def _interpretar_linea(linea, streams, principal):
+    """
+    Convierte una línea de log de texto en (stream_id, ts, resultado), o None
+    """
+    try:
+        # El logging antepone "INFO:root:" a la fecha entre corchetes
+        fecha_str = linea[linea.index("[") + 1:linea.index("]")]
+        ts = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+    for stream in streams:
+        if f"🎵 {stream.nombre} funcionando correctamente" in linea:
+            return stream.id, ts, OK_NOCTURNO if "(modo nocturno)" in linea else OK
+        if "❌" in linea and f"{stream.nombre}." in linea:
+            return stream.id, ts, CAIDO
+        if "🔇" in linea and f"{stream.nombre}." in linea:
+            return stream.id, ts, SILENCIO
+
+    # Compatibilidad con logs antiguos (sin especificar stream)
+    if principal is None or "Principal" in linea or "Secundario" in linea:
+        return None
+    if "🎵 Stream funcionando correctamente" in linea:
+        return principal, ts, OK
+    if "❌" in linea and "No se pudo acceder" in linea:
+        return principal, ts, CAIDO
+    if "🔇" in linea:
+        return principal, ts, SILENCIO
+    return None
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Huellas de audio y detección de repetición
+Un playout colgado que repite la misma cortina, o un buffer congelado que
+se reproduce en loop, pasa el análisis de silencio. Cada fragmento se
+resume en una huella: por cada trama (cada 32 ms) 32 bits con el signo de
+la variación de energía entre bandas vecinas y tramas sucesivas (Haitsma y
+Kalker), más una máscara con los bits confiables (variación de al menos
+TOLERANCIA_DB). Por stream se guardan las huellas de los últimos
+fragmentos en un índice circular acotado. Un fragmento nuevo se
+correlaciona contra cada una para encontrar el desfase y en ese desfase la
+tasa de bits distintos confirma qué tramas repiten el pasado.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from analisis import muestras_pcm
+
+BANDAS = 33                 # 32 bits por trama
+FRECUENCIA_MIN = 300
+FRECUENCIA_MAX = 3000
+TRAMA_SEG = 0.256
+SOLAPAMIENTO = 8            # saltos por trama: un salto de 32 ms
+# Piso de energía por banda: lo más silencioso se iguala y no aporta bits confiables
+PISO_BANDA_DBFS = -60
+TOLERANCIA_DB = 1.0
+
+# Una trama se repite si en su vecindad difieren menos de este porcentaje
+# de los bits confiables en ambas huellas
+MAX_BITS_DISTINTOS = 0.25
+VECINDAD = 8                # tramas (256 ms) para calcular la tasa de bits distintos
+MIN_BITS_VECINDAD = 16      # bits confiables en común para decidir en una vecindad
+MIN_SEGUIDAS_SEG = 1.5      # parte repetida mínima con un mismo desfase (descarta ataques sueltos)
+CANDIDATOS = 3              # desfases a verificar por cada fragmento guardado
+
+_POTENCIAS = (1 << np.arange(32, dtype=np.uint64))
+
+
+def parametros(sample_rate):
+    """
+    (largo de trama, salto) en muestras para la frecuencia de muestreo
+    """
+    trama = 1 << int(round(np.log2(TRAMA_SEG * sample_rate)))
+    return trama, max(1, trama // SOLAPAMIENTO)
+
+
+def _bandas(trama, sample_rate):
+    """
+    Matriz (bins, BANDAS) que suma la potencia de cada banda logarítmica
+    """
+    maxima = min(FRECUENCIA_MAX, 0.45 * sample_rate)
+    bordes = np.geomspace(FRECUENCIA_MIN, maxima, BANDAS + 1)
+    frecuencias = np.fft.rfftfreq(trama, 1 / sample_rate)
+    indice = np.searchsorted(bordes, frecuencias, side="right") - 1
+    matriz = np.zeros((len(frecuencias), BANDAS), dtype=np.float32)
+    validos = (indice >= 0) & (indice < BANDAS)
+    matriz[np.flatnonzero(validos), indice[validos]] = 1
+    return matriz
+
+
+def _empaquetar(bits):
+    return (bits.astype(np.uint64) @ _POTENCIAS).astype(np.uint32)
+
+
+def calcular(pcm, sample_rate, canales=1, sample_width=2):
+    """
+    Huella de un buffer PCM: array uint64 con un valor por salto, los bits
+    en la parte baja y la máscara de bits confiables en la alta
+    """
+    muestras = muestras_pcm(pcm, sample_width)
+    muestras = muestras[:len(muestras) - len(muestras) % canales].reshape(-1, canales)
+    trama, salto = parametros(sample_rate)
+    if len(muestras) < trama + salto:
+        return np.zeros(0, dtype=np.uint64)
+    mono = muestras.mean(axis=1, dtype=np.float32) / (2 ** (sample_width * 8) / 2)
+    tramas = np.lib.stride_tricks.sliding_window_view(mono, trama)[::salto]
+    espectro = np.abs(np.fft.rfft(tramas * np.hanning(trama).astype(np.float32), axis=1)) ** 2
+    # Un seno a fondo de escala con ventana de Hann suma (trama / 4)² en su banda
+    piso = 10 ** (PISO_BANDA_DBFS / 10) * (trama / 4) ** 2
+    energia = 10 * np.log10(espectro.astype(np.float32) @ _bandas(trama, sample_rate) + piso)
+
+    # Bit m de la trama n: signo de (E[n,m] - E[n,m+1]) - (E[n-1,m] - E[n-1,m+1])
+    diferencia = energia[:, :-1] - energia[:, 1:]
+    variacion = diferencia[1:] - diferencia[:-1]
+    bits = _empaquetar(variacion > 0)
+    mascara = _empaquetar(np.abs(variacion) >= TOLERANCIA_DB)
+    return (mascara.astype(np.uint64) << np.uint64(32)) | bits
+
+
+def separar(huella):
+    """
+    (bits, máscara) de una huella, como arrays uint32
+    """
+    return (huella & np.uint64(0xFFFFFFFF)).astype(np.uint32), (huella >> np.uint64(32)).astype(np.uint32)
+
+
+def _contar_bits(valores):
+    return np.unpackbits(valores.astype("<u4").view(np.uint8)).reshape(-1, 32).sum(axis=1)
+
+
+def _ternaria(huella):
+    """
+    Matriz (tramas, 32): +1 / -1 en los bits confiables, 0 en el resto
+    """
+    bits, mascara = separar(huella)
+    unos = np.unpackbits(bits.astype("<u4").view(np.uint8), bitorder="little").reshape(-1, 32)
+    confiables = np.unpackbits(mascara.astype("<u4").view(np.uint8), bitorder="little").reshape(-1, 32)
+    return (2 * unos.astype(np.float32) - 1) * confiables
+
+
+def _desfases(huella, anterior):
+    """
+    Desfases (posición en `anterior` - posición en `huella`) con más bits
+    confiables coincidentes, por correlación cruzada en frecuencia
+    """
+    n, m = len(huella), len(anterior)
+    largo = 1 << int(np.ceil(np.log2(n + m)))
+    producto = np.fft.rfft(_ternaria(anterior), largo, axis=0) * np.conj(np.fft.rfft(_ternaria(huella), largo, axis=0))
+    correlacion = np.fft.irfft(producto.sum(axis=1), largo)
+    desfases = np.arange(largo)
+    desfases[desfases >= m] -= largo  # los índices altos son desfases negativos
+    validos = (desfases > -n + VECINDAD) & (desfases < m - VECINDAD)
+    correlacion, desfases = correlacion[validos], desfases[validos]
+    elegidos = []
+    for _ in range(CANDIDATOS):
+        mejor = int(np.argmax(correlacion))
+        if correlacion[mejor] < MIN_BITS_VECINDAD:
+            break
+        elegidos.append(int(desfases[mejor]))
+        correlacion[np.abs(desfases - desfases[mejor]) <= SOLAPAMIENTO] = 0
+    return elegidos
+
+
+def _rachas(iguales, distintas, minimo):
+    """
+    Tramas de las rachas sin tramas distintas de al menos `minimo` tramas
+    (y al menos la mitad iguales); las que no tienen bits suficientes para
+    decidir no cortan la racha
+    """
+    bordes = np.flatnonzero(np.diff(np.concatenate(([0], (~distintas).view(np.int8), [0]))))
+    largas = np.zeros(len(iguales), dtype=bool)
+    for inicio, fin in bordes.reshape(-1, 2):
+        if fin - inicio >= minimo and iguales[inicio:fin].sum() >= minimo // 2:
+            largas[inicio:fin] = True
+    return largas
+
+
+@dataclass
+class Repeticion:
+    fraccion: float = 0.0       # fracción de las tramas con huella que repiten el pasado
+    tramas: int = 0             # tramas con huella del fragmento nuevo
+    ts: float = None            # fecha del fragmento guardado con más coincidencias
+    segundos: float = 0.0       # duración de la parte repetida
+
+    def como_dict(self):
+        return {"fraccion": round(self.fraccion, 4), "tramas": self.tramas, "ts": self.ts,
+                "segundos": round(self.segundos, 2)}
+
+
+def comparar(huella, pasado, sample_rate):
+    """
+    Compara una huella con las de fragmentos anteriores (lista de (ts, huella)).
+    Retorna una Repeticion con la fracción de tramas que ya aparecieron.
+    """
+    segundos_por_trama = parametros(sample_rate)[1] / sample_rate
+    seguidas = int(np.ceil(MIN_SEGUIDAS_SEG / segundos_por_trama))
+    bits, mascara = separar(huella)
+    validas = mascara != 0
+    resultado = Repeticion(tramas=int(validas.sum()))
+    if not resultado.tramas:
+        return resultado
+    n = len(huella)
+    repetidas = np.zeros(n, dtype=bool)
+    ventana = np.ones(VECINDAD)
+    mejor = 0
+    for ts, anterior in pasado:
+        if len(anterior) < VECINDAD:
+            continue
+        bits_anterior, mascara_anterior = separar(anterior)
+        cubiertas = np.zeros(n, dtype=bool)
+        for desfase in _desfases(huella, anterior):
+            # Tramas alineadas con el desfase y tasa de bits distintos en su vecindad
+            desde, hasta = max(0, -desfase), min(n, len(anterior) - desfase)
+            comunes = mascara[desde:hasta] & mascara_anterior[desde + desfase:hasta + desfase]
+            distintos = (bits[desde:hasta] ^ bits_anterior[desde + desfase:hasta + desfase]) & comunes
+            total = np.convolve(_contar_bits(comunes), ventana, mode="same")
+            errores = np.convolve(_contar_bits(distintos), ventana, mode="same")
+            decidibles = total >= MIN_BITS_VECINDAD
+            iguales = decidibles & (errores < MAX_BITS_DISTINTOS * total)
+            cubiertas[desde:hasta] |= _rachas(iguales, decidibles & ~iguales, seguidas)
+        cubiertas &= validas
+        if cubiertas.sum() > mejor:
+            mejor, resultado.ts = int(cubiertas.sum()), ts
+        repetidas |= cubiertas
+    resultado.fraccion = float(repetidas.sum() / resultado.tramas)
+    resultado.segundos = float(repetidas.sum() * segundos_por_trama)
+    return resultado
+
+
+class IndiceHuellas:
+    """
+    Huellas de los últimos `fragmentos` fragmentos de cada stream, en memoria.
+    Con `historial`, el índice de cada stream se carga de la base la primera
+    vez y cada huella nueva se guarda también ahí (así sobrevive entre
+    ejecuciones por cron).
+    """
+
+    def __init__(self, fragmentos, sample_rate, historial=None):
+        self.fragmentos = fragmentos
+        self.sample_rate = sample_rate
+        self.historial = historial
+        self.indices = {}
+        self.lock = threading.Lock()
+
+    def _indice(self, stream_id):
+        with self.lock:
+            if stream_id not in self.indices:
+                guardadas = self.historial.huellas(stream_id, self.fragmentos) if self.historial else []
+                self.indices[stream_id] = deque(
+                    ((ts, np.frombuffer(datos, dtype="<u8")) for ts, datos in guardadas), maxlen=self.fragmentos)
+            return self.indices[stream_id]
+
+    def olvidar(self, stream_id):
+        """
+        Descarta el índice en memoria del stream: se vuelve a cargar del
+        historial (cuando otro nodo lo chequeó entretanto)
+        """
+        with self.lock:
+            self.indices.pop(stream_id, None)
+
+    def verificar(self, stream_id, huella, ts=None):
+        """
+        Compara la huella con el pasado reciente del stream y la agrega al índice.
+        Retorna una Repeticion.
+        """
+        ts = ts if ts is not None else time.time()
+        indice = self._indice(stream_id)
+        resultado = comparar(huella, list(indice), self.sample_rate)
+        huella = huella.astype("<u8")
+        indice.append((ts, huella))
+        if self.historial:
+            self.historial.guardar_huella(stream_id, ts, huella.tobytes(), self.fragmentos)
+        return resultado
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Métricas
+Histogramas y contadores en memoria, expuestos en formato OpenMetrics
+(o texto de Prometheus) por HTTP en /metrics, o escritos a un archivo
+para el textfile collector de node_exporter cuando se ejecuta por cron.
+"""
+
+import os
+import threading
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60)
+
+TIPO_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+TIPO_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas, extra=None):
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + "}"
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Registro:
+    """
+    Familias de métricas: nombre -> (tipo, ayuda, {etiquetas: valor}).
+    Las etiquetas se guardan como tupla ordenada de pares (clave, valor).
+    """
+
+    def __init__(self, prefijo="radiowatchdog", buckets=BUCKETS_SEGUNDOS):
+        self.prefijo = prefijo
+        self.buckets = tuple(buckets)
+        self.familias = {}
+        self.colectores = []
+        self.lock = threading.Lock()
+
+    def _serie(self, nombre, tipo, ayuda, etiquetas, inicial):
+        familia = self.familias.setdefault(nombre, (tipo, ayuda, {}))
+        clave = tuple(sorted((etiquetas or {}).items()))
+        return familia[2], clave, familia[2].setdefault(clave, inicial())
+
+    def incrementar(self, nombre, etiquetas=None, valor=1, ayuda=""):
+        with self.lock:
+            series, clave, actual = self._serie(nombre, "counter", ayuda, etiquetas, int)
+            series[clave] = actual + valor
+
+    def fijar(self, nombre, valor, etiquetas=None, ayuda=""):
+        with self.lock:
+            series, clave, _ = self._serie(nombre, "gauge", ayuda, etiquetas, float)
+            series[clave] = valor
+
+    def observar(self, nombre, valor, etiquetas=None, ayuda=""):
+        """
+        Registra una observación en un histograma (conteos por bucket, suma y cantidad)
+        """
+        with self.lock:
+            _, _, datos = self._serie(nombre, "histogram", ayuda, etiquetas,
+                                      lambda: {"buckets": [0] * len(self.buckets), "suma": 0.0, "cantidad": 0})
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    datos["buckets"][i] += 1
+            datos["suma"] += valor
+            datos["cantidad"] += 1
+
+    def agregar_colector(self, colector):
+        """
+        `colector()` retorna [(nombre, tipo, ayuda, [(etiquetas, valor)])] con
+        valores que se leen al exponer (por ejemplo, profundidad de una cola)
+        """
+        self.colectores.append(colector)
+
+    def exportar(self):
+        """
+        Estado serializable a JSON, para conservar los contadores entre ejecuciones por cron
+        """
+        with self.lock:
+            return {nombre: [tipo, ayuda, [[list(map(list, clave)), valor] for clave, valor in series.items()]]
+                    for nombre, (tipo, ayuda, series) in self.familias.items()}
+
+    def importar(self, estado):
+        with self.lock:
+            for nombre, (tipo, ayuda, series) in estado.items():
+                if tipo == "histogram" and any(len(valor["buckets"]) != len(self.buckets) for _, valor in series):
+                    continue  # guardado con otros buckets
+                self.familias[nombre] = (tipo, ayuda, {tuple(map(tuple, clave)): valor for clave, valor in series})
+
+    def exponer(self, openmetrics=True):
+        """
+        Texto de todas las métricas en formato OpenMetrics o de Prometheus
+        """
+        lineas = []
+        with self.lock:
+            familias = [(nombre, tipo, ayuda, list(series.items()))
+                        for nombre, (tipo, ayuda, series) in sorted(self.familias.items())]
+        for colector in self.colectores:
+            for nombre, tipo, ayuda, valores in colector():
+                familias.append((nombre, tipo, ayuda, [(tuple(sorted(e.items())), v) for e, v in valores]))
+
+        for nombre, tipo, ayuda, series in familias:
+            completo = f"{self.prefijo}_{nombre}"
+            nombre_tipo = completo if openmetrics or tipo != "counter" else f"{completo}_total"
+            lineas.append(f"# TYPE {nombre_tipo} {tipo}")
+            if ayuda:
+                lineas.append(f"# HELP {nombre_tipo} {ayuda}")
+            for clave, valor in series:
+                if tipo == "histogram":
+                    for limite, cantidad in zip(self.buckets + (float("inf"),),
+                                                valor["buckets"] + [valor["cantidad"]]):
+                        lineas.append(f"{completo}_bucket{_etiquetas(clave, ('le', _numero(limite)))} {cantidad}")
+                    lineas.append(f"{completo}_count{_etiquetas(clave)} {valor['cantidad']}")
+                    lineas.append(f"{completo}_sum{_etiquetas(clave)} {_numero(valor['suma'])}")
+                elif tipo == "counter":
+                    lineas.append(f"{completo}_total{_etiquetas(clave)} {_numero(valor)}")
+                else:
+                    lineas.append(f"{completo}{_etiquetas(clave)} {_numero(valor)}")
+        if openmetrics:
+            lineas.append("# EOF")
+        return "\n".join(lineas) + "\n"
+
+    def escribir_archivo(self, path):
+        """
+        Escribe las métricas en formato de texto de Prometheus de forma atómica
+        (node_exporter nunca ve un archivo a medio escribir)
+        """
+        temporal = f"{path}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.exponer(openmetrics=False))
+        os.replace(temporal, path)
+
+    def servir(self, host="127.0.0.1", puerto=9464):
+        """
+        Expone /metrics por HTTP en un hilo aparte. Retorna el servidor.
+        """
+        # Sólo los modos daemon y continuo sirven métricas: el cron no paga la importación
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registro = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, formato, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    return self.send_error(404)
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                cuerpo = registro.exponer(openmetrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", TIPO_OPENMETRICS if openmetrics else TIPO_PROMETHEUS)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+        return servidor
+
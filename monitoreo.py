@@ -6,102 +6,399 @@ Monitorea streams de radio 24/7 y envía alertas por email y Telegram
 """
 
 import os
-import smtplib
-import requests
+import time
+import sched
+import argparse
+import atexit
 import logging
 import glob
+import json
+import socket
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from email.header import Header
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
-
-
-# Inicialización
-load_dotenv()
-
-# Configuración desde .env
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT"))
-SMTP_USER = os.getenv("SMTP_USER")
-SMTP_PASS = os.getenv("SMTP_PASS")
-EMAIL_FROM = os.getenv("EMAIL_FROM")
-EMAIL_TO = os.getenv("EMAIL_TO")
-STREAM_URL = os.getenv("STREAM_URL")
-STREAM2_URL = os.getenv("STREAM2_URL")  # Segundo stream opcional
-THRESHOLD_DBFS = int(os.getenv("THRESHOLD_DBFS", -35))
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-
-# Paths
+from urllib.parse import urlsplit
+from config import CONFIG, ErrorConfiguracion
+from streams import Stream, cargar_streams
+from captura import capturar_pcm, sondear_pcm, lanzar, terminar, Colgado, Plazos, SAMPLE_WIDTH
+import historial
+import alertas
+import metricas
+import cola
+# analisis, calidad, huellas, comparacion, procesos, continuo y clips (NumPy), sonda y
+# notificaciones (requests, email) y pydub se importan en las funciones que los
+# usan: un chequeo por cron que termina en una falla de conexión no los necesita
+
+
+# La configuración (variables de entorno y .env) se lee y valida con el
+# primer uso de CONFIG, no al importar (ver config.py)
+
+def __getattr__(nombre):
+    """
+    monitoreo.INTERVALO_CHEQUEO y similares siguen disponibles como antes, desde CONFIG
+    """
+    if nombre.isupper() and nombre in CONFIG:
+        return getattr(CONFIG, nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+# Paths (la carpeta de logs se crea al escribir el primer mensaje)
 HOY = datetime.now().strftime('%Y-%m-%d')
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, f"log_{HOY}.log")
-TEMP_AUDIO_FILE = "temp_stream.mp3"
-TEMP_AUDIO_FILE2 = "temp_stream2.mp3"
 
-# Asegurar carpeta logs
-os.makedirs(LOG_DIR, exist_ok=True)
+_log_handler = None
+_log_lock = threading.Lock()
+
+REGISTRO = metricas.Registro()
+
+def configurar_log():
+    """
+    Apunta el logging al archivo del día actual.
+    Se llama en cada log() para que el modo daemon cambie de archivo
+    al pasar la medianoche en lugar de quedar fijo en el día de arranque.
+    """
+    global HOY, LOG_FILE, _log_handler
+    hoy = datetime.now().strftime('%Y-%m-%d')
+    if _log_handler is not None and hoy == HOY:
+        return
+
+    with _log_lock:
+        if _log_handler is not None and hoy == HOY:
+            return
+        _abrir_log_del_dia(hoy)
 
-# Configurar logging
-logging.basicConfig(filename=LOG_FILE, level=logging.INFO)
+def _abrir_log_del_dia(hoy):
+    global HOY, LOG_FILE, _log_handler
+    HOY = hoy
+    LOG_FILE = os.path.join(LOG_DIR, f"log_{HOY}.log")
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    if _log_handler is not None:
+        logger.removeHandler(_log_handler)
+        _log_handler.close()
+    # Mismo formato que logging.basicConfig para no alterar los logs existentes
+    _log_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+    _log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    logger.addHandler(_log_handler)
+
+_historial = None
+_historial_lock = threading.Lock()
+
+def obtener_historial():
+    """
+    Abre el historial de chequeos la primera vez que se necesita.
+    En la primera apertura importa los logs de texto existentes.
+    """
+    global _historial
+    with _historial_lock:
+        if _historial is None:
+            _historial = historial.Historial(CONFIG.HISTORIAL_DB)
+            importados = _historial.importar_logs(LOG_DIR, streams_configurados())
+            if importados:
+                log(f"🗄 Importados {importados} chequeos de los logs al historial")
+        return _historial
 
 def log(msg):
+    configurar_log()
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     mensaje = f"[{now}] {msg}"
     print(mensaje)
     logging.info(mensaje)
 
-def enviar_alerta(asunto:str, cuerpo:str) -> None:
+_pool_analisis = None
+_pool_analisis_lock = threading.Lock()
+
+def obtener_pool_analisis():
+    """
+    Crea el pool de procesos de análisis la primera vez que se necesita,
+    o retorna None si PROCESOS_ANALISIS es 0
+    """
+    global _pool_analisis
+    if not CONFIG.PROCESOS_ANALISIS:
+        return None
+    with _pool_analisis_lock:
+        if _pool_analisis is None:
+            import procesos
+            _pool_analisis = procesos.PoolAnalisis(CONFIG.PROCESOS_ANALISIS, CONFIG.COLA_ANALISIS)
+            REGISTRO.agregar_colector(lambda: [(
+                "analisis_en_cola", "gauge", "Análisis esperando un proceso libre",
+                [({}, _pool_analisis.en_cola())])])
+            atexit.register(_pool_analisis.cerrar)
+        return _pool_analisis
+
+_despachador = None
+_despachador_lock = threading.Lock()
+
+_indice_huellas = None
+_indice_huellas_lock = threading.Lock()
+
+def obtener_indice_huellas():
+    """
+    Retorna el índice de huellas de audio recientes, creado la primera vez
+    """
+    global _indice_huellas
+    with _indice_huellas_lock:
+        if _indice_huellas is None:
+            import huellas
+            _indice_huellas = huellas.IndiceHuellas(CONFIG.REPETICION_FRAGMENTOS, CONFIG.PCM_SAMPLE_RATE,
+                                                    obtener_historial())
+        return _indice_huellas
+
+_clips = None
+_clips_lock = threading.Lock()
+
+def obtener_clips():
+    """
+    Buffers de audio reciente por stream para los clips de las alertas,
+    creados la primera vez, o None si CLIPS_SEG es 0
+    """
+    global _clips
+    if not CONFIG.CLIPS_SEG:
+        return None
+    with _clips_lock:
+        if _clips is None:
+            import clips
+            _clips = clips.Clips(CONFIG.CLIPS_SEG, CONFIG.PCM_SAMPLE_RATE, CONFIG.PCM_CANALES, CONFIG.CLIPS_DIR,
+                                 mapear=CONFIG.CLIPS_MMAP)
+            cantidad = len(streams_configurados())
+            donde = f"archivos en {CONFIG.CLIPS_DIR}" if CONFIG.CLIPS_MMAP else "memoria"
+            log(f"🎧 Clips de {CONFIG.CLIPS_SEG}s por stream: {_clips.capacidad / 1024:.0f} KB cada uno, "
+                f"{_clips.capacidad * cantidad / 1024 ** 2:.1f} MB para {cantidad} streams ({donde})")
+            atexit.register(_clips.cerrar)
+        return _clips
+
+def conservar_audio(stream):
+    """
+    Función que agrega PCM del stream a su buffer de clips, o None si no hay clips
+    """
+    clips = obtener_clips()
+    return clips.buffer(stream.id).escribir if clips else None
+
+def adjuntar_clip(stream, linea):
+    """
+    Guarda como clip el audio reciente del stream y lo menciona en la línea
+    de la alerta. Retorna (línea, ruta del clip o None).
+    """
+    clips = obtener_clips()
+    if clips is None:
+        return linea, None
     try:
-        print(f"Asunto: {asunto!r}")  # Depuración
-        mensaje = MIMEMultipart()
-        mensaje["From"] = EMAIL_FROM
-        mensaje["To"] = EMAIL_TO
-        mensaje["Subject"] = Header(asunto, "utf-8").encode()
-        mensaje.attach(MIMEText(cuerpo, "plain", "utf-8"))
-
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(mensaje)
-
-        log(f"📧 Alerta enviada: {asunto}")
+        ruta = clips.guardar(stream.id)
     except Exception as e:
-        log(f"🚫 Error al enviar email: {e}")
+        log(f"🚫 Error guardando el clip de {stream.nombre}: {e}")
+        return linea, None
+    if ruta is None:
+        return linea, None
+    ruta = os.path.abspath(ruta)
+    log(f"🎧 Clip de {stream.nombre}: {ruta}")
+    return f"{linea}\n   🎧 Audio de los últimos {CONFIG.CLIPS_SEG}s: {ruta}", ruta
+
+def obtener_despachador():
+    """
+    Crea el despachador de notificaciones la primera vez que se necesita.
+    Al terminar el proceso se esperan los envíos pendientes (modo cron).
+    """
+    global _despachador
+    with _despachador_lock:
+        if _despachador is None:
+            import notificaciones
+            canales = []
+            if CONFIG.SMTP_SERVER:
+                canales.append(notificaciones.CanalEmail(CONFIG.SMTP_SERVER, CONFIG.SMTP_PORT, CONFIG.SMTP_USER,
+                                                         CONFIG.SMTP_PASS, CONFIG.EMAIL_FROM, CONFIG.EMAIL_TO,
+                                                         timeout=CONFIG.SMTP_TIMEOUT))
+            if CONFIG.TELEGRAM_BOT_TOKEN:
+                canales.append(notificaciones.CanalTelegram(CONFIG.TELEGRAM_BOT_TOKEN, CONFIG.TELEGRAM_CHAT_ID,
+                                                            timeout=CONFIG.TELEGRAM_TIMEOUT))
+            _despachador = notificaciones.Despachador(canales, log, capacidad=CONFIG.NOTIF_COLA,
+                                                      reintentos=CONFIG.NOTIF_REINTENTOS,
+                                                      on_entrega=registrar_entrega)
+            REGISTRO.agregar_colector(lambda: [(
+                "notificaciones_en_cola", "gauge", "Notificaciones pendientes de envío por canal",
+                [({"canal": canal}, datos["profundidad"]) for canal, datos in _despachador.metricas().items()])])
+            atexit.register(cerrar_despachador)
+        return _despachador
+
+def registrar_entrega(canal, resultado, latencia):
+    REGISTRO.incrementar("notificaciones", {"canal": canal, "resultado": resultado},
+                         ayuda="Notificaciones por canal y resultado (enviada, fallida, descartada)")
+    if latencia is not None:
+        REGISTRO.observar("notificacion_segundos", latencia, {"canal": canal},
+                          ayuda="Segundos desde que se encola una notificación hasta que se entrega o falla")
+
+def cerrar_despachador():
+    if _despachador is not None and not _despachador.detener(CONFIG.NOTIF_ESPERA_CIERRE):
+        log(f"🚫 Quedaron notificaciones sin enviar tras {CONFIG.NOTIF_ESPERA_CIERRE}s")
 
-    enviar_alerta_telegram(f"{asunto}\n{cuerpo}")
+def registrar_metricas_notificaciones():
+    """
+    Deja en el log la profundidad de cola y la latencia de entrega de cada canal
+    """
+    for canal, datos in obtener_despachador().metricas().items():
+        latencia = f"{datos['latencia_media']:.1f}s" if datos["latencia_media"] is not None else "-"
+        log(f"📬 Notificaciones {canal}: en cola {datos['profundidad']}, enviadas {datos['enviados']}, "
+            f"fallidas {datos['fallidos']}, descartadas {datos['descartados']}, latencia media {latencia}")
+
+def enviar_alerta(asunto:str, cuerpo:str, adjuntos=()) -> None:
+    """
+    Encola la alerta para email y Telegram; el envío se hace en segundo plano.
+    `adjuntos` son rutas de archivos (clips de audio) que se adjuntan al email.
+    """
+    despachador = obtener_despachador()
+    despachador.encolar("email", asunto, cuerpo, adjuntos)
+    despachador.encolar("telegram", asunto, cuerpo)
 
 def enviar_alerta_telegram(mensaje):
-    try:
-        token = TELEGRAM_BOT_TOKEN
-        chat_id = TELEGRAM_CHAT_ID
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        data = {"chat_id": chat_id, "text": mensaje}
-        r = requests.post(url, data=data)
-        if r.status_code == 200:
-            log("📲 Alerta enviada a Telegram")
-        else:
-            log(f"❌ Error al enviar Telegram: {r.text}")
-    except Exception as e:
-        log(f"🚫 Error en función Telegram: {e}")
+    obtener_despachador().encolar("telegram", None, mensaje)
+
+def plazos_chequeo(limite=None):
+    """
+    Plazos de una captura según la configuración; `limite` es el vencimiento del ciclo (time.monotonic)
+    """
+    return Plazos(CONFIG.TIMEOUT_CONEXION_SEG, CONFIG.TIMEOUT_INACTIVIDAD_SEG, CONFIG.PLAZO_CHEQUEO_SEG, limite)
 
 def bajar_fragmento(stream_url, temp_file):
     """
-    Descarga un fragmento de 10 segundos del stream especificado
+    Descarga un fragmento de 10 segundos del stream especificado.
+    Si FFmpeg no termina en PLAZO_CHEQUEO_SEG se mata y se retorna False.
+    """
+    comando = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+               "-rw_timeout", str(int(CONFIG.TIMEOUT_INACTIVIDAD_SEG * 1_000_000)),
+               "-i", stream_url, "-t", "10", "-acodec", "copy", temp_file]
+    try:
+        proceso = lanzar(comando)
+    except OSError:
+        return False
+    try:
+        proceso.wait(CONFIG.PLAZO_CHEQUEO_SEG)
+    except subprocess.TimeoutExpired:
+        terminar(proceso)
+        proceso.wait()
+        return False
+    return proceso.returncode == 0 and os.path.exists(temp_file)
+
+def capturar_fragmento(stream_url, fases=None, plazos=None):
+    """
+    Descarga un fragmento del stream decodificado a PCM en memoria.
+    Con `plazos` (ver plazos_chequeo) lanza Colgado si alguno se vence.
+    """
+    return capturar_pcm(stream_url, CONFIG.DURACION_FRAGMENTO, CONFIG.PCM_SAMPLE_RATE, CONFIG.PCM_CANALES,
+                        fases, plazos)
+
+def mide_calidad(reglas):
+    """
+    Si el análisis completo de un stream mide la calidad (calidad.py): para
+    evaluar sus `reglas` o para publicar las métricas. Cuesta bastante más que
+    el análisis de silencio, así que sin reglas ni métricas no se mide.
+    """
+    return bool(reglas or CONFIG.METRICAS_PUERTO or CONFIG.METRICAS_ARCHIVO)
+
+def analizar_pcm(pcm, sample_rate=None, canales=None, sample_width=SAMPLE_WIDTH, medir_calidad=False,
+                 calcular_huella=False):
+    """
+    Analiza PCM crudo (capturar_fragmento) sin volver a lanzar FFmpeg.
+    Sin `sample_rate` ni `canales` se usan PCM_SAMPLE_RATE y PCM_CANALES.
+    Retorna un analisis.ResultadoAnalisis, verdadero si al menos
+    PORCENTAJE_AUDIBLE_MIN % del audio no es silencio; con medir_calidad
+    y calcular_huella también trae la calidad y la huella del fragmento.
+    """
+    import analisis
+    pool = obtener_pool_analisis()
+    analizar = pool.analizar if pool else analisis.analizar
+    return analizar(pcm, sample_rate or CONFIG.PCM_SAMPLE_RATE, canales or CONFIG.PCM_CANALES, sample_width,
+                    min_silence_len=CONFIG.SILENCIO_MIN_MS, silence_thresh=CONFIG.THRESHOLD_DBFS,
+                    porcentaje_minimo=CONFIG.PORCENTAJE_AUDIBLE_MIN, medir_calidad=medir_calidad,
+                    calcular_huella=calcular_huella)
+
+def crear_analizador(medir_calidad=False):
+    """
+    AnalizadorIncremental de un fragmento, en el pool de procesos si está configurado.
+    Hay que llamar a cerrar() al terminar.
     """
-    cmd = f'ffmpeg -y -i "{stream_url}" -t 10 -acodec copy {temp_file} -loglevel error'
-    return os.system(cmd) == 0 and os.path.exists(temp_file)
+    opciones = dict(min_silence_len=CONFIG.SILENCIO_MIN_MS, silence_thresh=CONFIG.THRESHOLD_DBFS,
+                    porcentaje_minimo=CONFIG.PORCENTAJE_AUDIBLE_MIN, medir_calidad=medir_calidad)
+    formato = (CONFIG.DURACION_FRAGMENTO, CONFIG.PCM_SAMPLE_RATE, CONFIG.PCM_CANALES, SAMPLE_WIDTH)
+    pool = obtener_pool_analisis()
+    if pool:
+        return pool.incremental(*formato, **opciones)
+    import analisis
+    return analisis.AnalizadorIncremental(*formato, **opciones)
+
+def sondear_fragmento(stream_url, solo_conectividad=False, fases=None, plazos=None, al_recibir=None,
+                      medir_calidad=False):
+    """
+    Descarga y analiza el stream a medida que llega, cortando apenas el
+    resultado es seguro: con suficiente audio para PORCENTAJE_AUDIBLE_MIN o
+    con tanto silencio que ya no se puede alcanzar. Con solo_conectividad
+    alcanza con recibir el primer bloque de audio.
+    Retorna (accesible, ResultadoAnalisis o None).
+    Si se pasa el dict `fases`, guarda la duración de cada fase (ver sondear_pcm).
+    Con `plazos` lanza Colgado si alguno se vence.
+    Con `al_recibir`, se le pasa cada bloque de PCM (clips de las alertas).
+    Con medir_calidad el resultado trae también la calidad (ver mide_calidad).
+    """
+    fases = fases if fases is not None else {}
+    if solo_conectividad:
+        def conectado(bloque):
+            if al_recibir:
+                al_recibir(bloque)
+            return True
+
+        try:
+            return sondear_pcm(stream_url, conectado, CONFIG.DURACION_FRAGMENTO, CONFIG.PCM_SAMPLE_RATE,
+                               CONFIG.PCM_CANALES, fases=fases, plazos=plazos) is not None, None
+        finally:
+            fases["analisis"] = fases.pop("procesamiento", 0.0)
+
+    # El analizador se crea con el primer bloque: si no llega audio no hace falta cargar NumPy
+    analizador = []
+    try:
+        return _sondear_con_analizador(stream_url, analizador, fases, plazos, al_recibir, medir_calidad)
+    finally:
+        if analizador:
+            analizador[0].cerrar()
+
+def _sondear_con_analizador(stream_url, creado, fases, plazos, al_recibir=None, medir_calidad=False):
+    veredicto = []
+
+    def analizador():
+        if not creado:
+            creado.append(crear_analizador(medir_calidad))
+        return creado[0]
+
+    def procesar(bloque):
+        if al_recibir:
+            al_recibir(bloque)
+        analizador().agregar(bloque)
+        resultado = analizador().veredicto()
+        if resultado is not None:
+            veredicto.append(resultado)
+            return True
+        return False
+
+    try:
+        accesible = sondear_pcm(stream_url, procesar, CONFIG.DURACION_FRAGMENTO, CONFIG.PCM_SAMPLE_RATE,
+                                CONFIG.PCM_CANALES, fases=fases, plazos=plazos) is not None
+    finally:
+        fases["analisis"] = fases.pop("procesamiento", 0.0)
+    if not accesible:
+        return False, None
+
+    inicio = time.perf_counter()
+    resultado = analizador().resultado()
+    fases["analisis"] += time.perf_counter() - inicio
+    # El análisis parcial puede diferir del veredicto anticipado, que es el definitivo
+    if veredicto:
+        resultado.hay_audio = veredicto[0]
+    return True, resultado
 
 def analizar_audio(path):
+    from pydub import AudioSegment
     audio = AudioSegment.from_file(path)
-    duracion_total = len(audio)
-    partes_no_silencio = detect_nonsilent(audio, min_silence_len=1000, silence_thresh=THRESHOLD_DBFS)
-    if not partes_no_silencio:
-        return False
-    tiempo_sonando = sum([end - start for start, end in partes_no_silencio])
-    return (tiempo_sonando / duracion_total) * 100 >= 10
+    return analizar_pcm(audio.raw_data, audio.frame_rate, audio.channels, audio.sample_width)
 
 def limpiar_logs_viejos():
     ahora = datetime.now().timestamp()
@@ -109,6 +406,17 @@ def limpiar_logs_viejos():
         if ahora - os.path.getmtime(archivo) > 30 * 86400:
             os.remove(archivo)
             log(f"🧹 Log eliminado: {archivo}")
+    for archivo in glob.glob(os.path.join(CONFIG.CLIPS_DIR, "*.wav")):
+        if ahora - os.path.getmtime(archivo) > 30 * 86400:
+            os.remove(archivo)
+            log(f"🧹 Clip eliminado: {archivo}")
+
+    # El historial se reduce por niveles en lugar de borrarse de una vez
+    if not tarea_unica(f"retencion:{datetime.now():%Y-%m-%d}"):
+        return
+    eliminadas = obtener_historial().aplicar_retencion(CONFIG.RETENCION_HISTORIAL)
+    if eliminadas:
+        log(f"🧹 Historial: {eliminadas} registros antiguos eliminados")
 
 def es_hora_de_resumen():
     """
@@ -123,177 +431,1027 @@ def es_hora_de_resumen():
     # Verificar ventana de tolerancia de 16 minutos (0-15 minutos)
     return 0 <= ahora.minute <= 15
 
+def proximo_resumen(ahora=None):
+    """
+    Retorna el próximo horario de resumen (06:00 o 18:00) posterior a ahora.
+    """
+    ahora = ahora or datetime.now()
+    for dias in (0, 1):
+        dia = ahora + timedelta(days=dias)
+        for hora in (6, 18):
+            candidato = dia.replace(hour=hora, minute=0, second=0, microsecond=0)
+            if candidato > ahora:
+                return candidato
+
+def proxima_medianoche(ahora=None):
+    """
+    Retorna el inicio del día siguiente.
+    """
+    ahora = ahora or datetime.now()
+    manana = ahora + timedelta(days=1)
+    return manana.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def es_hora_nocturna(hora, desde=None, hasta=None):
+    """
+    Si la hora (0-23) cae en el horario nocturno [desde, hasta), que puede
+    pasar la medianoche. Sin `desde` ni `hasta` se usan NOCHE_DESDE y NOCHE_HASTA.
+    """
+    desde = CONFIG.NOCHE_DESDE if desde is None else desde
+    hasta = CONFIG.NOCHE_HASTA if hasta is None else hasta
+    if desde <= hasta:
+        return desde <= hora < hasta
+    return hora >= desde or hora < hasta
+
+def horario_nocturno():
+    """
+    Texto del horario nocturno configurado, para los logs
+    """
+    return f"{CONFIG.NOCHE_DESDE:02d}:00-{CONFIG.NOCHE_HASTA:02d}:00"
+
+def en_horario_nocturno():
+    """
+    Verifica si estamos en horario nocturno (NOCHE_DESDE a NOCHE_HASTA)
+    """
+    return es_hora_nocturna(datetime.now().hour)
+
+def armar_resumen(hist, streams, ahora):
+    """
+    Arma el texto del resumen de las 6 horas anteriores a `ahora` a partir del historial.
+    Retorna (mensaje, resumen) con resumen = {stream_id: (ok, errores, primer_error)}.
+    """
+    desde = ahora - timedelta(hours=6)
+    resumen = hist.resumen([stream.id for stream in streams], desde.timestamp(), ahora.timestamp() + 1)
+
+    horario = "🌅 Mañana" if ahora.hour == 6 else "🌆 Tarde"
+    mensaje = f"{horario} - Resumen últimas 6hs:\n\n"
+
+    for i, stream in enumerate(streams):
+        icono = "📡" if i == 0 else "📻"
+        ok, errores, primer_error = resumen[stream.id]
+        total = ok + errores
+        if total == 0:
+            mensaje += f"{icono} {stream.nombre}: ❔ No se encontraron registros.\n"
+        elif not errores:
+            mensaje += f"{icono} {stream.nombre}: ✅ Todo OK ({ok}/{total} chequeos)\n"
+        else:
+            mensaje += f"{icono} {stream.nombre}: ✅ {ok}/{total} OK | ❌ {errores} errores\n"
+            mensaje += f"   🕐 Primer error: {datetime.fromtimestamp(primer_error).strftime('%H:%M')}\n"
+
+    # Configuración histórica de dos streams sin secundario
+    if not CONFIG.STREAMS_FILE and not CONFIG.STREAM2_URL:
+        mensaje += "📻 Stream Secundario: No configurado\n"
+
+    return mensaje, resumen
+
 def enviar_resumen_telegram():
     """
     Envía resumen de las últimas 6 horas por Telegram.
-    Analiza logs y cuenta eventos OK vs errores para ambos streams.
+    Consulta el historial y cuenta chequeos OK vs errores para cada stream configurado.
     """
     ahora = datetime.now()
     desde = ahora - timedelta(hours=6)
-    
-    # Contadores para Stream Principal
-    ok_count_principal = 0
-    caidas_principal = []
-    
-    # Contadores para Stream Secundario
-    ok_count_secundario = 0
-    caidas_secundario = []
-    
+    streams = streams_configurados()
+    if not tarea_unica(f"resumen:{ahora:%Y-%m-%d %H}"):
+        log("📊 El resumen de este horario lo envía otro nodo")
+        return
+
     log(f"📊 Generando resumen desde {desde.strftime('%H:%M')} hasta {ahora.strftime('%H:%M')}")
 
     try:
-        for archivo in glob.glob(os.path.join(LOG_DIR, "log_*.log")):
-            with open(archivo, "r", encoding="latin-1") as f:
-                for linea in f:
-                    try:
-                        # Extraer timestamp de la línea
-                        if "]" not in linea or "[" not in linea:
-                            continue
-                            
-                        fecha_str = linea.split("]")[0].strip("[")
-                        fecha = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
-                        
-                        # Solo procesar eventos dentro del rango de 6 horas
-                        if fecha >= desde:
-                            # Stream Principal
-                            if ("🎵 Stream Principal funcionando correctamente" in linea or 
-                                "Stream Principal funcionando correctamente (modo nocturno)" in linea):
-                                ok_count_principal += 1
-                            elif ("❌" in linea and "Stream Principal" in linea) or ("🔇" in linea and "Stream Principal" in linea):
-                                caidas_principal.append(fecha.strftime("%H:%M"))
-                            
-                            # Stream Secundario (si existe)
-                            elif ("🎵 Stream Secundario funcionando correctamente" in linea or 
-                                  "Stream Secundario funcionando correctamente (modo nocturno)" in linea):
-                                ok_count_secundario += 1
-                            elif ("❌" in linea and "Stream Secundario" in linea) or ("🔇" in linea and "Stream Secundario" in linea):
-                                caidas_secundario.append(fecha.strftime("%H:%M"))
-                            
-                            # Compatibilidad con logs antiguos (sin especificar stream)
-                            elif ("🎵 Stream funcionando correctamente" in linea and 
-                                  "Principal" not in linea and "Secundario" not in linea):
-                                ok_count_principal += 1
-                            elif (("❌" in linea or "🔇" in linea) and 
-                                  "Principal" not in linea and "Secundario" not in linea):
-                                caidas_principal.append(fecha.strftime("%H:%M"))
-                                
-                    except (ValueError, IndexError):
-                        # Error al parsear fecha, continuar con siguiente línea
-                        continue
-
-        # Generar mensaje de resumen
-        horario = "🌅 Mañana" if ahora.hour == 6 else "🌆 Tarde"
-        mensaje = f"{horario} - Resumen últimas 6hs:\n\n"
-
-        # Calcular totales
-        total_principal = ok_count_principal + len(caidas_principal)
-        total_secundario = ok_count_secundario + len(caidas_secundario)
-
-        # Resumen Stream Principal
-        if total_principal > 0:
-            if not caidas_principal:
-                mensaje += f"📡 Stream Principal: ✅ Todo OK ({ok_count_principal}/{total_principal} chequeos)\n"
-            else:
-                primer_error_principal = min(caidas_principal) if caidas_principal else "N/A"
-                mensaje += f"📡 Stream Principal: ✅ {ok_count_principal}/{total_principal} OK | ❌ {len(caidas_principal)} errores\n"
-                mensaje += f"   🕐 Primer error: {primer_error_principal}\n"
-        else:
-            mensaje += f"📡 Stream Principal: ❔ No se encontraron registros.\n"
-
-        # Resumen Stream Secundario (solo si está configurado)
-        if STREAM2_URL:
-            if total_secundario > 0:
-                if not caidas_secundario:
-                    mensaje += f"📻 Stream Secundario: ✅ Todo OK ({ok_count_secundario}/{total_secundario} chequeos)\n"
-                else:
-                    primer_error_secundario = min(caidas_secundario) if caidas_secundario else "N/A"
-                    mensaje += f"📻 Stream Secundario: ✅ {ok_count_secundario}/{total_secundario} OK | ❌ {len(caidas_secundario)} errores\n"
-                    mensaje += f"   🕐 Primer error: {primer_error_secundario}\n"
-            else:
-                mensaje += f"📻 Stream Secundario: ❔ No se encontraron registros.\n"
-        else:
-            mensaje += "📻 Stream Secundario: No configurado\n"
+        mensaje, resumen = armar_resumen(obtener_historial(), streams, ahora)
 
         enviar_alerta_telegram(mensaje)
-        log(f"📋 Resumen enviado: Principal({ok_count_principal} OK, {len(caidas_principal)} errores), "
-            f"Secundario({ok_count_secundario} OK, {len(caidas_secundario)} errores)")
+        detalle = ", ".join(f"{stream.nombre}({resumen[stream.id][0]} OK, {resumen[stream.id][1]} errores)"
+                            for stream in streams)
+        log(f"📋 Resumen enviado: {detalle}")
         
     except Exception as e:
         log(f"🚫 Error generando resumen: {e}")
         enviar_alerta_telegram(f"⚠️ Error al generar resumen de las últimas 6hs: {str(e)}")
 
-def monitorear_stream(stream_url, temp_file, stream_nombre):
+def registrar_chequeo(stream, resultado, analisis_audio=None, latencia=None, detalle=None):
+    """
+    Guarda el resultado del chequeo en el historial sin interrumpir el monitoreo si falla
+    """
+    REGISTRO.incrementar("chequeos", {"stream": stream.id, "resultado": resultado},
+                         ayuda="Chequeos por stream y resultado")
+    datos = {}
+    if analisis_audio is not None:
+        datos = dict(porcentaje_audible=analisis_audio.porcentaje_audible, dbfs=analisis_audio.dbfs,
+                     dbfs_max=analisis_audio.dbfs_max, dbfs_min=analisis_audio.dbfs_min)
+        if analisis_audio.calidad is not None:
+            detalle = dict(detalle or {}, calidad=analisis_audio.calidad.como_dict())
+            registrar_calidad(stream, analisis_audio.calidad)
+    try:
+        obtener_historial().registrar(stream.id, resultado, latencia=latencia, detalle=detalle, **datos)
+    except Exception as e:
+        log(f"🚫 Error guardando historial de {stream.nombre}: {e}")
+
+def registrar_calidad(stream, medicion):
     """
-    Monitorea un stream específico y retorna el resultado
+    Publica las métricas de calidad del último análisis completo
+    """
+    import calidad
+    for metrica in calidad.METRICAS:
+        valor = getattr(medicion, metrica)
+        if valor is not None:
+            REGISTRO.fijar("calidad", valor, {"stream": stream.id, "metrica": metrica},
+                           ayuda="Métricas de calidad del último análisis completo (lufs, pico_dbfs, recorte, ...)")
+
+def reglas_calidad(stream):
     """
-    if not bajar_fragmento(stream_url, temp_file):
+    Reglas de calidad del stream: REGLAS_CALIDAD con las propias por encima
+    """
+    if not CONFIG.REGLAS_CALIDAD and not stream.reglas:
+        return {}
+    import calidad
+    return calidad.combinar_reglas(CONFIG.REGLAS_CALIDAD, stream.reglas)
+
+def verificar_repeticion(stream, resultado):
+    """
+    Compara la huella del fragmento con las anteriores del stream.
+    Retorna una huellas.Repeticion, o None si no hay huella.
+    """
+    if resultado.huella is None:
+        return None
+    try:
+        repeticion = obtener_indice_huellas().verificar(stream.id, resultado.huella)
+    except Exception as e:
+        log(f"🚫 Error comparando huellas de {stream.nombre}: {e}")
+        return None
+    REGISTRO.fijar("repeticion", repeticion.fraccion, {"stream": stream.id},
+                   ayuda="Fracción del último fragmento analizado que repite audio reciente")
+    return repeticion
+
+def medir_dns(stream_url):
+    """
+    Resuelve el host del stream y retorna los segundos que tardó,
+    o None si la URL no tiene host
+    """
+    host = urlsplit(stream_url).hostname
+    if not host:
+        return None
+    inicio = time.perf_counter()
+    try:
+        socket.getaddrinfo(host, None)
+    except OSError:
+        pass
+    return time.perf_counter() - inicio
+
+AYUDA_FASES = "Duración de cada fase del chequeo (dns, primer_byte, captura, analisis, total, sondeo_rapido)"
+
+def registrar_fases(stream, fases, total):
+    """
+    Agrega la duración de cada fase del chequeo a los histogramas por stream y fase
+    """
+    for fase, segundos in dict(fases, total=total).items():
+        REGISTRO.observar("fase_segundos", segundos, {"stream": stream.id, "fase": fase},
+                          ayuda=AYUDA_FASES)
+
+_ultimo_analisis = {}
+_ultimo_analisis_lock = threading.Lock()
+
+def usa_sondeo_rapido(stream):
+    """
+    Si el stream se chequea con sondeo escalonado (INTERVALO_ANALISIS_COMPLETO)
+    """
+    if not CONFIG.INTERVALO_ANALISIS_COMPLETO:
+        return False
+    import sonda
+    return sonda.admite_sondeo_rapido(stream.url)
+
+def requiere_analisis_completo(stream, es_horario_nocturno=False):
+    """
+    Sondeo escalonado: decide si el chequeo necesita decodificar y analizar
+    el audio o si alcanza con el sondeo rápido por HTTP
+    """
+    if not usa_sondeo_rapido(stream):
+        return True
+    hist = obtener_historial()
+    estado = hist.estado(stream.id)
+    if estado and estado["estado"] != alertas.NORMAL:
+        return True  # los problemas y las recuperaciones se confirman con el análisis completo
+    if es_horario_nocturno:
+        return False  # de noche no se detecta silencio
+    with _ultimo_analisis_lock:
+        if stream.id not in _ultimo_analisis:
+            _ultimo_analisis[stream.id] = hist.ultimo_analisis(stream.id) or 0
+        return time.time() - _ultimo_analisis[stream.id] >= CONFIG.INTERVALO_ANALISIS_COMPLETO
+
+def olvidar_stream(stream_id):
+    """
+    Descarta lo que se guarda en memoria de un stream (último análisis
+    completo, huellas): se vuelve a leer del historial
+    """
+    with _ultimo_analisis_lock:
+        _ultimo_analisis.pop(stream_id, None)
+    if _indice_huellas is not None:
+        _indice_huellas.olvidar(stream_id)
+
+def sondeo_rapido(stream):
+    """
+    Verifica por HTTP que el stream responda con audio y recorre sus
+    frames, sin decodificar. Retorna (sonda.ResultadoSonda, motivo) con
+    motivo None si todo está normal, o la anomalía que amerita el análisis completo.
+    """
+    import sonda
+    resultado = sonda.sondear_http(stream.url, CONFIG.SONDEO_BYTES, CONFIG.TIMEOUT_CONEXION_SEG,
+                                   CONFIG.TIMEOUT_INACTIVIDAD_SEG, CONFIG.SONDEO_PLAZO_SEG)
+    REGISTRO.observar("fase_segundos", resultado.segundos, {"stream": stream.id, "fase": "sondeo_rapido"},
+                      ayuda=AYUDA_FASES)
+
+    motivo = resultado.motivo
+    if resultado.estado_http == 200:
+        # Un cambio de formato o bitrate también amerita mirar el audio
+        clave = f"sondeo:{stream.id}"
+        firma = json.dumps(resultado.firma(), sort_keys=True)
+        anterior = obtener_historial().meta(clave)
+        if anterior != firma:
+            obtener_historial().meta(clave, firma)
+            if anterior and not motivo:
+                motivo = f"cambiaron las cabeceras ({firma})"
+
+    if resultado.integridad is not None:
+        REGISTRO.incrementar("bitstream_errores_sync", {"stream": stream.id}, resultado.integridad.errores_sync,
+                             ayuda="Pérdidas de sincronía entre frames MP3/AAC en los sondeos rápidos")
+        if resultado.integridad.bitrate_kbps is not None:
+            REGISTRO.fijar("bitstream_kbps", resultado.integridad.bitrate_kbps, {"stream": stream.id},
+                           ayuda="Bitrate efectivo medido sobre los frames del último sondeo rápido")
+
+    REGISTRO.incrementar("sondeos_rapidos", {"stream": stream.id, "resultado": "anomalia" if motivo else "ok"},
+                         ayuda="Sondeos rápidos por stream y resultado (ok o anomalia)")
+    if motivo:
+        log(f"🔎 {stream.nombre}: {motivo}; se hace el análisis completo")
+    else:
+        formato = resultado.integridad.descripcion() if resultado.integridad else resultado.tipo
+        bitrate = f", {resultado.integridad.bitrate_kbps:.0f} kbps" if resultado.integridad else ""
+        log(f"🔎 {stream.nombre}: responde {formato}{bitrate}, {resultado.bytes} bytes en {resultado.segundos:.2f}s")
+    return resultado, motivo
+
+def monitorear_stream(stream, es_horario_nocturno=False, limite=None):
+    """
+    Monitorea un stream específico, registra el resultado en el historial
+    y retorna (ok, error) donde error es la línea a incluir en la alerta.
+    `limite` es el vencimiento del ciclo (time.monotonic), si lo hay.
+    Con INTERVALO_ANALISIS_COMPLETO, entre análisis completos sólo se hace el sondeo rápido.
+    """
+    stream_nombre = stream.nombre
+    detalle = None
+    reglas = reglas_calidad(stream)
+    if usa_sondeo_rapido(stream):
+        rapido, motivo = sondeo_rapido(stream)
+        detalle = rapido.detalle()
+        if not motivo and not requiere_analisis_completo(stream, es_horario_nocturno):
+            detalle["sondeo"] = "rapido"
+            if es_horario_nocturno:
+                log(f"🎵 {stream_nombre} funcionando correctamente (modo nocturno)")
+                registrar_chequeo(stream, historial.OK_NOCTURNO, latencia=rapido.segundos, detalle=detalle)
+            else:
+                log(f"🎵 {stream_nombre} funcionando correctamente")
+                registrar_chequeo(stream, historial.OK, latencia=rapido.segundos, detalle=detalle)
+            return True, None
+
+    fases = {}
+    plazos = plazos_chequeo(limite)
+    conservar = conservar_audio(stream)
+    colgado = None
+    inicio = time.monotonic()
+    dns = medir_dns(stream.url)
+    if dns is not None:
+        fases["dns"] = dns
+    try:
+        # Las reglas de calidad y las huellas se calculan sobre el fragmento completo
+        if CONFIG.SALIDA_TEMPRANA and not reglas and not CONFIG.REPETICION_FRAGMENTOS:
+            accesible, resultado = sondear_fragmento(stream.url, solo_conectividad=es_horario_nocturno,
+                                                     fases=fases, plazos=plazos, al_recibir=conservar,
+                                                     medir_calidad=mide_calidad(reglas))
+        else:
+            pcm = capturar_fragmento(stream.url, fases, plazos)
+            accesible = pcm is not None
+            if accesible and conservar:
+                conservar(pcm)
+            resultado = None
+            if accesible and not es_horario_nocturno:
+                inicio_analisis = time.perf_counter()
+                resultado = analizar_pcm(pcm, medir_calidad=mide_calidad(reglas),
+                                         calcular_huella=bool(CONFIG.REPETICION_FRAGMENTOS))
+                fases["analisis"] = time.perf_counter() - inicio_analisis
+    except Colgado as e:
+        colgado = e.motivo
+    latencia = time.monotonic() - inicio
+    log(f"⏱ {stream_nombre}: chequeo en {latencia:.2f}s")
+    registrar_fases(stream, fases, latencia)
+
+    if colgado:
+        return reportar_colgado(stream, colgado, latencia, detalle)
+
+    if not accesible:
         msg = f"No se pudo acceder al {stream_nombre}."
         log(f"❌ {msg}")
-        return False, msg
-    
-    if not analizar_audio(temp_file):
+        registrar_chequeo(stream, historial.CAIDO, latencia=latencia, detalle=detalle)
+        return False, f"🛑 {stream_nombre} caído: {msg}"
+
+    if es_horario_nocturno:
+        log(f"🌙 Horario nocturno ({horario_nocturno()}): omitiendo detección de silencio en {stream_nombre}")
+        log(f"🎵 {stream_nombre} funcionando correctamente (modo nocturno)")
+        registrar_chequeo(stream, historial.OK_NOCTURNO, latencia=latencia, detalle=detalle)
+        return True, None
+
+    with _ultimo_analisis_lock:
+        _ultimo_analisis[stream.id] = time.time()
+
+    if not resultado:
         msg = f"Silencio prolongado detectado en el {stream_nombre}."
         log(f"🔇 {msg}")
-        return False, msg
+        registrar_chequeo(stream, historial.SILENCIO, resultado, latencia, detalle)
+        return False, f"⚠️ {stream_nombre} con silencio: {msg}"
+
+    repeticion = verificar_repeticion(stream, resultado)
+    if repeticion is not None:
+        detalle = dict(detalle or {}, repeticion=repeticion.como_dict())
+        if repeticion.fraccion >= CONFIG.REPETICION_UMBRAL:
+            msg = (f"El {stream_nombre} repite audio ya transmitido "
+                   f"({repeticion.fraccion:.0%} del fragmento, {repeticion.segundos:.1f}s).")
+            log(f"🔂 {msg}")
+            registrar_chequeo(stream, historial.REPETICION, resultado, latencia, detalle)
+            return False, f"🔂 {stream_nombre} repitiendo audio: {msg}"
+
+    problemas = []
+    if reglas and resultado.calidad:
+        import calidad
+        problemas = calidad.evaluar(resultado.calidad, reglas)
+    if problemas:
+        msg = f"Calidad de audio fuera de rango en el {stream_nombre}: {', '.join(problemas)}."
+        log(f"🎛 {msg}")
+        registrar_chequeo(stream, historial.CALIDAD, resultado, latencia, detalle)
+        return False, f"🎛 {stream_nombre} con problemas de calidad: {msg}"
+
+    log(f"🎵 {stream_nombre} funcionando correctamente")
+    registrar_chequeo(stream, historial.OK, resultado, latencia, detalle)
+    return True, None
+
+def reportar_colgado(stream, motivo, latencia=None, detalle=None):
+    """
+    Registra un chequeo cortado por vencer sus plazos y retorna (False, error)
+    """
+    msg = f"El {stream.nombre} no respondió a tiempo ({motivo})."
+    log(f"⌛ {msg}")
+    registrar_chequeo(stream, historial.COLGADO, latencia=latencia, detalle=detalle)
+    return False, f"⌛ {stream.nombre} colgado: {msg}"
+
+def streams_configurados():
+    """
+    Retorna la lista de streams a monitorear (ver streams.py)
+    """
+    return cargar_streams(CONFIG.STREAMS_FILE, CONFIG.STREAM_URL, CONFIG.STREAM2_URL,
+                          CONFIG.INTERVALO_CHEQUEO, CONFIG.STREAM_INTERVALO, CONFIG.STREAM2_INTERVALO)
+
+def crear_cola(concurrencia):
+    """
+    Cola de chequeos con los límites por host de la configuración (ver cola.py)
+    """
+    return cola.ColaChequeos(concurrencia, CONFIG.MAX_CONEXIONES_POR_HOST, CONFIG.ESPACIADO_HOST_SEG,
+                             al_iniciar=registrar_espera)
+
+def registrar_espera(clave, segundos):
+    REGISTRO.observar("chequeo_espera_segundos", segundos, {"stream": clave},
+                      ayuda="Segundos que un chequeo esperó turno en la cola (límite por host o concurrencia)")
+
+def vencimiento(stream):
+    """
+    Cuándo le toca al stream según su último chequeo registrado: en la cola
+    pasan primero los más atrasados
+    """
+    try:
+        ultimo = obtener_historial().ultimo_chequeo(stream.id)
+    except Exception:
+        ultimo = None
+    return (ultimo or 0) + stream.intervalo
+
+def sondear_streams(streams, es_horario_nocturno=False, plazo=None):
+    """
+    Descarga y analiza todos los streams en paralelo, con hasta
+    MAX_CONCURRENCIA sondeos simultáneos y MAX_CONEXIONES_POR_HOST por
+    servidor, por prioridad y los más atrasados primero.
+    Con `plazo` (segundos), los chequeos en curso al vencer se cortan y los
+    que no llegaron a empezar se reportan como colgados.
+    Retorna una lista de (stream, ok, error) en el orden del registro.
+    """
+    if not streams:
+        return []
+
+    limite = time.monotonic() + plazo if plazo else None
+    chequeos = crear_cola(min(CONFIG.MAX_CONCURRENCIA, len(streams)))
+    try:
+        # Se encolan en el orden de la cola: los primeros arrancan apenas se agregan
+        vencimientos = {stream.id: vencimiento(stream) for stream in streams}
+        futuros = {}
+        for stream in sorted(streams, key=lambda s: (cola.PRIORIDADES[s.prioridad][0], vencimientos[s.id])):
+            futuros[stream.id] = chequeos.agregar(stream.id, [stream.url], stream.prioridad,
+                                                  vencimientos[stream.id], monitorear_stream,
+                                                  stream, es_horario_nocturno, limite)
+        # Margen para que el vigilante de cada captura mate su FFmpeg y el chequeo termine
+        wait(futuros.values(), timeout=plazo + 5 if plazo else None)
+    finally:
+        chequeos.cerrar(cancelar=True)
+
+    resultados = []
+    for stream in streams:
+        futuro = futuros[stream.id]
+        if futuro.done() and not futuro.cancelled():
+            ok, error = futuro.result()
+        else:
+            ok, error = reportar_colgado(stream, "plazo del ciclo vencido antes de chequearlo")
+        resultados.append((stream, ok, error))
+    return resultados
+
+def pares_comparacion(streams):
+    """
+    Pares de COMPARAR_STREAMS como [(principal, respaldo)]; los inválidos se informan en el log
+    """
+    por_id = {stream.id: stream for stream in streams}
+    pares = []
+    for par in filter(None, (texto.strip() for texto in CONFIG.COMPARAR_STREAMS.split(";"))):
+        ids = [stream_id.strip() for stream_id in par.split(",")]
+        if len(ids) != 2 or not all(stream_id in por_id for stream_id in ids):
+            log(f"🚫 COMPARAR_STREAMS: par inválido '{par}' (ids disponibles: {', '.join(por_id)})")
+            continue
+        pares.append((por_id[ids[0]], por_id[ids[1]]))
+    return pares
+
+def capturar_simultaneo(streams, duracion, limite=None):
+    """
+    Captura `duracion` segundos de cada stream, todos a la vez. Retorna una
+    lista de (PCM o None, time.monotonic() de llegada del último bloque).
+    """
+    def capturar(stream):
+        bloques = []
+        llegada = []
+
+        def procesar(bloque):
+            bloques.append(bloque)
+            llegada[:] = [time.monotonic()]
+            return False
+
+        plazos = Plazos(CONFIG.TIMEOUT_CONEXION_SEG, CONFIG.TIMEOUT_INACTIVIDAD_SEG, duracion + 20, limite)
+        try:
+            recibidos = sondear_pcm(stream.url, procesar, duracion, CONFIG.PCM_SAMPLE_RATE, CONFIG.PCM_CANALES,
+                                    plazos=plazos)
+        except Colgado:
+            recibidos = None
+        if recibidos is None or not bloques:
+            return None, None
+        return b"".join(bloques), llegada[0]
+
+    with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+        return list(executor.map(capturar, streams))
+
+def comparar_streams(principal, respaldo, es_horario_nocturno=False, limite=None):
+    """
+    Captura ambos streams a la vez y compara sus envolventes (ver comparacion.py).
+    Retorna (par, ok, error) como un chequeo más, con `par` un Stream que
+    representa a los dos, o None si no se pudieron comparar.
+    """
+    par = Stream(f"{principal.id}~{respaldo.id}", f"{principal.nombre} / {respaldo.nombre}", "",
+                 max(principal.intervalo, respaldo.intervalo))
+    if es_horario_nocturno:
+        return None  # de noche puede haber silencios largos que no se pueden comparar
+    inicio = time.monotonic()
+    (pcm_a, fin_a), (pcm_b, fin_b) = capturar_simultaneo((principal, respaldo), CONFIG.COMPARACION_SEG, limite)
+    if pcm_a is None or pcm_b is None:
+        log(f"🔀 {par.nombre}: no se pudieron capturar ambos streams, se omite la comparación")
+        return None
+    # Cada captura termina con el audio en vivo: la diferencia de llegada se suma al desfase
+    import comparacion
+    resultado = comparacion.comparar(pcm_a, pcm_b, CONFIG.PCM_SAMPLE_RATE, CONFIG.PCM_CANALES, SAMPLE_WIDTH,
+                                     correccion_seg=fin_b - fin_a)
+    latencia = time.monotonic() - inicio
+    if not resultado.comparable:
+        log(f"🔀 {par.nombre}: sin variación de audio suficiente para comparar")
+        return None
+
+    REGISTRO.fijar("comparacion_desfase_segundos", resultado.desfase_seg, {"par": par.id},
+                   ayuda="Retardo del stream de respaldo respecto del principal (positivo: atrasado)")
+    REGISTRO.fijar("comparacion_similitud", resultado.similitud, {"par": par.id},
+                   ayuda="Similitud de las envolventes de los dos streams del par (-1 a 1)")
+    descripcion = f"desfase {resultado.desfase_seg:+.2f}s, similitud {resultado.similitud:.2f}"
+    if resultado.similitud < CONFIG.COMPARACION_MIN_SIMILITUD:
+        msg = (f"El {respaldo.nombre} no transmite lo mismo que el {principal.nombre} "
+               f"o está desfasado más de {CONFIG.COMPARACION_SEG * comparacion.MIN_SUPERPOSICION:.0f}s ({descripcion}).")
+    elif abs(resultado.desfase_seg) > CONFIG.COMPARACION_MAX_DESFASE_SEG:
+        sentido = "atrasado" if resultado.desfase_seg > 0 else "adelantado"
+        msg = (f"El {respaldo.nombre} está {sentido} {abs(resultado.desfase_seg):.1f}s respecto del "
+               f"{principal.nombre} ({descripcion}).")
     else:
-        log(f"🎵 {stream_nombre} funcionando correctamente")
-        return True, None
+        log(f"🔀 {par.nombre}: {descripcion}")
+        registrar_chequeo(par, historial.OK, latencia=latencia, detalle=resultado.como_dict())
+        return par, True, None
+
+    log(f"🔀 {msg}")
+    registrar_chequeo(par, historial.DIVERGENCIA, latencia=latencia, detalle=resultado.como_dict())
+    return par, False, f"🔀 {par.nombre} divergentes: {msg}"
+
+def iniciar_comparaciones(pares, es_horario_nocturno=False, limite=None):
+    """
+    Lanza en segundo plano la comparación de cada par y retorna sus futuros
+    """
+    if not pares or es_horario_nocturno:
+        return []
+    executor = ThreadPoolExecutor(max_workers=len(pares))
+    futuros = [executor.submit(comparar_streams, principal, respaldo, False, limite)
+               for principal, respaldo in pares]
+    executor.shutdown(wait=False)
+    return futuros
+
+_maquina_alertas = None
+_agrupador = None
+# Verdadero en los modos daemon y continuo (un proceso que sigue chequeando)
+_modo_persistente = False
+_alertas_lock = threading.Lock()
+
+def umbral_caido(persistente=None):
+    """
+    Chequeos fallidos seguidos para alertar: UMBRAL_CAIDO o, sin definir, 2 en
+    los modos daemon y continuo y 1 por cron, donde el chequeo siguiente llega
+    recién en la próxima ejecución y esperarlo demoraría la alerta minutos
+    """
+    if CONFIG.UMBRAL_CAIDO is not None:
+        return CONFIG.UMBRAL_CAIDO
+    persistente = _modo_persistente if persistente is None else persistente
+    return 2 if persistente else 1
+
+def obtener_alertas():
+    """
+    Retorna (máquina de estados, agrupador de avisos), creados la primera vez
+    """
+    global _maquina_alertas, _agrupador
+    with _alertas_lock:
+        if _maquina_alertas is None:
+            _maquina_alertas = alertas.MaquinaAlertas(obtener_historial(), umbral_caido(),
+                                                      CONFIG.UMBRAL_RECUPERACION)
+            _agrupador = alertas.Agrupador(enviar_alerta, CONFIG.VENTANA_AGRUPACION)
+        return _maquina_alertas, _agrupador
+
+def procesar_resultados(resultados, repetidos=True):
+    """
+    Actualiza el estado de alertas de cada stream y encola un aviso sólo
+    cuando un stream pasa a caído o se recupera. Con repetidos=False no se
+    registra en el log cada chequeo de un stream ya alertado (modo continuo).
+    """
+    maquina, agrupador = obtener_alertas()
+    for stream, ok, error in resultados:
+        try:
+            anterior, actual = maquina.procesar(stream.id, ok, error)
+        except Exception as e:
+            # Sin estado no se puede deduplicar: mejor avisar de más que de menos
+            log(f"🚫 Error actualizando estado de alertas de {stream.nombre}: {e}")
+            if not ok:
+                agrupador.agregar_problema(error)
+            continue
+
+        if actual.estado == alertas.DEGRADADO and anterior.estado != alertas.DEGRADADO:
+            log(f"🟡 {stream.nombre} degradado: {actual.fallas}/{umbral_caido()} chequeos fallidos")
+        elif actual.estado == alertas.CAIDO and anterior.estado != alertas.CAIDO:
+            log(f"🚨 {stream.nombre} en falla tras {actual.fallas} chequeos fallidos")
+            agrupador.agregar_problema(*adjuntar_clip(stream, error))
+        elif actual.estado == alertas.CAIDO and not ok and repetidos:
+            desde = datetime.fromtimestamp(actual.desde).strftime('%H:%M') if actual.desde else "?"
+            log(f"🔕 {stream.nombre} sigue con problemas desde las {desde} (ya alertado)")
+        elif actual.estado == alertas.RECUPERADO:
+            linea = alertas.linea_recuperacion(stream.nombre, actual.desde)
+            log(linea)
+            agrupador.agregar_recuperacion(linea)
 
 def monitorear():
     log("⏱ Iniciando monitoreo...")
     limpiar_logs_viejos()
-    
-    # Verificar si estamos en horario nocturno (00:00 - 05:00)
-    hora_actual = datetime.now().hour
-    es_horario_nocturno = 0 <= hora_actual < 5
-    
-    # Lista para almacenar errores encontrados
-    errores = []
-    
-    # Monitorear Stream Principal
-    if not bajar_fragmento(STREAM_URL, TEMP_AUDIO_FILE):
-        msg = "No se pudo acceder al Stream Principal."
-        log(f"❌ {msg}")
-        errores.append(f"🛑 Stream Principal caído: {msg}")
-    elif es_horario_nocturno:
-        log("🌙 Horario nocturno (00:00-05:00): omitiendo detección de silencio en Stream Principal")
-        log("🎵 Stream Principal funcionando correctamente (modo nocturno)")
-    elif not analizar_audio(TEMP_AUDIO_FILE):
-        msg = "Silencio prolongado detectado en el Stream Principal."
-        log(f"🔇 {msg}")
-        errores.append(f"⚠️ Stream Principal con silencio: {msg}")
-    else:
-        log("🎵 Stream Principal funcionando correctamente")
-
-    # Monitorear Stream Secundario (si está configurado)
-    if STREAM2_URL:
-        if not bajar_fragmento(STREAM2_URL, TEMP_AUDIO_FILE2):
-            msg = "No se pudo acceder al Stream Secundario."
-            log(f"❌ {msg}")
-            errores.append(f"🛑 Stream Secundario caído: {msg}")
-        elif es_horario_nocturno:
-            log("🌙 Horario nocturno (00:00-05:00): omitiendo detección de silencio en Stream Secundario")
-            log("🎵 Stream Secundario funcionando correctamente (modo nocturno)")
-        elif not analizar_audio(TEMP_AUDIO_FILE2):
-            msg = "Silencio prolongado detectado en el Stream Secundario."
-            log(f"🔇 {msg}")
-            errores.append(f"⚠️ Stream Secundario con silencio: {msg}")
-        else:
-            log("🎵 Stream Secundario funcionando correctamente")
+    # Abrir el historial (e importar logs antiguos) antes de registrar chequeos nuevos
+    obtener_historial()
+    if CONFIG.METRICAS_ARCHIVO:
+        cargar_metricas()
 
-    # Enviar alertas si hay errores
-    if errores:
-        asunto = "🚨 ALERTA: Problemas detectados en streams"
-        cuerpo = "Se detectaron los siguientes problemas:\n\n" + "\n".join(errores)
-        enviar_alerta(asunto, cuerpo)
+    es_horario_nocturno = en_horario_nocturno()
+    inicio = time.monotonic()
+    streams = streams_configurados()
 
-    # Limpiar archivos temporales
-    for temp_file in [TEMP_AUDIO_FILE, TEMP_AUDIO_FILE2]:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+    # Sondear todos los streams en paralelo, mientras se comparan los pares
+    comparaciones = iniciar_comparaciones(pares_comparacion(streams), es_horario_nocturno,
+                                          inicio + CONFIG.PLAZO_CICLO_SEG)
+    resultados = sondear_streams(streams, es_horario_nocturno, CONFIG.PLAZO_CICLO_SEG)
+    if comparaciones:
+        wait(comparaciones, timeout=max(0, inicio + CONFIG.PLAZO_CICLO_SEG - time.monotonic()) + 5)
+        resultados += [futuro.result() for futuro in comparaciones
+                       if futuro.done() and not futuro.exception() and futuro.result()]
+    registrar_ciclo(time.monotonic() - inicio)
+
+    # Alertar sólo los cambios de estado, en un único mensaje por ciclo
+    procesar_resultados(resultados)
+    obtener_alertas()[1].vaciar()
 
     if es_hora_de_resumen():
         enviar_resumen_telegram()
 
+    if CONFIG.METRICAS_ARCHIVO:
+        # Incluir en el archivo el resultado de las notificaciones de este ciclo
+        if _despachador is not None:
+            _despachador.vaciar(CONFIG.NOTIF_ESPERA_CIERRE)
+        guardar_metricas()
+
+def registrar_ciclo(segundos):
+    REGISTRO.observar("ciclo_segundos", segundos, ayuda="Duración de un ciclo de chequeo de todos los streams")
+    REGISTRO.fijar("ultimo_ciclo_timestamp_segundos", time.time(),
+                   ayuda="Fecha (epoch) del último ciclo de chequeo completo")
+
+def cargar_metricas():
+    """
+    Recupera los contadores de ejecuciones anteriores (modo cron), guardados en el historial
+    """
+    try:
+        estado = obtener_historial().meta("metricas")
+        if estado:
+            REGISTRO.importar(json.loads(estado))
+    except Exception as e:
+        log(f"🚫 Error recuperando métricas anteriores: {e}")
+
+def guardar_metricas():
+    """
+    Escribe METRICAS_ARCHIVO y, en modo cron, conserva los contadores para la próxima ejecución
+    """
+    try:
+        obtener_historial().meta("metricas", json.dumps(REGISTRO.exportar()))
+        REGISTRO.escribir_archivo(CONFIG.METRICAS_ARCHIVO)
+    except Exception as e:
+        log(f"🚫 Error escribiendo métricas: {e}")
+
+def iniciar_metricas(planificador):
+    """
+    Modos daemon y continuo: expone /metrics y/o reescribe METRICAS_ARCHIVO cada minuto
+    """
+    if CONFIG.METRICAS_PUERTO:
+        try:
+            REGISTRO.servir(CONFIG.METRICAS_HOST, CONFIG.METRICAS_PUERTO)
+            log(f"📈 Métricas en http://{CONFIG.METRICAS_HOST}:{CONFIG.METRICAS_PUERTO}/metrics")
+        except OSError as e:
+            log(f"🚫 No se pudo abrir el puerto de métricas {CONFIG.METRICAS_PUERTO}: {e}")
+    if CONFIG.METRICAS_ARCHIVO:
+        programar_periodica(planificador, "archivo de métricas", 60, REGISTRO.escribir_archivo,
+                            CONFIG.METRICAS_ARCHIVO)
+
+_coordinador = None
+
+def tarea_unica(clave):
+    """
+    Con varios nodos, sólo el primero que reclama `clave` ejecuta la tarea
+    (resumen de un horario, retención del día); con uno solo, siempre
+    """
+    if _coordinador is None:
+        return True
+    try:
+        return _coordinador.reservar(clave, 86400)
+    except Exception as e:
+        log(f"🚫 Error reservando la tarea {clave}: {e}")
+        return True
+
+def duracion_reserva():
+    """
+    Cuánto dura la reserva de un stream: lo que puede tardar un chequeo o
+    una comparación, más la expiración de un nodo
+    """
+    return max(CONFIG.PLAZO_CHEQUEO_SEG, CONFIG.COMPARACION_SEG + 20) + CONFIG.NODO_EXPIRACION_SEG
+
+def iniciar_coordinacion(streams, claves):
+    """
+    Con NODO_ID, suma este daemon a los nodos que comparten el historial y
+    retorna el Coordinador (ver coordinacion.py); sin NODO_ID retorna None.
+    `claves` son las de todo lo que se reparte (streams y pares).
+    """
+    global _coordinador
+    if not CONFIG.NODO_ID:
+        return None
+    import coordinacion
+
+    def informar(anillo):
+        propias = sum(anillo.dueno(clave) == CONFIG.NODO_ID for clave in claves)
+        log(f"🧭 Nodos activos: {', '.join(anillo.nodos)}; {CONFIG.NODO_ID} chequea {propias} de {len(claves)}")
+
+    def al_cambiar(anterior, nuevo):
+        informar(nuevo)
+        for stream in streams:
+            if anterior.dueno(stream.id) != nuevo.dueno(stream.id):
+                olvidar_stream(stream.id)
+
+    _coordinador = coordinacion.Coordinador(obtener_historial(), CONFIG.NODO_ID, CONFIG.NODO_EXPIRACION_SEG)
+    informar(coordinacion.Anillo(_coordinador.latido()))
+    _coordinador.al_cambiar = al_cambiar
+    REGISTRO.agregar_colector(lambda: [
+        ("nodos_activos", "gauge", "Nodos activos que se reparten los streams",
+         [({}, len(_coordinador.nodos()))]),
+        ("streams_asignados", "gauge", "Streams y pares que le tocan a este nodo",
+         [({}, sum(map(_coordinador.es_mio, claves)))])])
+    return _coordinador
+
+def latido():
+    try:
+        _coordinador.latido()
+    except Exception as e:
+        # Sin latido los demás nodos toman estos streams al expirar: no hay duplicados
+        log(f"🚫 Error registrando el latido de {CONFIG.NODO_ID}: {e}")
+
+def chequear_reservado(clave, nombre, funcion, *args):
+    """
+    Con varios nodos: reserva el stream en el historial antes de chequearlo,
+    así lo chequea y alerta un solo nodo aunque durante un cambio en los
+    nodos activos dos lo crean propio
+    """
+    if not _coordinador.es_mio(clave):
+        return
+    if not _coordinador.reservar(clave, duracion_reserva()):
+        log(f"🧭 {nombre}: lo está chequeando otro nodo, se omite")
+        return
+    try:
+        funcion(*args)
+    finally:
+        _coordinador.liberar(clave)
+
+def chequear_stream(stream):
+    """
+    Chequeo individual de un stream en modo daemon (ya en un hilo de la cola)
+    """
+    ok, error = monitorear_stream(stream, en_horario_nocturno())
+    procesar_resultados([(stream, ok, error)])
+
+def chequear_par(principal, respaldo):
+    """
+    Comparación de un par de streams en modo daemon
+    """
+    resultado = comparar_streams(principal, respaldo, en_horario_nocturno())
+    if resultado:
+        procesar_resultados([resultado])
+
+def ejecutar_tarea(nombre, funcion, *args):
+    """
+    Ejecuta una tarea programada sin dejar que un error detenga el daemon
+    """
+    try:
+        funcion(*args)
+    except Exception as e:
+        log(f"🚫 Error en tarea {nombre}: {e}")
+
+def programar_periodica(planificador, nombre, intervalo, funcion, *args, inicio=None):
+    """
+    Programa una tarea que se repite cada `intervalo` segundos sin acumular
+    deriva, la primera vez en `inicio` (epoch) o de inmediato
+    """
+    def ejecutar(previsto):
+        ejecutar_tarea(nombre, funcion, *args)
+        siguiente = max(previsto + intervalo, time.time())
+        planificador.enterabs(siguiente, 1, ejecutar, (siguiente,))
+
+    primera = time.time() if inicio is None else inicio
+    planificador.enterabs(primera, 1, ejecutar, (primera,))
+
+def programar_horaria(planificador, nombre, proxima, funcion, *args):
+    """
+    Programa una tarea en horarios de reloj calculados por `proxima(ahora)`
+    """
+    def ejecutar():
+        ejecutar_tarea(nombre, funcion, *args)
+        planificador.enterabs(proxima().timestamp(), 0, ejecutar)
+
+    planificador.enterabs(proxima().timestamp(), 0, ejecutar)
+
+def monitorear_daemon():
+    """
+    Modo daemon: un solo proceso que chequea cada stream en su intervalo,
+    rota el log a medianoche y ejecuta limpieza y resúmenes como tareas programadas.
+    Cada stream arranca en una fase fija de su intervalo (ver cola.py), así
+    los chequeos se reparten en lugar de coincidir. Se ejecutan en una cola
+    de MAX_CONCURRENCIA hilos con el límite de conexiones por servidor; si
+    el chequeo anterior de un stream sigue pendiente o en curso, el nuevo se omite.
+    Con NODO_ID, chequea sólo los streams que le tocan entre los nodos activos
+    (ver coordinacion.py).
+    """
+    global _modo_persistente
+    _modo_persistente = True
+    log("🛰 Iniciando monitoreo en modo daemon...")
+    limpiar_logs_viejos()
+    # Abrir el historial (e importar logs antiguos) antes de registrar chequeos nuevos
+    obtener_historial()
+
+    streams = streams_configurados()
+    pares = pares_comparacion(streams)
+    coordinador = iniciar_coordinacion(
+        streams, [stream.id for stream in streams] + [f"{a.id}~{b.id}" for a, b in pares])
+    chequeos = crear_cola(max(1, min(CONFIG.MAX_CONCURRENCIA, len(streams))))
+    REGISTRO.agregar_colector(lambda: [(
+        "chequeos_en_cola", "gauge", "Chequeos esperando turno (límite por host o concurrencia)",
+        [({}, chequeos.en_cola())])])
+
+    def lanzar(clave, nombre, urls, prioridad, intervalo, funcion, *args):
+        if coordinador:
+            if not coordinador.es_mio(clave):
+                return
+            funcion, args = chequear_reservado, (clave, nombre, funcion) + args
+        # Vence cuando ya toca el siguiente: entre los que esperan pasan primero los más atrasados
+        if chequeos.agregar(clave, urls, prioridad, time.time() + intervalo,
+                            ejecutar_tarea, nombre, funcion, *args) is None:
+            log(f"⏳ {nombre}: chequeo anterior todavía pendiente o en curso, se omite")
+
+    def lanzar_chequeo(stream):
+        lanzar(stream.id, stream.nombre, [stream.url], stream.prioridad, stream.intervalo, chequear_stream, stream)
+
+    planificador = sched.scheduler(time.time, time.sleep)
+    iniciar_metricas(planificador)
+    for stream in streams:
+        inicio = cola.proximo_inicio(stream.id, stream.intervalo)
+        prioridad = f", prioridad {stream.prioridad}" if stream.prioridad != "normal" else ""
+        log(f"🗓 {stream.nombre}: chequeo cada {stream.intervalo}s desde las "
+            f"{datetime.fromtimestamp(inicio).strftime('%H:%M:%S')}{prioridad}")
+        programar_periodica(planificador, stream.nombre, stream.intervalo, lanzar_chequeo, stream, inicio=inicio)
+    for principal, respaldo in pares:
+        clave = f"{principal.id}~{respaldo.id}"
+        nombre = f"{principal.nombre} / {respaldo.nombre}"
+        intervalo = max(principal.intervalo, respaldo.intervalo)
+        inicio = cola.proximo_inicio(clave, intervalo)
+        log(f"🗓 {nombre}: comparación cada {intervalo}s desde las "
+            f"{datetime.fromtimestamp(inicio).strftime('%H:%M:%S')}")
+        programar_periodica(planificador, nombre, intervalo, lanzar, clave, nombre,
+                            [principal.url, respaldo.url], principal.prioridad, intervalo,
+                            chequear_par, principal, respaldo, inicio=inicio)
+    programar_horaria(planificador, "limpieza de logs", proxima_medianoche, limpiar_logs_viejos)
+    programar_horaria(planificador, "resumen", proximo_resumen, enviar_resumen_telegram)
+    programar_periodica(planificador, "métricas de notificaciones", CONFIG.NOTIF_METRICAS_INTERVALO,
+                        registrar_metricas_notificaciones)
+    if coordinador:
+        programar_periodica(planificador, "latido", CONFIG.LATIDO_SEG, latido,
+                            inicio=time.time() + CONFIG.LATIDO_SEG)
+
+    try:
+        planificador.run()
+    except KeyboardInterrupt:
+        log("🛑 Modo daemon detenido")
+    finally:
+        chequeos.cerrar(cancelar=True)
+        if coordinador:
+            coordinador.salir()
+        obtener_alertas()[1].vaciar()
+
+def evento_continuo(monitor, anterior, nuevo, detalle):
+    """
+    Registra en el log los cambios de estado de un stream en modo continuo;
+    las alertas salen de evaluar_continuo
+    """
+    import continuo
+    nombre = monitor.stream.nombre
+    if nuevo == continuo.CAIDO:
+        log(f"❌ No se pudo acceder al {nombre}. ({detalle})")
+    elif nuevo == continuo.SILENCIO:
+        if en_horario_nocturno():
+            log(f"🌙 Horario nocturno ({horario_nocturno()}): omitiendo detección de silencio en {nombre}")
+            return
+        log(f"🔇 Silencio prolongado detectado en el {nombre}.")
+    elif nuevo == continuo.OK:
+        log(f"🎵 {nombre} funcionando correctamente")
+
+def evaluar_continuo(monitores):
+    """
+    Pasa el peor estado de cada stream en el último período por la máquina
+    de alertas, como un chequeo: con los mismos UMBRAL_CAIDO y
+    UMBRAL_RECUPERACION que los otros modos, un stream que oscila cerca del
+    umbral manda un aviso por episodio y no uno por oscilación
+    """
+    import continuo
+    nocturno = en_horario_nocturno()
+    resultados = []
+    for monitor in monitores:
+        nombre = monitor.stream.nombre
+        estado = monitor.estado_periodo()
+        if estado == continuo.CAIDO:
+            resultados.append((monitor.stream, False, f"🛑 {nombre} caído: No se pudo acceder al {nombre}."))
+        elif estado == continuo.SILENCIO and not nocturno:
+            resultados.append((monitor.stream, False,
+                               f"⚠️ {nombre} con silencio: Silencio prolongado detectado en el {nombre}."))
+        elif estado != continuo.CONECTANDO:
+            resultados.append((monitor.stream, True, None))
+    procesar_resultados(resultados, repetidos=False)
+
+def registrar_estado_continuo(monitores):
+    """
+    Deja en el log el estado de cada stream, para que el resumen cuente
+    los chequeos del modo continuo igual que los del modo por intervalos
+    """
+    import continuo
+    nocturno = en_horario_nocturno()
+    for monitor in monitores:
+        nombre = monitor.stream.nombre
+        if monitor.estado == continuo.OK or (monitor.estado == continuo.SILENCIO and nocturno):
+            log(f"🎵 {nombre} funcionando correctamente" + (" (modo nocturno)" if nocturno else ""))
+            registrar_chequeo(monitor.stream, historial.OK_NOCTURNO if nocturno else historial.OK)
+        elif monitor.estado == continuo.SILENCIO:
+            log(f"🔇 Silencio prolongado detectado en el {nombre}.")
+            registrar_chequeo(monitor.stream, historial.SILENCIO)
+        elif monitor.estado == continuo.CAIDO:
+            log(f"❌ No se pudo acceder al {nombre}.")
+            registrar_chequeo(monitor.stream, historial.CAIDO)
+
+def monitorear_continuo():
+    """
+    Modo continuo: una conexión permanente por stream con detección de
+    silencio sobre una ventana deslizante de VENTANA_CONTINUA_SEG segundos.
+    """
+    global _modo_persistente
+    import continuo
+    _modo_persistente = True
+    log("📶 Iniciando monitoreo continuo...")
+    limpiar_logs_viejos()
+    # Abrir el historial (e importar logs antiguos) antes de registrar chequeos nuevos
+    obtener_historial()
+
+    def hay_audio(muestras):
+        return analizar_pcm(muestras).hay_audio
+
+    monitores = [continuo.MonitorContinuo(stream, hay_audio, evento_continuo,
+                                          ventana_seg=CONFIG.VENTANA_CONTINUA_SEG,
+                                          sample_rate=CONFIG.PCM_SAMPLE_RATE, canales=CONFIG.PCM_CANALES,
+                                          al_recibir=conservar_audio(stream))
+                 for stream in streams_configurados()]
+    for monitor in monitores:
+        monitor.iniciar()
+
+    def supervisar():
+        for monitor in monitores:
+            if monitor.verificar_inactividad(CONFIG.TIMEOUT_LECTURA_SEG):
+                log(f"⌛ {monitor.stream.nombre}: sin datos hace más de {CONFIG.TIMEOUT_LECTURA_SEG:.0f}s")
+
+    planificador = sched.scheduler(time.time, time.sleep)
+    iniciar_metricas(planificador)
+    programar_periodica(planificador, "supervisión", 1, supervisar)
+    programar_periodica(planificador, "alertas", CONFIG.VENTANA_CONTINUA_SEG, evaluar_continuo, monitores,
+                        inicio=time.time() + CONFIG.VENTANA_CONTINUA_SEG)
+    programar_periodica(planificador, "registro de estado", CONFIG.INTERVALO_CHEQUEO,
+                        registrar_estado_continuo, monitores)
+    programar_horaria(planificador, "limpieza de logs", proxima_medianoche, limpiar_logs_viejos)
+    programar_horaria(planificador, "resumen", proximo_resumen, enviar_resumen_telegram)
+    programar_periodica(planificador, "métricas de notificaciones", CONFIG.NOTIF_METRICAS_INTERVALO,
+                        registrar_metricas_notificaciones)
+
+    try:
+        planificador.run()
+    except KeyboardInterrupt:
+        log("🛑 Monitoreo continuo detenido")
+    finally:
+        for monitor in monitores:
+            monitor.detener()
+        obtener_alertas()[1].vaciar()
+
+def reporte_disponibilidad():
+    """
+    Imprime disponibilidad y porcentaje de silencio por stream en 1h, 24h, 7d y 30d
+    """
+    ventanas = (("1h", 3600), ("24h", 86400), ("7d", 7 * 86400), ("30d", 30 * 86400))
+    ahora = time.time()
+    hist = obtener_historial()
+
+    print(f"{'Stream':<30}" + "".join(f"{nombre:>22}" for nombre, _ in ventanas))
+    for stream in streams_configurados():
+        fila = f"{stream.nombre[:29]:<30}"
+        for _, segundos in ventanas:
+            datos = hist.estadisticas(stream.id, ahora - segundos, ahora)
+            if datos["chequeos"]:
+                celda = f"{datos['disponibilidad']:.2f}% ({datos['porcentaje_silencio']:.1f}% sil.)"
+            else:
+                celda = "sin datos"
+            fila += f"{celda:>22}"
+        print(fila)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radio Watchdog - Monitoreo de streams")
+    parser.add_argument("--daemon", action="store_true",
+                        help="ejecutar como proceso permanente con chequeos periódicos")
+    parser.add_argument("--continuo", action="store_true",
+                        help="mantener una conexión permanente por stream y detectar silencios al instante")
+    parser.add_argument("--reporte", action="store_true",
+                        help="mostrar la disponibilidad de cada stream en 1h/24h/7d/30d")
+    parser.add_argument("--nodo",
+                        help="nombre de este nodo al repartir los streams entre varios daemons (en lugar de NODO_ID)")
+    args = parser.parse_args(argv)
+
+    try:
+        CONFIG.cargar()
+    except ErrorConfiguracion as e:
+        log(f"🚫 Configuración inválida: {e}")
+        return 2
+    if args.nodo:
+        CONFIG.NODO_ID = args.nodo
+
+    if args.reporte:
+        reporte_disponibilidad()
+    elif args.continuo:
+        monitorear_continuo()
+    elif args.daemon:
+        monitorear_daemon()
+    else:
+        monitorear()
+
 if __name__ == "__main__":
-    monitorear()
+    raise SystemExit(main())
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Despacho de notificaciones
+Las alertas se encolan y se envían en segundo plano, un hilo por canal,
+reutilizando la conexión SMTP y la sesión HTTP de Telegram, con timeouts
+y reintentos con espera exponencial. Un canal lento o caído no frena
+el monitoreo ni a los demás canales.
+"""
+
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.header import Header
+from email.mime.audio import MIMEAudio
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import requests
+
+
+class ErrorEnvio(Exception):
+    pass
+
+
+class CanalEmail:
+    nombre = "email"
+
+    def __init__(self, servidor, puerto, usuario, clave, remitente, destinatario,
+                 timeout=20, inactividad_max=60, adjuntos_max=5):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.usuario = usuario
+        self.clave = clave
+        self.remitente = remitente
+        self.destinatario = destinatario
+        self.timeout = timeout
+        self.inactividad_max = inactividad_max
+        self.adjuntos_max = adjuntos_max
+        self._smtp = None
+        self._ultimo_uso = 0
+
+    def _conectar(self):
+        self._smtp = smtplib.SMTP_SSL(self.servidor, self.puerto, timeout=self.timeout)
+        self._smtp.login(self.usuario, self.clave)
+
+    def enviar(self, asunto, cuerpo, adjuntos=()):
+        mensaje = MIMEMultipart()
+        mensaje["From"] = self.remitente
+        mensaje["To"] = self.destinatario
+        mensaje["Subject"] = Header(asunto, "utf-8").encode()
+        mensaje.attach(MIMEText(cuerpo, "plain", "utf-8"))
+        # Clips de audio (WAV); el cuerpo ya indica dónde quedaron guardados
+        for ruta in [ruta for ruta in adjuntos if os.path.exists(ruta)][:self.adjuntos_max]:
+            with open(ruta, "rb") as archivo:
+                adjunto = MIMEAudio(archivo.read(), "wav")
+            adjunto.add_header("Content-Disposition", "attachment", filename=os.path.basename(ruta))
+            mensaje.attach(adjunto)
+
+        # Si la conexión reutilizada se cortó, se reconecta una vez
+        for intento in (1, 2):
+            if self._smtp is None:
+                self._conectar()
+            try:
+                self._smtp.send_message(mensaje)
+                self._ultimo_uso = time.monotonic()
+                return f"📧 Alerta enviada: {asunto}"
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self.cerrar()
+                if intento == 2:
+                    raise
+
+    def liberar_inactivo(self):
+        """
+        Cierra la conexión si no se usó en los últimos `inactividad_max` segundos
+        """
+        if self._smtp is not None and time.monotonic() - self._ultimo_uso > self.inactividad_max:
+            self.cerrar()
+
+    def cerrar(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+class CanalTelegram:
+    nombre = "telegram"
+
+    def __init__(self, token, chat_id, timeout=10):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.timeout = timeout
+        self.sesion = requests.Session()
+
+    def enviar(self, asunto, cuerpo, adjuntos=()):
+        texto = f"{asunto}\n{cuerpo}" if asunto else cuerpo
+        r = self.sesion.post(self.url, data={"chat_id": self.chat_id, "text": texto}, timeout=self.timeout)
+        if r.status_code != 200:
+            raise ErrorEnvio(r.text)
+        return "📲 Alerta enviada a Telegram"
+
+    def liberar_inactivo(self):
+        pass
+
+    def cerrar(self):
+        self.sesion.close()
+
+
+class Despachador:
+    """
+    Cola acotada y un hilo de envío por canal.
+    `log(mensaje)` se usa para registrar entregas y errores, y
+    `on_entrega(canal, resultado, latencia)` (opcional) se llama con cada
+    mensaje enviado, fallido o descartado. `reintentos` es la cantidad de
+    intentos por mensaje (al menos uno).
+    """
+
+    def __init__(self, canales, log, capacidad=100, reintentos=4, espera_inicial=2, espera_max=60,
+                 on_entrega=None):
+        self.log = log
+        self.on_entrega = on_entrega or (lambda canal, resultado, latencia: None)
+        self.reintentos = max(1, reintentos)
+        self.espera_inicial = espera_inicial
+        self.espera_max = espera_max
+        self.detenido = threading.Event()
+        self.canales = {canal.nombre: canal for canal in canales}
+        self.colas = {nombre: queue.Queue(maxsize=capacidad) for nombre in self.canales}
+        self.estadisticas = {nombre: {"enviados": 0, "fallidos": 0, "descartados": 0,
+                                      "latencia_ultima": None, "latencia_total": 0.0}
+                             for nombre in self.canales}
+        self.lock = threading.Lock()
+        self.hilos = [threading.Thread(target=self._trabajar, args=(nombre,),
+                                       name=f"notificaciones-{nombre}", daemon=True)
+                      for nombre in self.canales]
+        for hilo in self.hilos:
+            hilo.start()
+
+    def encolar(self, canal, asunto, cuerpo, adjuntos=()):
+        """
+        Agrega un mensaje a la cola del canal sin bloquear, con las rutas de
+        `adjuntos` (sólo el email los adjunta).
+        Retorna False si el canal no está configurado o la cola está llena.
+        """
+        if canal not in self.colas:
+            return False
+        try:
+            self.colas[canal].put_nowait((asunto, cuerpo, tuple(adjuntos), time.monotonic()))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.estadisticas[canal]["descartados"] += 1
+            self.log(f"🚫 Cola de {canal} llena: notificación descartada")
+            self.on_entrega(canal, "descartada", None)
+            return False
+
+    def metricas(self):
+        """
+        Profundidad de cola y latencias de entrega (desde que se encoló) por canal
+        """
+        with self.lock:
+            metricas = {}
+            for nombre, datos in self.estadisticas.items():
+                entregados = datos["enviados"]
+                metricas[nombre] = dict(datos, profundidad=self.colas[nombre].qsize(),
+                                        latencia_media=datos["latencia_total"] / entregados if entregados else None)
+            return metricas
+
+    def vaciar(self, timeout=60):
+        """
+        Espera a que se entreguen (o descarten) los mensajes pendientes.
+        Retorna True si las colas quedaron vacías antes del timeout.
+        """
+        limite = time.monotonic() + timeout
+        for cola in self.colas.values():
+            with cola.all_tasks_done:
+                while cola.unfinished_tasks:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        return False
+                    cola.all_tasks_done.wait(restante)
+        return True
+
+    def detener(self, timeout=60):
+        vacias = self.vaciar(timeout)
+        self.detenido.set()
+        for canal in self.canales.values():
+            canal.cerrar()
+        return vacias
+
+    def _trabajar(self, nombre):
+        canal = self.canales[nombre]
+        cola = self.colas[nombre]
+        while not self.detenido.is_set():
+            try:
+                asunto, cuerpo, adjuntos, encolado = cola.get(timeout=5)
+            except queue.Empty:
+                canal.liberar_inactivo()
+                continue
+            try:
+                self._entregar(canal, asunto, cuerpo, adjuntos, encolado)
+            finally:
+                cola.task_done()
+
+    def _entregar(self, canal, asunto, cuerpo, adjuntos, encolado):
+        for intento in range(self.reintentos):
+            try:
+                mensaje = canal.enviar(asunto, cuerpo, adjuntos)
+            except Exception as e:
+                if intento == self.reintentos - 1:
+                    self._fallida(canal, encolado, f"🚫 Error al enviar {canal.nombre} (sin más reintentos): {e}")
+                    return
+                espera = min(self.espera_inicial * 2 ** intento, self.espera_max)
+                self.log(f"🔁 Error al enviar {canal.nombre}: {e}. Reintento en {espera}s")
+                if self.detenido.wait(espera):
+                    self._fallida(canal, encolado, f"🚫 Notificación de {canal.nombre} sin entregar: "
+                                                   f"envío detenido antes del reintento ({e})")
+                    return
+                continue
+
+            latencia = time.monotonic() - encolado
+            with self.lock:
+                datos = self.estadisticas[canal.nombre]
+                datos["enviados"] += 1
+                datos["latencia_ultima"] = latencia
+                datos["latencia_total"] += latencia
+            self.log(f"{mensaje} ({latencia:.1f}s)")
+            self.on_entrega(canal.nombre, "enviada", latencia)
+            return
+
+    def _fallida(self, canal, encolado, mensaje):
+        with self.lock:
+            self.estadisticas[canal.nombre]["fallidos"] += 1
+        self.log(mensaje)
+        self.on_entrega(canal.nombre, "fallida", time.monotonic() - encolado)
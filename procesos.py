@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Análisis en procesos
+Los hilos de descarga (MAX_CONCURRENCIA) quedan para la red y el análisis
+de silencio, que depende de la CPU y del GIL, pasa a un pool acotado de
+procesos (PROCESOS_ANALISIS). El PCM no se serializa: se copia una vez a
+memoria compartida y el proceso de análisis lo lee en su lugar.
+Si todos los procesos están ocupados y la cola de espera está llena, el
+hilo de descarga que quiere analizar se bloquea hasta que se libere un
+lugar (contrapresión).
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import analisis
+
+
+def _adjuntar(nombre, largo, sample_width):
+    memoria = SharedMemory(nombre)
+    return memoria, np.ndarray(largo, dtype=analisis.TIPOS_PCM[sample_width], buffer=memoria.buf)
+
+
+def _analizar(nombre, largo, sample_rate, canales, sample_width, opciones):
+    """
+    En el proceso de análisis: analisis.analizar sobre el buffer compartido
+    """
+    memoria, muestras = _adjuntar(nombre, largo, sample_width)
+    try:
+        return analisis.analizar(muestras, sample_rate, canales, sample_width, **opciones)
+    finally:
+        del muestras  # sin vistas vivas el mapeo se puede cerrar
+        memoria.close()
+
+
+def _incremental(nombre, largo, recibidas, argumentos, final):
+    """
+    En el proceso de análisis: veredicto (o resultado, si `final`) de un
+    AnalizadorIncremental cuyo buffer está en memoria compartida
+    """
+    duracion_seg, sample_rate, canales, sample_width, opciones = argumentos
+    memoria, muestras = _adjuntar(nombre, largo, sample_width)
+    try:
+        analizador = analisis.AnalizadorIncremental(duracion_seg, sample_rate, canales, sample_width,
+                                                    muestras=muestras, **opciones)
+        analizador.recibidas = recibidas
+        return analizador.resultado() if final else analizador.veredicto()
+    finally:
+        analizador = muestras = None
+        memoria.close()
+
+
+class PoolAnalisis:
+    """
+    `procesos` procesos de análisis y hasta `cola` pedidos esperando turno
+    """
+
+    def __init__(self, procesos, cola=None):
+        # forkserver evita hacer fork de un proceso con muchos hilos
+        metodos = multiprocessing.get_all_start_methods()
+        contexto = multiprocessing.get_context("forkserver") if "forkserver" in metodos else None
+        self.procesos = procesos
+        self.cola = cola if cola is not None else procesos
+        self.executor = ProcessPoolExecutor(max_workers=procesos, mp_context=contexto)
+        self.cupos = threading.BoundedSemaphore(procesos + self.cola)
+        self.pendientes = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _cupo(self):
+        self.cupos.acquire()
+        with self.lock:
+            self.pendientes += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pendientes -= 1
+            self.cupos.release()
+
+    def en_cola(self):
+        """
+        Pedidos esperando un proceso libre (sin contar los que se están analizando)
+        """
+        with self.lock:
+            return max(0, self.pendientes - self.procesos)
+
+    def ejecutar(self, funcion, *args):
+        with self._cupo():
+            return self.executor.submit(funcion, *args).result()
+
+    def analizar(self, pcm, sample_rate, canales=1, sample_width=2, **opciones):
+        """
+        Como analisis.analizar, pero en un proceso del pool
+        """
+        origen = analisis.muestras_pcm(pcm, sample_width)
+        if not len(origen):
+            return analisis.analizar(origen, sample_rate, canales, sample_width, **opciones)
+        memoria = SharedMemory(create=True, size=origen.nbytes)
+        try:
+            destino = np.ndarray(len(origen), dtype=origen.dtype, buffer=memoria.buf)
+            destino[:] = origen
+            del destino
+            return self.ejecutar(_analizar, memoria.name, len(origen), sample_rate, canales, sample_width, opciones)
+        finally:
+            memoria.close()
+            memoria.unlink()
+
+    def incremental(self, duracion_seg, sample_rate, canales=1, sample_width=2, **opciones):
+        return AnalizadorCompartido(self, duracion_seg, sample_rate, canales, sample_width, **opciones)
+
+    def cerrar(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class AnalizadorCompartido(analisis.AnalizadorIncremental):
+    """
+    AnalizadorIncremental con el buffer en memoria compartida: agregar()
+    copia en el hilo de descarga y veredicto()/resultado() corren en el pool.
+    Hay que llamar a cerrar() al terminar.
+    """
+
+    def __init__(self, pool, duracion_seg, sample_rate, canales=1, sample_width=2, **opciones):
+        largo = int(duracion_seg * sample_rate) * canales
+        self.pool = pool
+        self.memoria = SharedMemory(create=True, size=max(1, largo * sample_width))
+        super().__init__(duracion_seg, sample_rate, canales, sample_width,
+                         muestras=np.ndarray(largo, dtype=analisis.TIPOS_PCM[sample_width], buffer=self.memoria.buf),
+                         **opciones)
+        self.argumentos = (duracion_seg, sample_rate, canales, sample_width, opciones)
+
+    def _en_pool(self, final):
+        return self.pool.ejecutar(_incremental, self.memoria.name, len(self.muestras), self.recibidas,
+                                  self.argumentos, final)
+
+    def veredicto(self):
+        return self._en_pool(final=False)
+
+    def resultado(self):
+        return self._en_pool(final=True)
+
+    def cerrar(self):
+        if self.memoria is not None:
+            self.muestras = None
+            self.memoria.close()
+            self.memoria.unlink()
+            self.memoria = None
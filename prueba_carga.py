@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Prueba de carga
+Levanta el simulador de streams en otro proceso, corre ciclos de chequeo
+del monitor contra todas sus estaciones y reporta duración de cada ciclo,
+CPU, memoria y latencia de detección por tipo de falla.
+No envía notificaciones: sólo se llama a monitorear_stream().
+
+Uso:
+    python prueba_carga.py --estaciones 500 --ciclos 6 --codec mp3
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import monitoreo
+from streams import Stream
+
+
+def esperar_simulador(direccion, timeout=120):
+    """
+    Espera a que el simulador responda y retorna su listado de estaciones
+    """
+    limite = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{direccion}/streams.json", timeout=5) as respuesta:
+                return json.load(respuesta)
+        except OSError:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.5)
+
+
+def uso_recursos():
+    """
+    CPU acumulada (segundos) del monitor y de sus procesos FFmpeg, y pico de memoria (MB)
+    """
+    if resource is None:
+        return {"cpu": time.process_time(), "cpu_ffmpeg": None, "rss_mb": None, "rss_ffmpeg_mb": None}
+    propio = resource.getrusage(resource.RUSAGE_SELF)
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    escala = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return {
+        "cpu": propio.ru_utime + propio.ru_stime,
+        "cpu_ffmpeg": hijos.ru_utime + hijos.ru_stime,
+        "rss_mb": propio.ru_maxrss / escala,
+        "rss_ffmpeg_mb": hijos.ru_maxrss / escala,
+    }
+
+
+class Carga:
+    """
+    Corre los chequeos con MAX_CONCURRENCIA hilos, como el modo cron. Si el
+    chequeo anterior de una estación sigue colgado, en el ciclo siguiente se omite.
+    """
+
+    def __init__(self, streams, concurrencia):
+        self.streams = streams
+        self.executor = ThreadPoolExecutor(max_workers=concurrencia)
+        self.resultados = []          # (stream_id, ok, inicio, fin)
+        self.en_curso = set()
+        self.lock = threading.Lock()
+
+    def _chequear(self, stream):
+        inicio = time.time()
+        try:
+            ok, _ = monitoreo.monitorear_stream(stream)
+        except Exception:
+            ok = False
+        finally:
+            with self.lock:
+                self.en_curso.discard(stream.id)
+        with self.lock:
+            self.resultados.append((stream.id, ok, inicio, time.time()))
+
+    def ciclo(self, plazo):
+        """
+        Lanza un chequeo por estación y espera hasta `plazo` segundos.
+        Retorna (duración, omitidas, pendientes al vencer el plazo).
+        """
+        inicio = time.monotonic()
+        futuros = []
+        omitidas = 0
+        for stream in self.streams:
+            with self.lock:
+                if stream.id in self.en_curso:
+                    omitidas += 1
+                    continue
+                self.en_curso.add(stream.id)
+            futuros.append(self.executor.submit(self._chequear, stream))
+        _, pendientes = wait(futuros, timeout=plazo)
+        return time.monotonic() - inicio, omitidas, len(pendientes)
+
+    def detener(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def latencias_por_falla(listado, resultados):
+    """
+    Para cada tipo de falla: estaciones, detectadas y segundos desde el comienzo
+    de la falla hasta el primer chequeo fallido. Las estaciones sanas (y las
+    fallas antes de empezar) cuentan como falsos positivos.
+    """
+    por_estacion = {}
+    for stream_id, ok, inicio, fin in resultados:
+        por_estacion.setdefault(stream_id, []).append((ok, inicio, fin))
+
+    tabla = {}
+    for estacion in listado:
+        fallas = estacion.get("fallas")
+        tipo = fallas[0]["tipo"] if fallas else "sana"
+        comienzo = fallas[0]["inicio"] if fallas else float("inf")
+        fila = tabla.setdefault(tipo, {"estaciones": 0, "detectadas": 0, "falsos_positivos": 0,
+                                       "sin_resultado": 0, "latencias": []})
+        fila["estaciones"] += 1
+        chequeos = por_estacion.get(estacion["id"], [])
+        if fallas and not any(fin >= comienzo for _, _, fin in chequeos):
+            fila["sin_resultado"] += 1
+        fila["falsos_positivos"] += sum(1 for ok, _, fin in chequeos if not ok and fin < comienzo)
+        detecciones = [fin for ok, _, fin in chequeos if not ok and fin >= comienzo]
+        if detecciones:
+            fila["detectadas"] += 1
+            fila["latencias"].append(min(detecciones) - comienzo)
+
+    for fila in tabla.values():
+        latencias = fila.pop("latencias")
+        fila["latencia_media"] = statistics.mean(latencias) if latencias else None
+        fila["latencia_max"] = max(latencias) if latencias else None
+    return tabla
+
+
+def _segundos(valor):
+    return f"{valor:.1f}s" if valor is not None else "-"
+
+
+def _mb(valor):
+    return f"{valor:.0f}" if valor is not None else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radio Watchdog - Prueba de carga contra el simulador local")
+    parser.add_argument("--estaciones", type=int, default=500)
+    parser.add_argument("--ciclos", type=int, default=5)
+    parser.add_argument("--codec", default="mp3")
+    parser.add_argument("--puerto", type=int, default=8800)
+    parser.add_argument("--inicio-fallas", type=float, default=30,
+                        help="segundos desde el arranque hasta que comienzan las fallas (por defecto 30)")
+    parser.add_argument("--proporcion", type=float, default=0.5,
+                        help="fracción de estaciones con falla (por defecto 0.5)")
+    parser.add_argument("--concurrencia", type=int, default=monitoreo.MAX_CONCURRENCIA)
+    parser.add_argument("--plazo-ciclo", type=float, default=600,
+                        help="segundos máximos de espera por ciclo (por defecto 600)")
+    parser.add_argument("--salida", help="guardar los resultados en este archivo JSON")
+    parser.add_argument("--verbose", action="store_true", help="mostrar el log del monitor")
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix="radiowatchdog_carga_")
+    # Historial y logs de la prueba aparte de los reales
+    monitoreo.CONFIG.HISTORIAL_DB = os.path.join(directorio, "historial.db")
+    monitoreo.LOG_DIR = os.path.join(directorio, "logs")
+
+    direccion = f"http://127.0.0.1:{args.puerto}"
+    simulador = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "simulador.py"),
+         "--estaciones", str(args.estaciones), "--codec", args.codec, "--puerto", str(args.puerto),
+         "--fallas-mixtas", str(args.inicio_fallas), "--proporcion", str(args.proporcion)],
+        stdout=subprocess.DEVNULL, stdin=subprocess.DEVNULL)
+    carga = None
+    nulo = open(os.devnull, "w")
+    try:
+        listado = esperar_simulador(direccion)
+        streams = [Stream(e["id"], e["nombre"], e["url"], monitoreo.INTERVALO_CHEQUEO) for e in listado]
+        print(f"📡 Simulador listo: {len(streams)} estaciones, fallas desde el segundo {args.inicio_fallas:.0f}")
+
+        carga = Carga(streams, args.concurrencia)
+        salida_monitor = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(nulo)
+        ciclos = []
+        print(f"\n{'Ciclo':>5}{'duración':>11}{'omitidas':>10}{'pendientes':>12}{'CPU':>9}{'CPU ffmpeg':>12}{'RSS MB':>8}")
+        for numero in range(1, args.ciclos + 1):
+            antes = uso_recursos()
+            with salida_monitor:
+                duracion, omitidas, pendientes = carga.ciclo(args.plazo_ciclo)
+            despues = uso_recursos()
+            ciclo = {
+                "duracion": duracion,
+                "omitidas": omitidas,
+                "pendientes": pendientes,
+                "cpu": despues["cpu"] - antes["cpu"],
+                "cpu_ffmpeg": (despues["cpu_ffmpeg"] - antes["cpu_ffmpeg"]) if resource else None,
+                "rss_mb": despues["rss_mb"],
+                "rss_ffmpeg_mb": despues["rss_ffmpeg_mb"],
+            }
+            ciclos.append(ciclo)
+            print(f"{numero:>5}{_segundos(ciclo['duracion']):>11}{omitidas:>10}{pendientes:>12}"
+                  f"{_segundos(ciclo['cpu']):>9}{_segundos(ciclo['cpu_ffmpeg']):>12}{_mb(ciclo['rss_mb']):>8}")
+
+        with carga.lock:
+            tabla = latencias_por_falla(listado, list(carga.resultados))
+        print(f"\n{'Falla':<10}{'estaciones':>11}{'detectadas':>12}{'lat. media':>12}{'lat. máx':>10}"
+              f"{'sin resultado':>15}{'falsos +':>10}")
+        for tipo, fila in sorted(tabla.items()):
+            print(f"{tipo:<10}{fila['estaciones']:>11}{fila['detectadas']:>12}{_segundos(fila['latencia_media']):>12}"
+                  f"{_segundos(fila['latencia_max']):>10}{fila['sin_resultado']:>15}{fila['falsos_positivos']:>10}")
+
+        if args.salida:
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump({"estaciones": args.estaciones, "codec": args.codec, "concurrencia": args.concurrencia,
+                           "ciclos": ciclos, "fallas": tabla}, f, indent=2, ensure_ascii=False)
+            print(f"\n💾 Resultados guardados en {args.salida}")
+    finally:
+        # Al cerrar el simulador se cortan las conexiones colgadas y terminan sus FFmpeg
+        simulador.terminate()
+        simulador.wait()
+        if carga is not None:
+            carga.detener()
+        nulo.close()
+
+
+if __name__ == "__main__":
+    main()
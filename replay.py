@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Replay de grabaciones
+Pasa grabaciones archivadas de los streams por el mismo análisis de silencio
+y la misma máquina de alertas que el monitoreo, a muchas veces tiempo real,
+para elegir THRESHOLD_DBFS, SILENCIO_MIN_MS, PORCENTAJE_AUDIBLE_MIN y el
+horario nocturno comparando contra las fallas conocidas de cada grabación.
+- Cada grabación se decodifica una sola vez con FFmpeg y el PCM queda en una
+  caché en disco; los barridos siguientes lo leen mapeado en memoria.
+- Se simula un chequeo cada INTERVALO_CHEQUEO segundos sobre un fragmento de
+  DURACION_FRAGMENTO segundos. La energía de cada fragmento se acumula una
+  sola vez para todas las combinaciones (analisis.porcentajes_audibles).
+- Los fragmentos se reparten entre procesos de a tramos de TRAMO chequeos.
+No usa la red ni envía notificaciones.
+
+Etiquetas (JSON, por defecto etiquetas.json en la carpeta de las grabaciones):
+    [{"archivo": "radio_2025-07-14.mp3", "inicio": "2025-07-14 00:00:00",
+      "fallas": [["01:10:00", "01:25:30"], [7200, 7260]]}]
+Las fallas son tramos [desde, hasta] contados desde el comienzo de la
+grabación, en segundos o HH:MM:SS. Sin "inicio" no se aplica el horario
+nocturno; las grabaciones sin etiquetas se toman como sin fallas.
+
+Uso:
+    python replay.py grabaciones/                                 # barrido por defecto
+    python replay.py grabaciones/ --umbrales -50,-45,-40 --porcentajes 5,10,20
+    python replay.py grabaciones/ --noches 00-05,01-05,00-00 --salida replay.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from itertools import product
+
+import numpy as np
+
+import alertas
+import analisis
+import monitoreo
+from captura import SAMPLE_WIDTH, comando_pcm
+from config import CONFIG
+
+EXTENSIONES = (".mp3", ".aac", ".m4a", ".ogg", ".opus", ".flac", ".wav", ".ts", ".mka", ".webm")
+
+# Chequeos por tarea: TRAMO fragmentos de 10 s a 8 kHz son ~10 MB de PCM
+TRAMO = 64
+
+# Valores barridos por defecto; la configuración actual se agrega siempre
+UMBRALES = "-50,-45,-40,-35,-30"
+VENTANAS_MS = "500,1000,2000,3000"
+PORCENTAJES = "5,10,20,30"
+NOCHES = "00-05,01-05,00-00"
+
+# Título de la tabla de cada parámetro barrido, en el orden de las combinaciones
+PARAMETROS = ("THRESHOLD_DBFS", "SILENCIO_MIN_MS", "PORCENTAJE_AUDIBLE_MIN", "Horario nocturno")
+
+CONTADORES = ("chequeos_ok", "chequeos_falla", "falsos_positivos", "falsos_negativos",
+              "alertas", "alertas_falsas", "fallas", "fallas_detectadas", "demora_total")
+
+
+def a_segundos(valor):
+    """
+    Segundos desde el comienzo de la grabación: número o texto HH:MM:SS (o MM:SS)
+    """
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    segundos = 0.0
+    for parte in str(valor).split(":"):
+        segundos = segundos * 60 + float(parte)
+    return segundos
+
+
+def leer_etiquetas(ruta):
+    """
+    {archivo: (inicio datetime o None, [(desde, hasta), ...])} del archivo de etiquetas
+    """
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        entradas = json.load(f)
+    etiquetas = {}
+    for entrada in entradas:
+        inicio = datetime.fromisoformat(entrada["inicio"]) if entrada.get("inicio") else None
+        fallas = sorted((a_segundos(desde), a_segundos(hasta)) for desde, hasta in entrada.get("fallas", ()))
+        etiquetas[entrada["archivo"]] = (inicio, fallas)
+    return etiquetas
+
+
+def leer_noche(texto):
+    """
+    "HH-HH" a (desde, hasta); "00-00" es sin horario nocturno
+    """
+    desde, hasta = (int(parte) for parte in texto.split("-"))
+    if not (0 <= desde <= 23 and 0 <= hasta <= 24):
+        raise argparse.ArgumentTypeError(f"horario nocturno inválido: {texto}")
+    return desde, hasta
+
+
+def texto_noche(noche):
+    desde, hasta = noche
+    return f"{desde:02d}-{hasta:02d}" if desde != hasta else "sin noche"
+
+
+def lista(tipo):
+    def convertir(texto):
+        return [tipo(parte) for parte in texto.split(",") if parte.strip()]
+    return convertir
+
+
+def ruta_cache(ruta, cache, sample_rate, canales):
+    """
+    Archivo de PCM decodificado de `ruta`: cambia si cambia la grabación o el formato
+    """
+    datos = os.stat(ruta)
+    clave = f"{os.path.abspath(ruta)}|{datos.st_size}|{datos.st_mtime_ns}|{sample_rate}|{canales}"
+    return os.path.join(cache, hashlib.sha1(clave.encode("utf-8")).hexdigest() + ".pcm")
+
+
+def decodificar(ruta, cache, sample_rate, canales):
+    """
+    Decodifica la grabación a PCM s16le en la caché, si no estaba.
+    Retorna (ruta del PCM, si ya estaba en caché).
+    """
+    destino = ruta_cache(ruta, cache, sample_rate, canales)
+    if os.path.exists(destino):
+        return destino, True
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    try:
+        with open(temporal, "wb") as salida:
+            try:
+                proceso = subprocess.run(comando_pcm(ruta, None, sample_rate, canales),
+                                         stdin=subprocess.DEVNULL, stdout=salida, stderr=subprocess.PIPE)
+            except OSError as e:
+                raise RuntimeError(f"No se pudo ejecutar FFmpeg: {e}") from e
+        if proceso.returncode != 0:
+            raise RuntimeError(f"FFmpeg no pudo decodificar {ruta}: "
+                               f"{proceso.stderr.decode('utf-8', 'replace').strip()}")
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return destino, False
+
+
+def analizar_tramo(pcm, inicios, largo, sample_rate, canales, ventanas, umbrales):
+    """
+    Porcentaje audible de los fragmentos que empiezan en `inicios` (muestras)
+    para cada (ventana, umbral). Corre en los procesos del pool.
+    """
+    muestras = np.memmap(pcm, dtype="<i2", mode="r")
+    buffers = np.stack([muestras[inicio:inicio + largo] for inicio in inicios])
+    del muestras
+    return analisis.porcentajes_audibles(buffers, sample_rate, canales, SAMPLE_WIDTH, ventanas, umbrales)
+
+
+def clasificar_chequeos(tiempos, fragmento, fallas):
+    """
+    Por chequeo: 1 si su fragmento cae entero dentro de una falla, 0 si no toca
+    ninguna y -1 si la toca en parte (no se cuenta como acierto ni error);
+    y los índices de las fallas que toca
+    """
+    clases = np.zeros(len(tiempos), dtype=np.int8)
+    tocadas = [[] for _ in tiempos]
+    for j, (desde, hasta) in enumerate(fallas):
+        adentro = (tiempos >= desde) & (tiempos + fragmento <= hasta)
+        toca = (tiempos < hasta) & (tiempos + fragmento > desde)
+        clases[toca & (clases == 0)] = -1
+        clases[adentro] = 1
+        for i in np.flatnonzero(toca):
+            tocadas[i].append(j)
+    return clases, tocadas
+
+
+def evaluar(grabacion, falla_chequeo, umbral_caido, umbral_recuperacion):
+    """
+    Contadores de una combinación en una grabación: errores por chequeo y las
+    alertas que hubiera mandado la máquina de estados de alertas.py
+    """
+    clases, tocadas = grabacion["clases"], grabacion["tocadas"]
+    contadores = dict.fromkeys(CONTADORES, 0)
+    contadores["chequeos_ok"] = int((clases == 0).sum())
+    contadores["chequeos_falla"] = int((clases == 1).sum())
+    contadores["falsos_positivos"] = int((falla_chequeo & (clases == 0)).sum())
+    contadores["falsos_negativos"] = int((~falla_chequeo & (clases == 1)).sum())
+    contadores["fallas"] = len(grabacion["fallas"])
+
+    demoras = {}
+    estado = alertas.EstadoStream()
+    for i, (t, falla) in enumerate(zip(grabacion["tiempos"], falla_chequeo)):
+        anterior = estado
+        estado = alertas.transicion(estado, not falla, ts=t, umbral_caido=umbral_caido,
+                                    umbral_recuperacion=umbral_recuperacion)
+        if estado.estado != alertas.CAIDO:
+            continue
+        if anterior.estado != alertas.CAIDO:
+            contadores["alertas"] += 1
+            contadores["alertas_falsas"] += 0 if tocadas[i] else 1
+        aviso = t + grabacion["fragmento"]
+        for j in tocadas[i]:
+            demoras.setdefault(j, max(0.0, aviso - grabacion["fallas"][j][0]))
+    contadores["fallas_detectadas"] = len(demoras)
+    contadores["demora_total"] = sum(demoras.values())
+    return contadores
+
+
+def evaluar_grabacion(grabacion, porcentajes, combinaciones, umbral_caido, umbral_recuperacion):
+    """
+    Contadores de todas las combinaciones (umbral, ventana, porcentaje, noche)
+    en una grabación. Corre en los procesos del pool.
+    """
+    nocturnos = {}
+    for noche in {combinacion[3] for combinacion in combinaciones}:
+        horas = grabacion["horas"] if grabacion["horas"] is not None else []
+        nocturnos[noche] = np.array([monitoreo.es_hora_nocturna(hora, *noche) for hora in horas], dtype=bool)
+    resultados = {}
+    for umbral, ventana, porcentaje, noche in combinaciones:
+        valores = porcentajes[ventana, umbral]
+        falla_chequeo = ~((valores > 0) & (valores >= porcentaje))
+        if grabacion["horas"] is not None:
+            falla_chequeo &= ~nocturnos[noche]
+        resultados[umbral, ventana, porcentaje, noche] = evaluar(grabacion, falla_chequeo,
+                                                                 umbral_caido, umbral_recuperacion)
+    return resultados
+
+
+def resumir(contadores, horas_audio):
+    """
+    Tasas legibles a partir de los contadores sumados de todas las grabaciones
+    """
+    return {
+        "fp_chequeos": contadores["falsos_positivos"] / max(contadores["chequeos_ok"], 1) * 100,
+        "fn_chequeos": contadores["falsos_negativos"] / max(contadores["chequeos_falla"], 1) * 100,
+        "alertas_falsas_dia": contadores["alertas_falsas"] / max(horas_audio / 24, 1e-9),
+        "fallas_perdidas": contadores["fallas"] - contadores["fallas_detectadas"],
+        "demora_media_seg": (contadores["demora_total"] / contadores["fallas_detectadas"]
+                             if contadores["fallas_detectadas"] else None),
+    }
+
+
+def imprimir_tabla(titulo, filas):
+    print(f"\n📊 {titulo}")
+    print(f"   {'valor':>12} {'FP chequeos':>12} {'FN chequeos':>12} {'falsas/día':>11} "
+          f"{'perdidas':>9} {'demora':>8}")
+    for valor, tasas in filas:
+        demora = f"{tasas['demora_media_seg']:.0f}s" if tasas["demora_media_seg"] is not None else "-"
+        print(f"   {valor:>12} {tasas['fp_chequeos']:>11.2f}% {tasas['fn_chequeos']:>11.2f}% "
+              f"{tasas['alertas_falsas_dia']:>11.2f} {tasas['fallas_perdidas']:>9} {demora:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radio Watchdog - Replay de grabaciones para ajustar umbrales")
+    parser.add_argument("grabaciones", help="carpeta con las grabaciones archivadas")
+    parser.add_argument("--etiquetas", help="JSON con las fallas conocidas (por defecto etiquetas.json en la carpeta)")
+    parser.add_argument("--cache", help="carpeta del PCM decodificado (por defecto .replay_cache en la carpeta)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="procesos de análisis")
+    parser.add_argument("--umbrales", type=lista(int), default=UMBRALES, help="valores de THRESHOLD_DBFS")
+    parser.add_argument("--ventanas", type=lista(int), default=VENTANAS_MS, help="valores de SILENCIO_MIN_MS")
+    parser.add_argument("--porcentajes", type=lista(float), default=PORCENTAJES,
+                        help="valores de PORCENTAJE_AUDIBLE_MIN")
+    parser.add_argument("--noches", type=lista(leer_noche), default=NOCHES,
+                        help="horarios nocturnos HH-HH (00-00 es sin horario nocturno)")
+    parser.add_argument("--intervalo", type=float, help="segundos entre chequeos (por defecto INTERVALO_CHEQUEO)")
+    parser.add_argument("--mejores", type=int, default=10, help="combinaciones a listar")
+    parser.add_argument("--salida", default="replay.json", help="archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    sample_rate, canales = CONFIG.PCM_SAMPLE_RATE, CONFIG.PCM_CANALES
+    fragmento = CONFIG.DURACION_FRAGMENTO
+    intervalo = args.intervalo or CONFIG.INTERVALO_CHEQUEO
+    # Como en el daemon, que es el que chequea cada INTERVALO_CHEQUEO segundos
+    umbrales_alerta = (monitoreo.umbral_caido(persistente=True), CONFIG.UMBRAL_RECUPERACION)
+    base = (CONFIG.THRESHOLD_DBFS, CONFIG.SILENCIO_MIN_MS, CONFIG.PORCENTAJE_AUDIBLE_MIN,
+            (CONFIG.NOCHE_DESDE, CONFIG.NOCHE_HASTA))
+    valores = [sorted(set(grilla) | {actual}) for grilla, actual in
+               zip((args.umbrales, args.ventanas, args.porcentajes, args.noches), base)]
+    combinaciones = list(product(*valores))
+
+    etiquetas = leer_etiquetas(args.etiquetas or os.path.join(args.grabaciones, "etiquetas.json"))
+    archivos = sorted(nombre for nombre in os.listdir(args.grabaciones)
+                      if nombre.lower().endswith(EXTENSIONES))
+    if not archivos:
+        print(f"❌ No hay grabaciones en {args.grabaciones}")
+        return 1
+    faltantes = set(etiquetas) - set(archivos)
+    if faltantes:
+        print(f"⚠️ Etiquetas de grabaciones que no están: {', '.join(sorted(faltantes))}")
+    cache = args.cache or os.path.join(args.grabaciones, ".replay_cache")
+    os.makedirs(cache, exist_ok=True)
+
+    print(f"🎞️ {len(archivos)} grabaciones, {len(combinaciones)} combinaciones, "
+          f"un chequeo de {fragmento}s cada {intervalo:g}s, {args.procesos} procesos")
+
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.procesos) as hilos:
+            decodificados = list(hilos.map(lambda nombre: decodificar(os.path.join(args.grabaciones, nombre),
+                                                                      cache, sample_rate, canales), archivos))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    segundos_decodificar = time.perf_counter() - inicio
+    en_cache = sum(1 for _, cacheado in decodificados if cacheado)
+    print(f"💾 Decodificación: {segundos_decodificar:.1f}s ({en_cache} de {len(archivos)} ya en caché)")
+
+    largo = int(fragmento * sample_rate) * canales
+    grabaciones = {}
+    for nombre, (pcm, _) in zip(archivos, decodificados):
+        total = os.path.getsize(pcm) // SAMPLE_WIDTH
+        tiempos = np.arange(0, (total - largo) / (sample_rate * canales) + 1e-9, intervalo)
+        tiempos = tiempos if total >= largo else tiempos[:0]
+        comienzo, fallas = etiquetas.get(nombre, (None, []))
+        clases, tocadas = clasificar_chequeos(tiempos, fragmento, fallas)
+        grabaciones[nombre] = {
+            "pcm": pcm,
+            "duracion": total / (sample_rate * canales),
+            "tiempos": tiempos,
+            "fragmento": fragmento,
+            "fallas": fallas,
+            "clases": clases,
+            "tocadas": tocadas,
+            "horas": ([(comienzo + timedelta(seconds=float(t))).hour for t in tiempos]
+                      if comienzo is not None else None),
+        }
+        if comienzo is None and fallas:
+            print(f"⚠️ {nombre} sin \"inicio\": no se aplica el horario nocturno")
+
+    inicio = time.perf_counter()
+    totales = {combinacion: dict.fromkeys(CONTADORES, 0) for combinacion in combinaciones}
+    with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+        tramos = {}
+        for nombre, grabacion in grabaciones.items():
+            inicios = (np.round(grabacion["tiempos"] * sample_rate).astype(np.int64) * canales).tolist()
+            for desde in range(0, len(inicios), TRAMO):
+                futuro = pool.submit(analizar_tramo, grabacion["pcm"], inicios[desde:desde + TRAMO], largo,
+                                     sample_rate, canales, valores[1], valores[0])
+                tramos[futuro] = (nombre, desde)
+
+        partes = {nombre: {} for nombre in grabaciones}
+        evaluaciones = []
+        for nombre, grabacion in grabaciones.items():
+            if not len(grabacion["tiempos"]):
+                evaluaciones.append(pool.submit(evaluar_grabacion, grabacion,
+                                                {(v, u): np.zeros(0) for u in valores[0] for v in valores[1]},
+                                                combinaciones, *umbrales_alerta))
+        for futuro in as_completed(tramos):
+            nombre, desde = tramos[futuro]
+            partes[nombre][desde] = futuro.result()
+            grabacion = grabaciones[nombre]
+            if len(partes[nombre]) == -(-len(grabacion["tiempos"]) // TRAMO):
+                ordenadas = [partes[nombre][clave] for clave in sorted(partes[nombre])]
+                porcentajes = {clave: np.concatenate([parte[clave] for parte in ordenadas])
+                               for clave in ordenadas[0]}
+                evaluaciones.append(pool.submit(evaluar_grabacion, grabacion, porcentajes, combinaciones,
+                                                *umbrales_alerta))
+        for futuro in as_completed(evaluaciones):
+            for combinacion, contadores in futuro.result().items():
+                for clave, valor in contadores.items():
+                    totales[combinacion][clave] += valor
+    segundos_analisis = time.perf_counter() - inicio
+
+    horas_audio = sum(grabacion["duracion"] for grabacion in grabaciones.values()) / 3600
+    chequeos = sum(len(grabacion["tiempos"]) for grabacion in grabaciones.values())
+    print(f"⏱️ Análisis: {horas_audio:.1f} h de audio ({chequeos} chequeos) en {segundos_analisis:.1f}s, "
+          f"{horas_audio * 3600 / max(segundos_analisis, 1e-9):.0f}x tiempo real")
+
+    tasas = {combinacion: resumir(contadores, horas_audio) for combinacion, contadores in totales.items()}
+    print(f"\nConfiguración actual: THRESHOLD_DBFS={base[0]} SILENCIO_MIN_MS={base[1]} "
+          f"PORCENTAJE_AUDIBLE_MIN={base[2]:g} horario nocturno {texto_noche(base[3])}; "
+          f"cada tabla varía un parámetro y deja los demás así")
+    for posicion, titulo in enumerate(PARAMETROS):
+        filas = []
+        for valor in valores[posicion]:
+            combinacion = base[:posicion] + (valor,) + base[posicion + 1:]
+            filas.append((texto_noche(valor) if posicion == 3 else f"{valor:g}", tasas[combinacion]))
+        imprimir_tabla(titulo, filas)
+
+    ranking = sorted(combinaciones, key=lambda c: (tasas[c]["fallas_perdidas"], tasas[c]["alertas_falsas_dia"],
+                                                   tasas[c]["fn_chequeos"] + tasas[c]["fp_chequeos"]))
+    print("\n🏆 Mejores combinaciones (menos fallas perdidas, luego menos alertas falsas)")
+    for umbral, ventana, porcentaje, noche in ranking[:args.mejores]:
+        t = tasas[umbral, ventana, porcentaje, noche]
+        demora = f"{t['demora_media_seg']:.0f}s" if t["demora_media_seg"] is not None else "-"
+        print(f"   THRESHOLD_DBFS={umbral} SILENCIO_MIN_MS={ventana} PORCENTAJE_AUDIBLE_MIN={porcentaje:g} "
+              f"noche {texto_noche(noche)}: FP {t['fp_chequeos']:.2f}% FN {t['fn_chequeos']:.2f}% "
+              f"falsas/día {t['alertas_falsas_dia']:.2f} perdidas {t['fallas_perdidas']} demora {demora}")
+
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "grabaciones": [{"archivo": nombre, "duracion_seg": grabacion["duracion"],
+                         "chequeos": len(grabacion["tiempos"]), "fallas": grabacion["fallas"]}
+                        for nombre, grabacion in grabaciones.items()],
+        "intervalo_seg": intervalo,
+        "fragmento_seg": fragmento,
+        "umbral_caido": umbrales_alerta[0],
+        "umbral_recuperacion": umbrales_alerta[1],
+        "segundos_decodificacion": segundos_decodificar,
+        "segundos_analisis": segundos_analisis,
+        "tiempo_real_x": horas_audio * 3600 / max(segundos_analisis, 1e-9),
+        "combinaciones": [{"umbral_dbfs": umbral, "silencio_min_ms": ventana, "porcentaje_audible_min": porcentaje,
+                           "noche": texto_noche(noche), "actual": (umbral, ventana, porcentaje, noche) == base,
+                           **totales[umbral, ventana, porcentaje, noche], **tasas[umbral, ventana, porcentaje, noche]}
+                          for umbral, ventana, porcentaje, noche in ranking],
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
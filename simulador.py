@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Simulador de streams
+Servidor HTTP local que imita a Icecast: sirve N estaciones sintéticas
+(MP3/AAC/Ogg, o WAV si no hay FFmpeg) con cabeceras ICY, a la velocidad
+real del audio, y les aplica fallas programadas: silencio, cuelgue, goteo,
+cortes de conexión, respuestas 404/503 y cambio de códec.
+
+Uso:
+    python simulador.py --estaciones 500 --codec mp3 --fallas-mixtas 60 --streams-json sim.json
+    STREAMS_FILE=sim.json python monitoreo.py
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import audio_sintetico
+
+TIPOS_FALLA = ("silencio", "cuelgue", "goteo", "corte", "404", "503", "codec")
+
+CONTENT_TYPES = {
+    "mp3": "audio/mpeg",
+    "aac": "audio/aac",
+    "ogg": "application/ogg",
+    "opus": "audio/ogg",
+    "wav": "audio/wav",
+}
+
+# Códec al que pasa una estación con la falla "codec"
+CAMBIO_CODEC = {"mp3": "aac", "aac": "mp3", "ogg": "mp3", "opus": "mp3", "wav": "wav"}
+
+DURACION_LOOP = 10
+SAMPLE_RATE = 22050
+PASO_SEG = 0.1
+ICY_METAINT = 16000
+# Segundos de audio que llegan antes de cortar la conexión (falla "corte")
+SEGUNDOS_ANTES_DE_CORTE = 2
+# Fracción de la velocidad normal durante la falla "goteo"
+FRACCION_GOTEO = 0.05
+
+
+@dataclass
+class Falla:
+    tipo: str
+    inicio: float            # segundos desde el arranque del simulador
+    fin: float = None        # None: hasta que se detenga el simulador
+
+    def activa(self, t):
+        return self.inicio <= t and (self.fin is None or t < self.fin)
+
+
+@dataclass
+class Material:
+    """
+    Loop de audio y loop de silencio codificados, listos para servir
+    """
+    codec: str
+    audio: bytes
+    silencio: bytes
+    bytes_por_seg: float
+    cabecera: bytes = b""    # sólo WAV: se envía una vez al conectar
+
+
+def _cabecera_wav(sample_rate):
+    # Tamaños al máximo: el stream no tiene fin
+    return (b"RIFF" + (0xFFFFFFFF).to_bytes(4, "little") + b"WAVEfmt "
+            + (16).to_bytes(4, "little") + (1).to_bytes(2, "little") + (1).to_bytes(2, "little")
+            + sample_rate.to_bytes(4, "little") + (sample_rate * 2).to_bytes(4, "little")
+            + (2).to_bytes(2, "little") + (16).to_bytes(2, "little")
+            + b"data" + (0xFFFFFFFF).to_bytes(4, "little"))
+
+
+def preparar_material(codecs, directorio=None):
+    """
+    Codifica una vez los loops de cada códec. Sin FFmpeg sólo hay WAV.
+    Retorna {codec: Material}.
+    """
+    propio = directorio is None
+    directorio = directorio or tempfile.mkdtemp(prefix="radiowatchdog_sim_")
+    voz = audio_sintetico.generar("voz", DURACION_LOOP, SAMPLE_RATE)
+    silencio = audio_sintetico.generar("silencio", DURACION_LOOP, SAMPLE_RATE)
+    material = {"wav": Material("wav", voz, silencio, SAMPLE_RATE * 2, _cabecera_wav(SAMPLE_RATE))}
+    try:
+        if not audio_sintetico.ffmpeg_disponible():
+            return material
+        wav_voz = audio_sintetico.escribir_wav(os.path.join(directorio, "voz.wav"), voz, SAMPLE_RATE)
+        wav_silencio = audio_sintetico.escribir_wav(os.path.join(directorio, "silencio.wav"), silencio, SAMPLE_RATE)
+        for codec in codecs:
+            if codec == "wav":
+                continue
+            archivos = [audio_sintetico.codificar(wav, codec) for wav in (wav_voz, wav_silencio)]
+            if None in archivos:
+                continue
+            datos = []
+            for archivo in archivos:
+                with open(archivo, "rb") as f:
+                    datos.append(f.read())
+            material[codec] = Material(codec, datos[0], datos[1], len(datos[0]) / DURACION_LOOP)
+        return material
+    finally:
+        if propio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def guion_mixto(ids, inicio, proporcion=0.5, duracion=None):
+    """
+    Reparte los tipos de falla entre una `proporcion` de las estaciones,
+    todos a partir del segundo `inicio`. Retorna {id: [Falla]}.
+    """
+    con_falla = ids[:int(len(ids) * proporcion)]
+    fin = inicio + duracion if duracion is not None else None
+    return {estacion: [Falla(TIPOS_FALLA[i % len(TIPOS_FALLA)], inicio, fin)]
+            for i, estacion in enumerate(con_falla)}
+
+
+def cargar_guion(path):
+    """
+    Lee un guion JSON: {"id": [{"tipo": "silencio", "inicio": 30, "fin": 90}, ...]}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    guion = {}
+    for estacion, fallas in datos.items():
+        guion[estacion] = [Falla(f["tipo"], f["inicio"], f.get("fin")) for f in fallas]
+        for falla in guion[estacion]:
+            if falla.tipo not in TIPOS_FALLA:
+                raise ValueError(f"Tipo de falla desconocido en {estacion}: {falla.tipo}")
+    return guion
+
+
+class _Emisor:
+    """
+    Escribe audio en el socket intercalando los metadatos ICY cada ICY_METAINT bytes
+    """
+
+    def __init__(self, salida, metaint, titulo):
+        self.salida = salida
+        self.metaint = metaint
+        self.hasta_metadatos = metaint
+        texto = f"StreamTitle='{titulo}';".encode("utf-8")
+        relleno = -len(texto) % 16
+        self.metadatos = bytes([(len(texto) + relleno) // 16]) + texto + b"\0" * relleno
+
+    def escribir(self, datos):
+        if not self.metaint:
+            self.salida.write(datos)
+            return
+        while datos:
+            parte, datos = datos[:self.hasta_metadatos], datos[self.hasta_metadatos:]
+            self.salida.write(parte)
+            self.hasta_metadatos -= len(parte)
+            if self.hasta_metadatos == 0:
+                self.salida.write(self.metadatos)
+                self.hasta_metadatos = self.metaint
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    server_version = "Icecast 2.4.4"
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        simulador = self.server.simulador
+        estacion = self.path.strip("/").split("?")[0]
+        if estacion == "streams.json":
+            return self._listado(simulador)
+        if estacion not in simulador.ids:
+            return self.send_error(404)
+
+        falla = simulador.falla_activa(estacion)
+        if falla and falla.tipo in ("404", "503"):
+            return self.send_error(int(falla.tipo))
+
+        material = simulador.material[simulador.codec]
+        metaint = ICY_METAINT if self.headers.get("Icy-MetaData") == "1" else 0
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[material.codec])
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("icy-name", estacion)
+        self.send_header("icy-genre", "Simulador")
+        self.send_header("icy-br", str(round(material.bytes_por_seg * 8 / 1000)))
+        if metaint:
+            self.send_header("icy-metaint", str(metaint))
+        self.end_headers()
+        try:
+            self._transmitir(simulador, estacion, _Emisor(self.wfile, metaint, f"Simulador - {estacion}"))
+        except (ConnectionError, socket.timeout, OSError):
+            pass
+
+    def _listado(self, simulador):
+        cuerpo = json.dumps(simulador.listado(), ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _transmitir(self, simulador, estacion, emisor):
+        material = simulador.material[simulador.codec]
+        emisor.escribir(material.cabecera)
+        posicion = 0
+        enviados_seg = 0.0
+        siguiente = time.monotonic()
+        while not simulador.detenido.is_set():
+            falla = simulador.falla_activa(estacion)
+            tipo = falla.tipo if falla else None
+            if tipo in ("404", "503"):
+                return
+            if tipo == "corte" and enviados_seg >= SEGUNDOS_ANTES_DE_CORTE:
+                return
+
+            actual = simulador.material.get(CAMBIO_CODEC[simulador.codec]) if tipo == "codec" else material
+            actual = actual or material
+            fraccion = 0 if tipo == "cuelgue" else FRACCION_GOTEO if tipo == "goteo" else 1
+            loop = actual.silencio if tipo == "silencio" else actual.audio
+
+            cantidad = int(actual.bytes_por_seg * PASO_SEG * fraccion)
+            if cantidad:
+                datos = bytearray()
+                posicion %= len(loop)
+                while len(datos) < cantidad:
+                    parte = loop[posicion:posicion + cantidad - len(datos)]
+                    datos += parte
+                    posicion = (posicion + len(parte)) % len(loop)
+                emisor.escribir(bytes(datos))
+                enviados_seg += PASO_SEG * fraccion
+
+            # Ritmo de tiempo real sin acumular deriva
+            siguiente += PASO_SEG
+            simulador.detenido.wait(max(0, siguiente - time.monotonic()))
+
+
+class Simulador:
+    def __init__(self, estaciones=10, codec="mp3", guion=None, host="127.0.0.1", puerto=8800, material=None):
+        self.ids = [f"radio{i:04d}" for i in range(estaciones)]
+        self.material = material or preparar_material([codec])
+        if codec not in self.material:
+            codec = "wav"
+        self.codec = codec
+        self.guion = guion or {}
+        self.detenido = threading.Event()
+        self.inicio = time.time()
+        self.servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+        self.servidor.daemon_threads = True
+        self.servidor.request_queue_size = 1024
+        self.servidor.simulador = self
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, name="simulador", daemon=True)
+
+    @property
+    def direccion(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def url(self, estacion):
+        return f"{self.direccion}/{estacion}"
+
+    def falla_activa(self, estacion):
+        t = time.time() - self.inicio
+        for falla in self.guion.get(estacion, ()):
+            if falla.activa(t):
+                return falla
+        return None
+
+    def listado(self):
+        """
+        Estaciones en el formato de STREAMS_FILE, con la falla programada
+        y su comienzo como fecha absoluta (para medir la latencia de detección)
+        """
+        listado = []
+        for estacion in self.ids:
+            datos = {"id": estacion, "nombre": estacion, "url": self.url(estacion)}
+            fallas = self.guion.get(estacion)
+            if fallas:
+                datos["fallas"] = [{"tipo": f.tipo, "inicio": self.inicio + f.inicio,
+                                    "fin": self.inicio + f.fin if f.fin is not None else None}
+                                   for f in fallas]
+            listado.append(datos)
+        return listado
+
+    def iniciar(self):
+        self.inicio = time.time()
+        self.hilo.start()
+        return self
+
+    def detener(self):
+        self.detenido.set()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Radio Watchdog - Simulador local de streams")
+    parser.add_argument("--estaciones", type=int, default=10)
+    parser.add_argument("--codec", default="mp3", choices=sorted(CONTENT_TYPES))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8800)
+    parser.add_argument("--guion", help="archivo JSON con las fallas de cada estación")
+    parser.add_argument("--fallas-mixtas", type=float, metavar="SEG",
+                        help="repartir todos los tipos de falla entre la mitad de las estaciones a partir de SEG")
+    parser.add_argument("--proporcion", type=float, default=0.5,
+                        help="fracción de estaciones con falla en --fallas-mixtas (por defecto 0.5)")
+    parser.add_argument("--streams-json", help="guardar el listado de estaciones para STREAMS_FILE")
+    args = parser.parse_args(argv)
+
+    ids = [f"radio{i:04d}" for i in range(args.estaciones)]
+    guion = {}
+    if args.fallas_mixtas is not None:
+        guion = guion_mixto(ids, args.fallas_mixtas, args.proporcion)
+    if args.guion:
+        guion.update(cargar_guion(args.guion))
+
+    simulador = Simulador(args.estaciones, args.codec, guion, args.host, args.puerto)
+    if simulador.codec != args.codec:
+        print(f"⚠️ {args.codec} no disponible (falta FFmpeg o el códec): se sirve WAV")
+    simulador.iniciar()
+    if args.streams_json:
+        with open(args.streams_json, "w", encoding="utf-8") as f:
+            json.dump([{k: v for k, v in e.items() if k != "fallas"} for e in simulador.listado()],
+                      f, indent=2, ensure_ascii=False)
+    print(f"📡 {args.estaciones} estaciones {simulador.codec} en {simulador.direccion}/radio0000 ... "
+          f"(listado en {simulador.direccion}/streams.json)", flush=True)
+
+    try:
+        simulador.detenido.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulador.detener()
+
+
+if __name__ == "__main__":
+    main()
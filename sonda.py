@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Sondeo rápido
+Abre la conexión HTTP al stream, valida el estado y las cabeceras
+(Content-Type e ICY) y lee unos pocos KB para confirmar que llegan datos,
+sin lanzar FFmpeg ni decodificar audio. En MP3 y AAC esos bytes además
+pasan por el análisis de frames (ver bitstream.py). Es el primer nivel
+del sondeo escalonado: el análisis completo sólo se hace cada tanto o
+cuando este nivel ve algo raro.
+"""
+
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+
+import bitstream
+
+# Content-Type aceptados como audio de un stream (Icecast, SHOUTcast v2, HLS no)
+TIPOS_AUDIO = ("audio/", "application/ogg", "application/octet-stream")
+
+# Content-Type cuyos frames se pueden recorrer sin decodificar
+FORMATOS_BITSTREAM = {"audio/mpeg": "mp3", "audio/mp3": "mp3", "audio/aac": "aac", "audio/aacp": "aac",
+                      "audio/x-aac": "aac"}
+
+# Cabeceras que se conservan para detectar cambios entre chequeos
+CABECERAS_ICY = ("icy-name", "icy-br", "icy-sr", "icy-genre", "ice-audio-info")
+
+
+@dataclass
+class ResultadoSonda:
+    ok: bool
+    motivo: str = None            # por qué no está OK, o None
+    estado_http: int = None
+    tipo: str = None              # Content-Type
+    icy: dict = field(default_factory=dict)
+    bytes: int = 0
+    segundos: float = 0.0
+    integridad: bitstream.ResultadoBitstream = None   # análisis de frames MP3/AAC
+
+    def firma(self):
+        """
+        Lo que debería mantenerse igual entre chequeos de un stream sano
+        """
+        return {"tipo": self.tipo, "icy-br": self.icy.get("icy-br"), "icy-sr": self.icy.get("icy-sr"),
+                "formato": self.integridad.descripcion() if self.integridad else None}
+
+    def detalle(self):
+        """
+        Datos a guardar junto al chequeo en el historial
+        """
+        datos = {"tipo": self.tipo, "bytes": self.bytes, "segundos": round(self.segundos, 3), **self.icy}
+        if self.integridad is not None:
+            datos["bitstream"] = self.integridad.como_dict()
+        return datos
+
+
+def _kbps(valor):
+    """
+    icy-br puede venir como "128" o "128,128"
+    """
+    try:
+        return int(str(valor).split(",")[0])
+    except ValueError:
+        return None
+
+
+def admite_sondeo_rapido(stream_url):
+    return urlsplit(stream_url).scheme in ("http", "https")
+
+
+def sondear_http(stream_url, bytes_minimos=8192, timeout_conexion=5, timeout_lectura=5, plazo=3):
+    """
+    Conecta al stream y lee `bytes_minimos` bytes en a lo sumo `plazo` segundos.
+    Retorna un ResultadoSonda; nunca lanza excepciones de red.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoSonda(ok=False)
+    try:
+        with requests.get(stream_url, stream=True, timeout=(timeout_conexion, timeout_lectura),
+                        headers={"User-Agent": "radioWatchdog", "Accept": "*/*"}) as respuesta:
+            resultado.estado_http = respuesta.status_code
+            resultado.tipo = respuesta.headers.get("Content-Type", "").split(";")[0].strip().lower() or None
+            resultado.icy = {clave: respuesta.headers[clave] for clave in CABECERAS_ICY if clave in respuesta.headers}
+            if respuesta.status_code != 200:
+                resultado.motivo = f"HTTP {respuesta.status_code}"
+            elif not (resultado.tipo or "").startswith(TIPOS_AUDIO):
+                resultado.motivo = f"tipo de contenido inesperado: {resultado.tipo or 'sin Content-Type'}"
+            else:
+                # read1 retorna apenas hay datos, así un goteo lento no excede el plazo
+                leer = getattr(respuesta.raw, "read1", respuesta.raw.read)
+                datos = bytearray()
+                while len(datos) < bytes_minimos and time.perf_counter() - inicio < plazo:
+                    bloque = leer(4096)
+                    if not bloque:
+                        break
+                    datos += bloque
+                resultado.bytes = len(datos)
+                problemas = []
+                if resultado.bytes < bytes_minimos:
+                    problemas.append(f"sólo {resultado.bytes} bytes en {time.perf_counter() - inicio:.1f}s")
+                if datos and resultado.tipo in FORMATOS_BITSTREAM:
+                    resultado.integridad = bitstream.analizar(datos)
+                    problemas += bitstream.anomalias(resultado.integridad, FORMATOS_BITSTREAM[resultado.tipo],
+                                                     _kbps(resultado.icy.get("icy-br")))
+                if problemas:
+                    resultado.motivo = "; ".join(problemas)
+    except (requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+        resultado.motivo = f"{type(e).__name__}: {e}"
+    resultado.segundos = time.perf_counter() - inicio
+    resultado.ok = resultado.motivo is None
+    return resultado
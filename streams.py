@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Radio Watchdog - Registro de streams
+Carga la lista de streams a monitorear desde un archivo JSON (STREAMS_FILE)
+o, por compatibilidad, desde STREAM_URL / STREAM2_URL
+"""
+
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from cola import PRIORIDADES
+
+
+@dataclass
+class Stream:
+    id: str
+    nombre: str
+    url: str
+    intervalo: int
+    reglas: dict = field(default_factory=dict)   # reglas de calidad propias (ver calidad.py)
+    prioridad: str = "normal"                     # clase de prioridad (ver cola.py)
+
+
+def generar_id(nombre):
+    """
+    Genera un identificador corto a partir del nombre: "Radio Única" -> "radio_unica"
+    """
+    texto = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+
+def cargar_streams(archivo=None, stream_url=None, stream2_url=None,
+                   intervalo=60, intervalo1=None, intervalo2=None):
+    """
+    Retorna la lista de streams configurados.
+
+    Si se indica `archivo`, se lee un JSON con una lista de objetos:
+        [{"nombre": "Radio Uno", "url": "http://...", "intervalo": 30}, ...]
+    "id", "intervalo", "reglas" (de calidad, ver calidad.py) y "prioridad"
+    ("alta", "normal" o "baja", ver cola.py) son opcionales. Sin "intervalo",
+    la prioridad alta usa la mitad del intervalo general y la baja el doble.
+    Si no, se usan STREAM_URL y STREAM2_URL con los nombres históricos
+    "Stream Principal" y "Stream Secundario".
+    """
+    if not archivo:
+        streams = []
+        if stream_url:
+            streams.append(Stream("stream", "Stream Principal", stream_url, intervalo1 or intervalo))
+        if stream2_url:
+            streams.append(Stream("stream2", "Stream Secundario", stream2_url, intervalo2 or intervalo))
+        return streams
+
+    with open(archivo, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+
+    streams = []
+    ids = set()
+    for i, item in enumerate(datos):
+        if not item.get("url"):
+            raise ValueError(f"{archivo}: el stream #{i + 1} no tiene 'url'")
+        nombre = item.get("nombre") or f"Stream {i + 1}"
+        stream_id = item.get("id") or generar_id(nombre) or f"stream_{i + 1}"
+        if stream_id in ids:
+            raise ValueError(f"{archivo}: id de stream duplicado '{stream_id}'")
+        ids.add(stream_id)
+        reglas = {}
+        if item.get("reglas"):
+            import calidad  # usa NumPy: sólo si hay reglas
+            reglas = calidad.validar_reglas(item["reglas"], f"{archivo}: reglas de '{stream_id}'")
+        prioridad = item.get("prioridad") or "normal"
+        if prioridad not in PRIORIDADES:
+            raise ValueError(f"{archivo}: prioridad desconocida '{prioridad}' en '{stream_id}' "
+                             f"(válidas: {', '.join(PRIORIDADES)})")
+        por_defecto = max(1, round(intervalo * PRIORIDADES[prioridad][1]))
+        streams.append(Stream(stream_id, nombre, item["url"], int(item.get("intervalo", por_defecto)), reglas,
+                              prioridad))
+    return streams
@@ -1,54 +1,50 @@
 # -*- coding: utf-8 -*-
 """
 Test Suite para Radio Watchdog
-Incluye pruebas de funcionalidad del stream y codificación UTF-8
+Incluye pruebas de funcionalidad del stream, codificación UTF-8,
+equivalencia del analizador vectorizado con pydub e integridad del bitstream.
+Las funciones test_* corren sin red con pytest; las probar_* usan los
+streams configurados o envían alertas reales y se ejecutan desde el menú.
 """
 
-import os
+import time
 from datetime import datetime
-from monitoreo import bajar_fragmento, analizar_audio, enviar_alerta, TEMP_AUDIO_FILE, TEMP_AUDIO_FILE2, STREAM_URL, STREAM2_URL
+import analisis
+import bitstream
+import calidad
+import config
+import sonda
+from audio_sintetico import generar as generar_senal
+from config import CONFIG
+from monitoreo import capturar_fragmento, analizar_pcm, enviar_alerta, streams_configurados
 
-def test_manual_stream():
+def probar_streams():
     print("\n=== Test Manual de Streams ===\n")
     print("Iniciando prueba...")
     
     resultados = []
     
-    # Probar Stream Principal
-    print("📡 Descargando fragmento del Stream Principal...")
-    if not bajar_fragmento(STREAM_URL, TEMP_AUDIO_FILE):
-        mensaje = "❌ ERROR: No se pudo descargar el Stream Principal"
-        print(mensaje)
-        resultados.append(("Stream Principal", False, mensaje))
-    else:
-        print("🔍 Analizando audio del Stream Principal...")
-        tiene_audio = analizar_audio(TEMP_AUDIO_FILE)
-        if tiene_audio:
-            estado = "✅ CORRECTO: Stream Principal funcionando correctamente"
-            resultados.append(("Stream Principal", True, estado))
+    for i, stream in enumerate(streams_configurados()):
+        icono = "📡" if i == 0 else "📻"
+        print(f"\n{icono} Descargando fragmento del {stream.nombre}...")
+        pcm = capturar_fragmento(stream.url)
+        if pcm is None:
+            mensaje = f"❌ ERROR: No se pudo descargar el {stream.nombre}"
+            print(mensaje)
+            resultados.append((stream.nombre, False, mensaje))
+            continue
+
+        print(f"🔍 Analizando audio del {stream.nombre}...")
+        if analizar_pcm(pcm):
+            estado = f"✅ CORRECTO: {stream.nombre} funcionando correctamente"
+            resultados.append((stream.nombre, True, estado))
         else:
-            estado = "⚠️ ALERTA: Se detectó silencio en el Stream Principal"
-            resultados.append(("Stream Principal", False, estado))
+            estado = f"⚠️ ALERTA: Se detectó silencio en el {stream.nombre}"
+            resultados.append((stream.nombre, False, estado))
         print(f"   {estado}")
     
-    # Probar Stream Secundario (si está configurado)
-    if STREAM2_URL:
-        print("\n📻 Descargando fragmento del Stream Secundario...")
-        if not bajar_fragmento(STREAM2_URL, TEMP_AUDIO_FILE2):
-            mensaje = "❌ ERROR: No se pudo descargar el Stream Secundario"
-            print(mensaje)
-            resultados.append(("Stream Secundario", False, mensaje))
-        else:
-            print("🔍 Analizando audio del Stream Secundario...")
-            tiene_audio2 = analizar_audio(TEMP_AUDIO_FILE2)
-            if tiene_audio2:
-                estado = "✅ CORRECTO: Stream Secundario funcionando correctamente"
-                resultados.append(("Stream Secundario", True, estado))
-            else:
-                estado = "⚠️ ALERTA: Se detectó silencio en el Stream Secundario"
-                resultados.append(("Stream Secundario", False, estado))
-            print(f"   {estado}")
-    else:
+    # Configuración histórica de dos streams sin secundario
+    if not CONFIG.STREAMS_FILE and not CONFIG.STREAM2_URL:
         print("\n📻 Stream Secundario: No configurado")
         resultados.append(("Stream Secundario", None, "No configurado"))
     
@@ -70,11 +66,6 @@ def test_manual_stream():
     print("\nEnviando notificaciones...")
     enviar_alerta("[TEST MANUAL] Resultado de Prueba de Streams", mensaje)
     
-    # Limpiar archivos temporales
-    for temp_file in [TEMP_AUDIO_FILE, TEMP_AUDIO_FILE2]:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-    
     # Mostrar resumen
     print(f"\n📊 RESUMEN DE PRUEBAS:")
     for stream, estado, detalle in resultados:
@@ -88,7 +79,7 @@ def test_manual_stream():
     print("\nPrueba completada.\n")
     return all(r[1] for r in resultados if r[1] is not None)
 
-def test_codificacion():
+def probar_codificacion():
     """Prueba específica para verificar que la codificación UTF-8 funciona correctamente"""
     print("\n=== Test de Codificación UTF-8 ===\n")
     
@@ -112,6 +103,123 @@ Este mensaje verifica que el sistema puede enviar caracteres especiales correcta
         print(f"❌ Error en prueba de codificación: {e}")
         return False
 
+def test_analizador_vectorizado():
+    """Compara analisis.analizar con pydub.silence.detect_nonsilent (resultado y tiempo)"""
+    from pydub import AudioSegment
+    from pydub.silence import detect_nonsilent
+    print("\n=== Test del Analizador Vectorizado ===\n")
+
+    diferencias = 0
+    casos = 0
+    for sample_rate in (8000, 11025, 22050, 44100):
+        for canales in (1, 2):
+            for tipo in ("tono", "silencio", "rafagas", "umbral", "mixto"):
+                for segundos in (0.5, 3.3337, 10):
+                    pcm = generar_senal(tipo, segundos, sample_rate, canales)
+                    audio = AudioSegment(data=pcm, sample_width=2, frame_rate=sample_rate, channels=canales)
+                    for umbral in (-50, -35, -16):
+                        casos += 1
+                        esperado = detect_nonsilent(audio, min_silence_len=1000, silence_thresh=umbral)
+                        obtenido = analisis.analizar(pcm, sample_rate, canales, 2, 1000, umbral).rangos
+                        if esperado != obtenido:
+                            diferencias += 1
+                            print(f"❌ {tipo} {segundos}s {sample_rate}Hz x{canales} {umbral}dBFS: "
+                                  f"pydub={esperado[:3]} numpy={obtenido[:3]}")
+
+    # Lote: mismo resultado que buffer por buffer
+    lote = [generar_senal(tipo, 10, 8000, 1) for tipo in ("tono", "silencio", "rafagas", "umbral", "mixto")]
+    for pcm, resultado in zip(lote, analisis.analizar_lote(lote, 8000, 1, 2, 1000, -35)):
+        casos += 1
+        if resultado.rangos != analisis.analizar(pcm, 8000, 1, 2, 1000, -35).rangos:
+            diferencias += 1
+            print("❌ analizar_lote difiere de analizar")
+
+    print(f"🔍 Casos equivalentes: {casos - diferencias}/{casos}")
+
+    # Comparación de tiempos sobre 60 segundos de audio
+    print("\n⏱ Tiempos (60s de audio, 8000 Hz mono):")
+    pcm = generar_senal("mixto", 60, 8000, 1)
+    audio = AudioSegment(data=pcm, sample_width=2, frame_rate=8000, channels=1)
+    inicio = time.perf_counter()
+    detect_nonsilent(audio, min_silence_len=1000, silence_thresh=-35)
+    tiempo_pydub = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    analisis.analizar(pcm, 8000, 1, 2, 1000, -35)
+    tiempo_numpy = time.perf_counter() - inicio
+    print(f"   pydub: {tiempo_pydub * 1000:.1f} ms")
+    print(f"   numpy: {tiempo_numpy * 1000:.1f} ms ({tiempo_pydub / tiempo_numpy:.0f}x)")
+
+    assert diferencias == 0, f"{diferencias} de {casos} casos difieren de detect_nonsilent"
+
+def probar_analizador_vectorizado():
+    """Versión del menú: informa la diferencia en lugar de cortar con AssertionError"""
+    try:
+        test_analizador_vectorizado()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+def test_reglas_calidad_invalidas():
+    """Límites no numéricos o invertidos se rechazan al leer la configuración"""
+    for limites in ({"min": "-30"}, {"min": None}, {"max": True}, {"min": -10, "max": -30}):
+        try:
+            calidad.validar_reglas({"lufs": limites})
+        except ValueError:
+            continue
+        raise AssertionError(f"validar_reglas aceptó {limites}")
+
+    try:
+        config.leer({"REGLAS_CALIDAD": '{"lufs": {"min": "-30"}}'})
+    except config.ErrorConfiguracion as e:
+        assert "REGLAS_CALIDAD" in str(e)
+    else:
+        raise AssertionError("config.leer aceptó un límite no numérico")
+
+    assert config.leer({"REGLAS_CALIDAD": '{"lufs": {"min": -30, "max": -10}}'})["REGLAS_CALIDAD"] == \
+        {"lufs": {"min": -30, "max": -10}}
+
+def test_evaluar_calidad():
+    """evaluar informa los límites mínimo y máximo que no se cumplen"""
+    reglas = calidad.combinar_reglas({"lufs": {"min": -30, "max": -10}, "recorte": {"max": 0.01}},
+                                     {"recorte": None})
+    assert reglas == {"lufs": {"min": -30, "max": -10}}
+
+    assert calidad.evaluar(calidad.ResultadoCalidad(lufs=-20), reglas) == []
+    assert calidad.evaluar(calidad.ResultadoCalidad(lufs=-40), reglas) == ["lufs -40 < -30"]
+    assert calidad.evaluar(calidad.ResultadoCalidad(lufs=-5), reglas) == ["lufs -5 > -10"]
+    # Una métrica sin medir no cuenta como problema
+    assert calidad.evaluar(calidad.ResultadoCalidad(), reglas) == []
+
+def probar_bitstream():
+    """Recorre los frames MP3/AAC de ~10 segundos de cada stream, sin decodificar"""
+    print("\n=== Test de Integridad del Bitstream ===\n")
+
+    todos_ok = True
+    for stream in streams_configurados():
+        if not sonda.admite_sondeo_rapido(stream.url):
+            print(f"⚪ {stream.nombre}: sólo se analizan streams HTTP")
+            continue
+        # ~10 segundos a 128 kbps
+        resultado = sonda.sondear_http(stream.url, bytes_minimos=160 * 1024, plazo=15)
+        if resultado.integridad is None:
+            print(f"❌ {stream.nombre}: {resultado.motivo or f'formato {resultado.tipo} no soportado'}")
+            todos_ok = False
+            continue
+        datos = resultado.integridad
+        print(f"📻 {stream.nombre}: {datos.descripcion()} ({datos.version}), {datos.frames} frames, "
+              f"{datos.segundos:.1f}s de audio")
+        if datos.bitrate_kbps is not None:
+            print(f"   Bitrate efectivo {datos.bitrate_kbps:.1f} kbps (frames de {datos.kbps_min} a "
+                  f"{datos.kbps_max} kbps), continuidad {datos.continuidad * 100:.2f}%")
+        problemas = bitstream.anomalias(datos)
+        for problema in problemas:
+            print(f"   ⚠️ {problema}")
+        if not problemas:
+            print("   ✅ Sin errores de sincronía ni cambios de formato")
+        todos_ok = todos_ok and not problemas
+    return todos_ok
+
 def menu_principal():
     """Menú interactivo para seleccionar diferentes tipos de prueba"""
     while True:
@@ -121,27 +229,33 @@ def menu_principal():
         print("1. 📻 Test completo de ambos streams")
         print("2. 🔤 Test de codificación UTF-8")
         print("3. 🚀 Ejecutar ambas pruebas")
+        print("4. 🧮 Test del analizador vectorizado (sin red)")
+        print("5. 🧬 Test de integridad del bitstream")
         print("0. ❌ Salir")
         print("-"*50)
         
-        opcion = input("Selecciona una opción (0-3): ").strip()
+        opcion = input("Selecciona una opción (0-5): ").strip()
         
         if opcion == "1":
-            test_manual_stream()
+            probar_streams()
         elif opcion == "2":
-            test_codificacion()
+            probar_codificacion()
         elif opcion == "3":
             print("\n🚀 Ejecutando todas las pruebas...\n")
-            resultado_stream = test_manual_stream()
-            resultado_utf8 = test_codificacion()
+            resultado_stream = probar_streams()
+            resultado_utf8 = probar_codificacion()
             print(f"\n📊 RESUMEN DE PRUEBAS:")
             print(f"   Streams: {'✅ OK' if resultado_stream else '❌ FALLO'}")
             print(f"   UTF-8:   {'✅ OK' if resultado_utf8 else '❌ FALLO'}")
+        elif opcion == "4":
+            probar_analizador_vectorizado()
+        elif opcion == "5":
+            probar_bitstream()
         elif opcion == "0":
             print("\n👋 ¡Hasta luego!")
             break
         else:
-            print("\n❌ Opción no válida. Por favor, selecciona 0-3.")
+            print("\n❌ Opción no válida. Por favor, selecciona 0-5.")
 
 if __name__ == "__main__":
     menu_principal()
\ No newline at end of file